@@ -0,0 +1,59 @@
+# Throughput of apply_many for the different executors and
+# worker counts. Run from the repository root via
+# `python benchmarks/bench_apply_many.py`.
+import os
+import time
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.batch import apply_many
+
+
+NUM_DOCS = 2000
+CHUNKSIZE = 50
+
+patch = ExtJsonPatch.from_python([
+    {'op': 'add', 'path': '/total', 'value': 0},
+    {
+        'op': 'ctrl/for-loop',
+        'path': '',
+        'start-value': 0,
+        'stop-value': 20,
+        'counter-path': '/i',
+        'patch': [
+            {'op': 'number/add', 'path': '/total', 'value-path': '/i'},
+        ],
+    },
+    {'op': 'add', 'path': '/items/-', 'value-path': '/total'},
+], require_decimal=False)
+
+
+def make_docs():
+    return [
+        JsonFactory.from_python(
+            {'id': i, 'items': list(range(10))}, require_decimal=False
+        )
+        for i in range(NUM_DOCS)
+    ]
+
+
+def run(executor, max_workers):
+    docs = make_docs()
+    start = time.perf_counter()
+    num_ok = sum(
+        result.ok for result in apply_many(
+            patch, docs, executor=executor,
+            max_workers=max_workers, chunksize=CHUNKSIZE
+        )
+    )
+    elapsed = time.perf_counter() - start
+    assert num_ok == NUM_DOCS
+    print(f'{executor:8s} workers={max_workers:<3d} {NUM_DOCS / elapsed:10.1f} docs/s')
+
+
+num_cpus = os.cpu_count() or 1
+run('serial', 1)
+worker_counts = sorted(set([1, 2, num_cpus]))
+for max_workers in worker_counts:
+    run('thread', max_workers)
+for max_workers in worker_counts:
+    run('process', max_workers)
@@ -0,0 +1,99 @@
+# Native array operations versus their implementations as patches,
+# which loop over the elements with interpreted operations. Run from
+# the repository root via `python benchmarks/bench_array_ops.py`.
+import time
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+NUM_ELEMENTS = 500
+NUM_REPEATS = 5
+
+
+def copy_loop(target, start, stop):
+    # copies /inp/arr[start..stop] (inclusive) to `target`
+    return [
+        {'op': 'add', 'path': '/ptr', 'value': ['inp', 'arr', 0]},
+        {'op': 'add', 'path': '/copy-op',
+         'value': {'op': 'copy', 'from': 'dummy', 'path': target}},
+        {'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/ptr/2',
+         'start-value-path': start, 'stop-value-path': stop, 'patch': [
+            {'op': 'array/join-path', 'path': '/copy-op/from',
+             'value-path': '/ptr'},
+            {'op': 'ctrl/apply-patch-op', 'path': '',
+             'patch-op-path': '/copy-op'},
+         ]},
+    ]
+
+
+# as `get-array-slice` in examples/03_merge_sort.py
+patch_slice = [
+    {'op': 'add', 'path': '/out', 'value': []},
+] + copy_loop('/out/-', '/inp/start', '/inp/last')
+
+# inserting each element at the front reverses the array
+patch_reverse = [
+    {'op': 'add', 'path': '/out', 'value': []},
+    {'op': 'add', 'path': '/zero', 'value': 0},
+    {'op': 'array/length', 'path': '/last', 'value-path': '/inp/arr'},
+    {'op': 'number/sub', 'path': '/last', 'value': 1},
+] + copy_loop('/out/0', '/zero', '/last')
+
+patch_concat = [
+    {'op': 'copy', 'from': '/inp/left', 'path': '/out'},
+    {'op': 'copy', 'from': '/inp/right', 'path': '/inp/arr'},
+    {'op': 'add', 'path': '/zero', 'value': 0},
+    {'op': 'array/length', 'path': '/last', 'value-path': '/inp/arr'},
+    {'op': 'number/sub', 'path': '/last', 'value': 1},
+] + copy_loop('/out/-', '/zero', '/last')
+
+half = NUM_ELEMENTS // 2
+cases = [
+    (
+        'slice',
+        {'op': 'ctrl/call-func', 'patch': patch_slice, 'arr-path': '/arr',
+         'start': 10, 'last': NUM_ELEMENTS - 11, 'out-path': '/out'},
+        {'op': 'array/slice', 'path': '/out', 'value-path': '/arr',
+         'start': 10, 'stop': NUM_ELEMENTS - 10},
+    ),
+    (
+        'reverse',
+        {'op': 'ctrl/call-func', 'patch': patch_reverse, 'arr-path': '/arr',
+         'out-path': '/out'},
+        {'op': 'array/reverse', 'path': '/out', 'value-path': '/arr'},
+    ),
+    (
+        'concat',
+        {'op': 'ctrl/call-func', 'patch': patch_concat, 'left-path': '/arr',
+         'right-path': '/arr', 'out-path': '/out'},
+        {'op': 'array/concat', 'path': '/out', 'left-value-path': '/arr',
+         'right-value-path': '/arr'},
+    ),
+]
+
+
+def measure(op):
+    patch = ExtJsonPatch.from_python([op], require_decimal=False)
+    best = None
+    for _ in range(NUM_REPEATS):
+        json_doc = JsonFactory.from_python(
+            {'arr': list(range(NUM_ELEMENTS))}, require_decimal=False
+        )
+        context = ExecutionContext(debug=False)
+        start = time.perf_counter()
+        patch.apply(json_doc, context=context)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, context.stats()['ops'], json_doc['out']
+
+
+for name, patch_op, native_op in cases:
+    patch_time, patch_ops, patch_result = measure(patch_op)
+    native_time, native_ops, native_result = measure(native_op)
+    assert patch_result == native_result
+    print(
+        f'{name:8s} patch {patch_time * 1000:8.2f} ms ({patch_ops:5d} ops)  '
+        f'native {native_time * 1000:6.3f} ms  '
+        f'speedup {patch_time / native_time:7.0f}x'
+    )
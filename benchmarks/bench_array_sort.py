@@ -0,0 +1,73 @@
+# Native sorting and merging of arrays versus the merge sort written
+# as patches in examples/03_merge_sort.py, whose functions are used as
+# reference. Run from the repository root via
+# `python benchmarks/bench_array_sort.py`.
+import ast
+import random
+import time
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [16, 64, 256]
+
+
+def load_functions(path='examples/03_merge_sort.py'):
+    with open(path) as f:
+        module = ast.parse(f.read())
+    for node in module.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id == 'json_doc':
+            return ast.literal_eval(node.value)
+
+
+functions = load_functions()
+library = {
+    name: functions[name]
+    for name in ('merge-sort', 'merge-sorted-arrays', 'get-array-slice')
+}
+
+reference_sort = ExtJsonPatch.from_python([{
+    'op': 'ctrl/call-func', 'patch-path': '/merge-sort',
+    'req': {f'{name}-path': f'/{name}' for name in library},
+    'arr-path': '/arr', 'out-path': '/out',
+}], require_decimal=False)
+native_sort = ExtJsonPatch.from_python([
+    {'op': 'array/sort', 'path': '/out', 'value-path': '/arr'},
+], require_decimal=False)
+reference_merge = ExtJsonPatch.from_python([{
+    'op': 'ctrl/call-func', 'patch-path': '/merge-sorted-arrays',
+    'arr1-path': '/left', 'arr2-path': '/right', 'out-path': '/out',
+}], require_decimal=False)
+native_merge = ExtJsonPatch.from_python([
+    {'op': 'array/merge-sorted', 'path': '/out', 'left-value-path': '/left',
+     'right-value-path': '/right'},
+], require_decimal=False)
+
+
+def measure(patch, doc):
+    json_doc = JsonFactory.from_python(doc, require_decimal=False)
+    context = ExecutionContext(debug=False)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    return time.perf_counter() - start, context.stats()['ops'], json_doc['out']
+
+
+rng = random.Random(0)
+for size in SIZES:
+    arr = [rng.randint(0, size) for _ in range(size)]
+    docs = [
+        ('sort', reference_sort, native_sort, dict(library, arr=arr)),
+        ('merge', reference_merge, native_merge, dict(
+            library, left=sorted(arr[:size // 2]), right=sorted(arr[size // 2:])
+        )),
+    ]
+    for name, reference, native, doc in docs:
+        ref_time, ref_ops, ref_result = measure(reference, doc)
+        native_time, _, native_result = measure(native, doc)
+        assert ref_result == native_result
+        print(
+            f'{name:5s} n={size:4d}  patch {ref_time * 1000:9.2f} ms '
+            f'({ref_ops:6d} ops)  native {native_time * 1000:6.3f} ms  '
+            f'speedup {ref_time / native_time:7.0f}x'
+        )
@@ -0,0 +1,73 @@
+# Latency of an asyncio event loop while a long-running patch is
+# applied, blocking versus cooperatively. Run from the repository
+# root via `python benchmarks/bench_async_latency.py`.
+import asyncio
+import time
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+NUM_ITERATIONS = 20000
+
+patch = ExtJsonPatch.from_python([
+    {
+        'op': 'ctrl/while-loop',
+        'path': '/loop',
+        'check-path': '/loop/cont',
+        'patch': [
+            {'op': 'number/add', 'path': '/i', 'value': 1},
+            {
+                'op': 'number/greater',
+                'path': '/cont',
+                'left-value': NUM_ITERATIONS,
+                'right-value-path': '/i',
+            },
+        ],
+    },
+], require_decimal=False)
+
+
+def make_doc():
+    return JsonFactory.from_python(
+        {'loop': {'i': 0, 'cont': True}}, require_decimal=False
+    )
+
+
+async def measure(apply):
+    gaps = []
+    done = False
+
+    async def service():
+        # stands in for request handlers of the service
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            gaps.append(now - last - 0.001)
+            last = now
+
+    task = asyncio.ensure_future(service())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await apply(make_doc())
+    elapsed = time.perf_counter() - start
+    done = True
+    await task
+    gaps.sort()
+    return elapsed, gaps[int(0.99 * (len(gaps) - 1))], gaps[-1]
+
+
+async def blocking(json_doc):
+    patch.apply(json_doc)
+
+
+async def cooperative(json_doc):
+    await patch.apply_async(json_doc, time_slice=0.002)
+
+
+for name, apply in [('blocking', blocking), ('cooperative', cooperative)]:
+    elapsed, p99, worst = asyncio.run(measure(apply))
+    print(
+        f'{name:12s} patch {elapsed * 1000:8.1f} ms  '
+        f'p99 delay {p99 * 1000:8.2f} ms  max delay {worst * 1000:8.2f} ms'
+    )
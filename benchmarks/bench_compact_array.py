@@ -0,0 +1,63 @@
+# Memory and access times of numeric arrays stored as a list of
+# `JsonNumber` versus a `CompactNumberArray`. Run from the repository
+# root via `python benchmarks/bench_compact_array.py`.
+import random
+import timeit
+import tracemalloc
+from copy import deepcopy
+from decimal import Decimal
+from jotvm.json_pointer import JsonPointer
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.compact_array import compact_arrays
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZE = 100000
+
+rng = random.Random(0)
+columns = {
+    'integers': [rng.randint(-10**9, 10**9) for _ in range(SIZE)],
+    'prices': [Decimal(rng.randint(0, 10**7)).scaleb(-2) for _ in range(SIZE)],
+}
+sum_patch = ExtJsonPatch.from_python([
+    {'op': 'array/sum', 'path': '/sum', 'value-path': '/arr'},
+], require_decimal=False)
+pointer = JsonPointer(f'/arr/{SIZE // 2}')
+
+
+def build(values, compact):
+    json_doc = JsonFactory.from_python({'arr': values})
+    return compact_arrays(json_doc) if compact else json_doc
+
+
+def allocated(values, compact):
+    tracemalloc.start()
+    json_doc = build(values, compact)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+for name, values in columns.items():
+    plain_doc, compact_doc = build(values, False), build(values, True)
+    assert plain_doc == compact_doc
+    assert plain_doc.to_json() == compact_doc.to_json()
+    print(f'{name} ({SIZE} elements)')
+    plain = allocated(values, False) / SIZE
+    packed = allocated(values, True) / SIZE
+    print(f'  {"bytes/element":15s} list {plain:9.1f}  compact {packed:9.1f}')
+    for label, func, number in [
+        ('pointer get us', lambda d: pointer.get(d), 10000),
+        ('array/sum ms', lambda d: sum_patch.apply(d), 5),
+        ('to_json ms', lambda d: d.to_json(), 5),
+        ('deepcopy ms', lambda d: deepcopy(d), 5),
+    ]:
+        scale = 1e6 if label.endswith('us') else 1e3
+        plain = per_call(lambda: func(plain_doc), number) * scale
+        packed = per_call(lambda: func(compact_doc), number) * scale
+        print(f'  {label:15s} list {plain:9.3f}  compact {packed:9.3f}')
+    assert compact_doc['arr'].is_packed
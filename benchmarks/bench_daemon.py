@@ -0,0 +1,83 @@
+# Latency of repeated evaluations of a bundle function: a new
+# interpreter per evaluation versus requests to a running daemon. Run
+# from the repository root via `python benchmarks/bench_daemon.py`.
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from jotvm.daemon import (
+    DaemonClient,
+    EvaluationDaemon,
+)
+from jotvm.json.json_factory import JsonFactory
+
+
+NUM_EVALUATIONS = 20
+NUM_FUNCTIONS = 200
+
+# a library of many small functions, one of which is evaluated
+bundle = JsonFactory.from_python({
+    f'scale-{i}': [
+        {'op': 'copy', 'from': '/inp/x', 'path': '/out'},
+        {'op': 'number/mul', 'path': '/out', 'value': i},
+        {'op': 'number/add', 'path': '/out', 'value': 1},
+    ]
+    for i in range(NUM_FUNCTIONS)
+}, require_decimal=False)
+
+SCRIPT = '''
+import sys
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+bundle = JsonFactory.from_json(open(sys.argv[1]).read())
+patch = ExtJsonPatch.from_json_array(bundle[sys.argv[2]])
+doc = JsonFactory.from_json(sys.argv[3])
+print(patch.call(doc, bundle).to_json())
+'''
+
+
+def new_interpreter(bundle_path):
+    latencies = []
+    for i in range(NUM_EVALUATIONS):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-c', SCRIPT, bundle_path, 'scale-7',
+             f'{{"x":{i}}}'],
+            capture_output=True, check=True
+        )
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def daemon_requests(socket_path):
+    latencies = []
+    with DaemonClient(socket_path) as client:
+        key = client.register(bundle)
+        for i in range(NUM_EVALUATIONS):
+            start = time.perf_counter()
+            client.apply({'x': i}, bundle=key, function='scale-7')
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    bundle_path = os.path.join(tmp_dir, 'bundle.json')
+    with open(bundle_path, 'w') as f:
+        f.write(bundle.to_json())
+    socket_path = os.path.join(tmp_dir, 'jotvm.sock')
+    daemon = EvaluationDaemon()
+    daemon.start(socket_path)
+    try:
+        for name, run, arg in [
+            ('new interpreter', new_interpreter, bundle_path),
+            ('daemon', daemon_requests, socket_path),
+        ]:
+            latencies = sorted(run(arg))
+            median = latencies[len(latencies) // 2]
+            print(
+                f'{name:16s} median {median * 1000:8.2f} ms  '
+                f'max {latencies[-1] * 1000:8.2f} ms'
+            )
+    finally:
+        daemon.shutdown()
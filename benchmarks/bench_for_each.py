@@ -0,0 +1,71 @@
+# Loops over array elements with `ctrl/for-each` versus the idiom of
+# a `ctrl/for-loop` counter turned into a pointer by `array/join-path`,
+# for a loop copying all elements and a loop copying a slice. Run from
+# the repository root via `python benchmarks/bench_for_each.py`.
+import time
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [64, 256, 1024]
+
+
+def counter_loop(start, stop):
+    # `stop` is inclusive for `ctrl/for-loop`
+    return ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/out', 'value': []},
+        {'op': 'add', 'path': '/idx', 'value': ['arr', 0]},
+        {'op': 'add', 'path': '/copy-op',
+         'value': {'op': 'copy', 'from': '', 'path': '/out/-'}},
+        {
+            'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/idx/1',
+            'start-value': start, 'stop-value': stop - 1,
+            'patch': [
+                {'op': 'array/join-path', 'path': '/copy-op/from',
+                 'value-path': '/idx'},
+                {'op': 'ctrl/apply-patch-op', 'path': '',
+                 'patch-op-path': '/copy-op'},
+            ],
+        },
+    ], require_decimal=False)
+
+
+def for_each_loop(start, stop):
+    return ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/out', 'value': []},
+        {
+            'op': 'ctrl/for-each', 'path': '', 'array-path': '/arr',
+            'item-path': '/x', 'start': start, 'stop': stop,
+            'patch': [
+                {'op': 'copy', 'from': '/x', 'path': '/out/-'},
+            ],
+        },
+    ], require_decimal=False)
+
+
+def measure(patch, arr):
+    json_doc = JsonFactory.from_python({'arr': arr}, require_decimal=False)
+    context = ExecutionContext(debug=False)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    return time.perf_counter() - start, context.stats()['ops'], json_doc['out']
+
+
+for size in SIZES:
+    arr = [{'id': i, 'tags': ['a', 'b']} for i in range(size)]
+    loops = [
+        ('copy', 0, size),
+        ('slice', size // 4, size - size // 4),
+    ]
+    for name, start, stop in loops:
+        ref_time, ref_ops, ref_result = measure(counter_loop(start, stop), arr)
+        each_time, each_ops, each_result = measure(for_each_loop(start, stop), arr)
+        assert ref_result == each_result == JsonFactory.from_python(
+            arr[start:stop], require_decimal=False
+        )
+        print(
+            f'{name:5s} n={size:5d}  for-loop {ref_time * 1000:8.2f} ms '
+            f'({ref_ops:5d} ops)  for-each {each_time * 1000:7.2f} ms '
+            f'({each_ops:5d} ops)  speedup {ref_time / each_time:5.1f}x'
+        )
@@ -0,0 +1,49 @@
+# Updates of the first element of large arrays via `remove` followed
+# by `add`, which shifts all following elements twice, versus the
+# in-place `JsonPointer.set`, and the time per value-updating op.
+# Run from the repository root via `python benchmarks/bench_in_place_update.py`.
+import timeit
+from jotvm.json_pointer import JsonPointer
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json.json_types import JsonNumber
+
+
+SIZES = [1000, 100000, 1000000]
+NUMBER = 200
+
+pointer = JsonPointer('/arr/0')
+value = JsonNumber(1)
+patches = {
+    name: ExtJsonPatch.from_python([op] * NUMBER, require_decimal=False)
+    for name, op in [
+        ('replace', {'op': 'replace', 'path': '/arr/0', 'value': 1}),
+        ('number/add', {'op': 'number/add', 'path': '/arr/0', 'value': 1}),
+        ('number/trunc', {'op': 'number/trunc', 'path': '/arr/0'}),
+    ]
+}
+
+
+def remove_add(json_doc):
+    pointer.remove(json_doc)
+    pointer.add(json_doc, value)
+
+
+def per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+for size in SIZES:
+    json_doc = JsonFactory.from_python(
+        {'arr': list(range(size))}, require_decimal=False
+    )
+    old = per_call(lambda: remove_add(json_doc), NUMBER) * 1e6
+    new = per_call(lambda: pointer.set(json_doc, value), NUMBER) * 1e6
+    print(
+        f'n={size:8d}  remove+add {old:9.2f} us  set {new:6.2f} us  '
+        f'speedup {old / new:6.0f}x'
+    )
+    for name, patch in patches.items():
+        op_time = per_call(lambda: patch.apply(json_doc), 1) / NUMBER * 1e6
+        print(f'  {name:12s} {op_time:8.2f} us/op')
+    assert len(json_doc['arr']) == size and json_doc['arr'][1] == 1
@@ -0,0 +1,67 @@
+# Benchmark of JsonPatch.from_diff on a large,
+# mostly unchanged document. Run from the repository
+# root via `python benchmarks/bench_json_diff.py`.
+import random
+import time
+from copy import deepcopy
+from jotvm.json_patch import JsonPatch
+from jotvm.json_diff import JsonDiff
+from jotvm.json.json_factory import JsonFactory
+
+
+NUM_RECORDS = 10000
+NUM_CHANGES = 20
+
+rng = random.Random(42)
+
+old_doc = {
+    'records': [
+        {'id': i, 'name': f'record-{i}', 'tags': ['a', 'b'], 'value': i * 3}
+        for i in range(NUM_RECORDS)
+    ],
+    'index': {f'record-{i}': i for i in range(NUM_RECORDS)},
+}
+new_doc = deepcopy(old_doc)
+records = new_doc['records']
+for _ in range(NUM_CHANGES):
+    records[rng.randrange(len(records))]['value'] += 1
+    records.insert(rng.randrange(len(records)), {'id': -1, 'name': 'new'})
+    del records[rng.randrange(len(records))]
+    records.insert(rng.randrange(len(records)), records.pop(rng.randrange(len(records))))
+    new_doc['index'][f'extra-{rng.random()}'] = 0
+
+old_doc = JsonFactory.from_python(old_doc, require_decimal=False)
+new_doc = JsonFactory.from_python(new_doc, require_decimal=False)
+
+start = time.perf_counter()
+patch = JsonPatch.from_diff(old_doc, new_doc)
+diff_time = time.perf_counter() - start
+
+patched_doc = deepcopy(old_doc)
+patch.apply(patched_doc)
+
+differ = JsonDiff()
+assert differ.content_hash(patched_doc) == differ.content_hash(new_doc)
+
+# a small change diffed again with the hashes of the unchanged subtrees
+tracked = JsonDiff()
+with tracked.track():
+    tracked.diff(patched_doc, new_doc)
+    change = JsonPatch.from_python([
+        {'op': 'replace', 'path': '/records/0/value', 'value': -1},
+    ], require_decimal=False)
+    start = time.perf_counter()
+    change.apply(patched_doc)
+    assert len(tracked.diff(patched_doc, new_doc)) == 1
+    rediff_time = time.perf_counter() - start
+
+num_ops = len(patch.to_python())
+patch_size = len(patch.to_json_array().to_json())
+doc_size = len(new_doc.to_json())
+
+print(f'records:              {NUM_RECORDS}')
+print(f'diff time:            {diff_time:.3f} s')
+print(f're-diff time:         {rediff_time:.3f} s')
+print(f'patch operations:     {num_ops}')
+print(f'patch size:           {patch_size} bytes')
+print(f'document size:        {doc_size} bytes')
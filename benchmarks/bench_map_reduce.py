@@ -0,0 +1,93 @@
+# Native `ctrl/map-func` versus the map written as patches in
+# examples/01_array_funcs.py, and sequential versus parallel mapping
+# of an expensive function. Run from the repository root via
+# `python benchmarks/bench_map_reduce.py`.
+import ast
+import os
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [16, 64, 256]
+NUM_ITERATIONS = 200
+
+
+def load_functions(path='examples/01_array_funcs.py'):
+    with open(path) as f:
+        module = ast.parse(f.read())
+    for node in module.body:
+        if isinstance(node, ast.Assign) and node.targets[0].id == 'json_doc':
+            return ast.literal_eval(node.value)
+
+
+functions = load_functions()
+
+reference_map = ExtJsonPatch.from_python([{
+    'op': 'ctrl/call-func', 'patch-path': '/map-func',
+    'func-path': '/scale-number', 'arr-path': '/arr', 'fact': 5,
+    'out-path': '/out',
+}], require_decimal=False)
+native_map = ExtJsonPatch.from_python([{
+    'op': 'ctrl/map-func', 'patch-path': '/scale-number',
+    'array-path': '/arr', 'fact': 5, 'out-path': '/out',
+}], require_decimal=False)
+
+# sums `x` NUM_ITERATIONS times
+expensive_func = [
+    {'op': 'add', 'path': '/out', 'value': 0},
+    {
+        'op': 'ctrl/for-loop', 'path': '', 'start-value': 0,
+        'stop-value': NUM_ITERATIONS - 1, 'counter-path': '/i',
+        'patch': [
+            {'op': 'number/add', 'path': '/out', 'value-path': '/inp/x'},
+        ],
+    },
+]
+parallel_map = ExtJsonPatch.from_python([{
+    'op': 'ctrl/map-func', 'patch-path': '/func', 'parallel': True,
+    'array-path': '/arr', 'out-path': '/out',
+}], require_decimal=False)
+
+
+def measure(patch, doc, executor=None):
+    json_doc = JsonFactory.from_python(doc, require_decimal=False)
+    context = ExecutionContext(debug=False, executor=executor)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    return time.perf_counter() - start, context.stats()['ops'], json_doc['out']
+
+
+def main():
+    for size in SIZES:
+        doc = dict(functions, arr=list(range(size)))
+        ref_time, ref_ops, ref_result = measure(reference_map, doc)
+        native_time, native_ops, native_result = measure(native_map, doc)
+        assert ref_result == native_result
+        print(
+            f'map n={size:4d}  patch {ref_time * 1000:8.2f} ms '
+            f'({ref_ops:5d} ops)  native {native_time * 1000:7.2f} ms '
+            f'({native_ops:5d} ops)  speedup {ref_time / native_time:5.1f}x'
+        )
+
+    num_workers = os.cpu_count() or 1
+    doc = {'func': expensive_func, 'arr': list(range(4 * num_workers))}
+    seq_time, _, seq_result = measure(parallel_map, doc)
+    print(f'expensive map, {len(doc["arr"])} elements, {num_workers} CPUs')
+    print(f'  sequential {seq_time * 1000:8.1f} ms')
+    for executor_class in (ThreadPoolExecutor, ProcessPoolExecutor):
+        with executor_class(num_workers) as executor:
+            # warm up the workers
+            measure(parallel_map, doc, executor)
+            par_time, _, par_result = measure(parallel_map, doc, executor)
+        assert par_result == seq_result
+        print(f'  {executor_class.__name__:19s} {par_time * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
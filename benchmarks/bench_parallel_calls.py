@@ -0,0 +1,63 @@
+# Sequential versus concurrent application of independent
+# `ctrl/call-func` operations. Run from the repository root via
+# `python benchmarks/bench_parallel_calls.py`.
+import os
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+NUM_CALLS = 16
+NUM_ITERATIONS = 300
+
+json_doc = JsonFactory.from_python({
+    'func': [
+        {'op': 'add', 'path': '/out', 'value': 0},
+        {
+            'op': 'ctrl/for-loop',
+            'path': '',
+            'start-value': 0,
+            'stop-value': NUM_ITERATIONS - 1,
+            'counter-path': '/i',
+            'patch': [
+                {'op': 'number/add', 'path': '/out', 'value-path': '/inp/x'},
+            ],
+        },
+    ],
+    'inputs': list(range(NUM_CALLS)),
+    'results': {},
+}, require_decimal=False)
+
+patch = ExtJsonPatch.from_python([
+    {
+        'op': 'ctrl/call-func',
+        'patch-path': '/func',
+        'x-path': f'/inputs/{i}',
+        'out-path': f'/results/r{i}',
+    }
+    for i in range(NUM_CALLS)
+], require_decimal=False)
+
+
+def run(name, executor):
+    doc = deepcopy(json_doc)
+    start = time.perf_counter()
+    patch.apply(doc, executor=executor)
+    elapsed = time.perf_counter() - start
+    assert doc['results'][f'r{NUM_CALLS - 1}'] == (NUM_CALLS - 1) * NUM_ITERATIONS
+    print(f'{name:20s} {elapsed * 1000:10.1f} ms')
+
+
+num_cpus = os.cpu_count() or 1
+run('sequential', None)
+with ThreadPoolExecutor(num_cpus) as executor:
+    run(f'thread workers={num_cpus}', executor)
+with ProcessPoolExecutor(num_cpus) as executor:
+    # start the workers before measuring
+    list(executor.map(abs, range(num_cpus)))
+    run(f'process workers={num_cpus}', executor)
@@ -0,0 +1,71 @@
+# A loop reading its configuration and operations via `*-path` fields,
+# before and after partial evaluation with the configuration and code
+# declared immutable, and the time of a specialization and a cache hit.
+# Run from the repository root via `python benchmarks/bench_partial_eval.py`.
+import time
+from copy import deepcopy
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json_patch_specialize import PartialEvaluator
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [100, 1000]
+IMMUTABLE = ['/config', '/code']
+
+patch = ExtJsonPatch.from_python([
+    {'op': 'add', 'path': '/acc', 'value': 0},
+    {'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/i',
+     'start-value': 1, 'stop-value-path': '/config/size', 'patch': [
+         {'op': 'number/greater', 'path': '/scaled',
+          'left-value-path': '/config/factor',
+          'right-value-path': '/config/threshold'},
+         {'op': 'ctrl/cond-apply-patch-op', 'path': '',
+          'check-path': '/config/verbose',
+          'true-patch-op': {'op': 'add', 'path': '/log/-', 'value': 'step'}},
+         {'op': 'ctrl/apply-patch-op', 'path': '',
+          'patch-op-path': '/code/accumulate'},
+         {'op': 'number/add', 'path': '/acc', 'value-path': '/config/offset'},
+     ]},
+])
+
+
+def document(size):
+    return JsonFactory.from_python({
+        'config': {'size': size, 'factor': 3, 'threshold': 2,
+                   'verbose': False, 'offset': 1},
+        'code': {'accumulate': {'op': 'number/add', 'path': '/acc',
+                                'value-path': '/config/factor'}},
+        'log': [],
+    })
+
+
+def measure(patch, json_doc):
+    json_doc = deepcopy(json_doc)
+    context = ExecutionContext(debug=False)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    return time.perf_counter() - start, context.stats()['ops'], json_doc
+
+
+for size in SIZES:
+    json_doc = document(size)
+    evaluator = PartialEvaluator(IMMUTABLE)
+    start = time.perf_counter()
+    specialized = evaluator.specialize(patch, json_doc)
+    specialize_time = time.perf_counter() - start
+    start = time.perf_counter()
+    assert evaluator.specialize(patch, json_doc) is specialized
+    hit_time = time.perf_counter() - start
+    orig_time, orig_ops, orig_doc = measure(patch, json_doc)
+    spec_time, spec_ops, spec_doc = measure(specialized, json_doc)
+    assert orig_doc == spec_doc
+    print(
+        f'n={size:5d}  original {orig_time * 1000:8.2f} ms ({orig_ops:5d} ops)'
+        f'  specialized {spec_time * 1000:8.2f} ms ({spec_ops:5d} ops)'
+        f'  speedup {orig_time / spec_time:4.1f}x'
+        f'  specialize {specialize_time * 1000:.2f} ms'
+        f'  cache hit {hit_time * 1000:.3f} ms'
+    )
+
+print(specialized.to_python()[1]['patch'])
@@ -0,0 +1,53 @@
+# Benchmark of JsonPatch.compose on a backlog of small patches
+# that repeatedly update the same document. Run from the
+# repository root via `python benchmarks/bench_patch_compose.py`.
+import random
+import time
+from copy import deepcopy
+from jotvm.json_patch import JsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+NUM_PATCHES = 2000
+NUM_COUNTERS = 50
+
+rng = random.Random(42)
+
+base_doc = JsonFactory.from_python({
+    'counters': {f'c{i}': 0 for i in range(NUM_COUNTERS)},
+    'log': [],
+}, require_decimal=False)
+
+backlog = []
+for n in range(NUM_PATCHES):
+    key = f'c{rng.randrange(NUM_COUNTERS)}'
+    backlog.append(JsonPatch.from_python([
+        {'op': 'add', 'path': '/staging', 'value': {'n': n, 'items': []}},
+        {'op': 'add', 'path': '/staging/items/-', 'value': key},
+        {'op': 'replace', 'path': f'/counters/{key}', 'value': n},
+        {'op': 'move', 'from': '/staging', 'path': f'/last_{n % 5}'},
+        {'op': 'remove', 'path': f'/last_{n % 5}'},
+    ], require_decimal=False))
+num_ops = sum(len(patch.to_python()) for patch in backlog)
+
+start = time.perf_counter()
+composed = JsonPatch.compose(*backlog, assume_new_members=True)
+compose_time = time.perf_counter() - start
+
+replay_doc = deepcopy(base_doc)
+start = time.perf_counter()
+for patch in backlog:
+    patch.apply(replay_doc)
+replay_time = time.perf_counter() - start
+
+composed_doc = deepcopy(base_doc)
+start = time.perf_counter()
+composed.apply(composed_doc)
+composed_time = time.perf_counter() - start
+assert composed_doc == replay_doc
+
+print(f'backlog operations:   {num_ops}')
+print(f'composed operations:  {len(composed.to_python())}')
+print(f'compose time:         {compose_time:.3f} s')
+print(f'backlog replay time:  {replay_time:.3f} s')
+print(f'composed apply time:  {composed_time:.3f} s')
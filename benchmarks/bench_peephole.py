@@ -0,0 +1,69 @@
+# A generated loop with copies into scratch values, before and after
+# the peephole optimizer, together with the report of the rewrites.
+# Run from the repository root via `python benchmarks/bench_peephole.py`.
+import time
+from copy import deepcopy
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json_patch_optimize import PeepholeOptimizer
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [100, 1000]
+
+
+def loop(size):
+    return [
+        {'op': 'add', 'path': '/i', 'value': 0},
+        {'op': 'add', 'path': '/any', 'value': False},
+        {'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/i',
+         'start-value': 0, 'stop-value': size - 1, 'patch': [
+             # flag = flags[i] or any
+             {'op': 'copy', 'from-segments': ['flags', {'value-path': '/i'}],
+              'path': '/flag'},
+             {'op': 'copy', 'from': '/flag', 'path': '/tmp'},
+             {'op': 'bool/or', 'path': '/tmp', 'value-path': '/any'},
+             {'op': 'copy', 'from': '/tmp', 'path': '/any'},
+             {'op': 'remove', 'path': '/tmp'},
+             # pointer to the current flag for a later operation
+             {'op': 'array/join-path', 'path': '/ptr',
+              'value': ['flags', 'last']},
+             {'op': 'copy', 'from': '/ptr', 'path': '/read-op/from'},
+             {'op': 'remove', 'path': '/ptr'},
+             {'op': 'add', 'path': '/scratch', 'value': {'unused': [1, 2]}},
+             {'op': 'remove', 'path': '/scratch'},
+         ]},
+    ]
+
+
+def measure(patch, doc):
+    json_doc = deepcopy(doc)
+    context = ExecutionContext(debug=False)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    return time.perf_counter() - start, context.stats()['ops'], json_doc
+
+
+for size in SIZES:
+    doc = JsonFactory.from_python({
+        'flags': [i % 7 == 3 for i in range(size)], 'read-op': {},
+    })
+    patch_ops = JsonFactory.from_python(loop(size))
+    optimizer = PeepholeOptimizer(assume_new_members=True)
+    optimized = ExtJsonPatch.from_json_array(optimizer.optimize(patch_ops))
+    patch = ExtJsonPatch.from_json_array(patch_ops)
+    orig_time, orig_ops, orig_doc = measure(patch, doc)
+    opt_time, opt_ops, opt_doc = measure(optimized, doc)
+    assert orig_doc == opt_doc
+    print(
+        f'n={size:5d}  original {orig_time * 1000:8.2f} ms ({orig_ops:5d} ops)'
+        f'  optimized {opt_time * 1000:8.2f} ms ({opt_ops:5d} ops)'
+        f'  speedup {orig_time / opt_time:4.1f}x'
+    )
+
+print(f'{optimizer.num_eliminated} operations eliminated:')
+for rewrite in optimizer.rewrites:
+    eliminated = ', '.join(op['op'].value for op in rewrite.eliminated)
+    replacement = ', '.join(op['op'].value for op in rewrite.replacement)
+    print(f'  {rewrite.location:10s} {rewrite.rule:17s} '
+          f'{eliminated} -> {replacement or "-"}')
@@ -0,0 +1,79 @@
+# Dynamic addressing of array elements with `path-segments` versus
+# building a pointer string with `array/join-path` and applying an
+# operation given as data, plus the cost of parsing pointer strings
+# with and without the parse cache. Run from the repository root via
+# `python benchmarks/bench_pointer_segments.py`.
+import time
+import timeit
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json_pointer import (
+    JsonPointer,
+    _parse,
+)
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [64, 256, 1024]
+
+
+def join_path_loop(size):
+    return ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/math-op',
+         'value': {'op': 'number/mul', 'path': '', 'value': 3}},
+        {'op': 'add', 'path': '/idx', 'value': ['arr', 0]},
+        {
+            'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/idx/1',
+            'start-value': 0, 'stop-value': size - 1,
+            'patch': [
+                {'op': 'array/join-path', 'path': '/math-op/path',
+                 'value-path': '/idx'},
+                {'op': 'ctrl/apply-patch-op', 'path': '',
+                 'patch-op-path': '/math-op'},
+            ],
+        },
+    ], require_decimal=False)
+
+
+def segments_loop(size):
+    return ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/i', 'value': 0},
+        {
+            'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/i',
+            'start-value': 0, 'stop-value': size - 1,
+            'patch': [
+                {'op': 'number/mul', 'value': 3,
+                 'path-segments': ['arr', {'value-path': '/i'}]},
+            ],
+        },
+    ], require_decimal=False)
+
+
+def measure(patch, size):
+    json_doc = JsonFactory.from_python(
+        {'arr': list(range(size))}, require_decimal=False
+    )
+    context = ExecutionContext(debug=False)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    return time.perf_counter() - start, context.stats()['ops'], json_doc['arr']
+
+
+for size in SIZES:
+    ref_time, ref_ops, ref_result = measure(join_path_loop(size), size)
+    seg_time, seg_ops, seg_result = measure(segments_loop(size), size)
+    assert ref_result == seg_result
+    print(
+        f'n={size:5d}  join-path {ref_time * 1000:8.2f} ms ({ref_ops:5d} ops)'
+        f'  segments {seg_time * 1000:8.2f} ms ({seg_ops:5d} ops)'
+        f'  speedup {ref_time / seg_time:4.1f}x'
+    )
+
+pointer = '/data/items/12/tags/0'
+number = 100000
+cached = timeit.timeit(lambda: JsonPointer(pointer), number=number)
+uncached = timeit.timeit(lambda: _parse.__wrapped__(pointer), number=number)
+print(
+    f'{pointer}: pointer from cache {cached / number * 1e6:.2f} us, '
+    f'parsing alone {uncached / number * 1e6:.2f} us'
+)
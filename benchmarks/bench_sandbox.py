@@ -0,0 +1,72 @@
+# Overhead of running short untrusted patches in separate processes:
+# a new interpreter per job versus the pre-forked sandbox pool. Run
+# from the repository root via `python benchmarks/bench_sandbox.py`.
+import subprocess
+import sys
+import time
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.sandbox import SandboxPool
+
+
+NUM_JOBS = 50
+
+patch = ExtJsonPatch.from_python([
+    {'op': 'add', 'path': '/total', 'value': 0},
+    {'op': 'number/add', 'path': '/total', 'value-path': '/x'},
+    {'op': 'number/mul', 'path': '/total', 'value-path': '/x'},
+], require_decimal=False)
+
+SCRIPT = '''
+import sys
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+patch = ExtJsonPatch.from_json_array(JsonFactory.from_json(sys.argv[1]))
+doc = JsonFactory.from_json(sys.stdin.read())
+patch.apply(doc)
+print(doc.to_json())
+'''
+
+
+def make_docs():
+    return [
+        JsonFactory.from_python({'x': i}, require_decimal=False)
+        for i in range(NUM_JOBS)
+    ]
+
+
+def new_interpreter():
+    patch_json = patch.to_json_array().to_json()
+    for doc in make_docs():
+        subprocess.run(
+            [sys.executable, '-c', SCRIPT, patch_json],
+            input=doc.to_json(), capture_output=True, text=True, check=True
+        )
+
+
+def pool(max_jobs_per_worker):
+    with SandboxPool(
+        max_workers=1, cpu_time=5, max_memory=2**30,
+        max_jobs_per_worker=max_jobs_per_worker
+    ) as sandbox:
+        for doc in make_docs():
+            assert sandbox.apply(patch, doc).ok
+
+
+def in_process():
+    for doc in make_docs():
+        patch.apply(doc)
+
+
+# the workers are started via a fork server, which imports this module
+if __name__ == '__main__':
+    for name, run in [
+        ('new interpreter', new_interpreter),
+        ('fork per job', lambda: pool(1)),
+        ('pre-forked pool', lambda: pool(1000)),
+        ('in process', in_process),
+    ]:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f'{name:16s} {elapsed / NUM_JOBS * 1000:8.2f} ms per job')
@@ -0,0 +1,64 @@
+# Turnaround of short patch applications queued behind long-running
+# loops, first come first served versus the fair scheduler. Run from
+# the repository root via `python benchmarks/bench_scheduler.py`.
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.scheduler import PatchScheduler
+
+
+NUM_LONG = 4
+NUM_SHORT = 200
+
+
+def make_patch(num_iterations):
+    return ExtJsonPatch.from_python([
+        {
+            'op': 'ctrl/while-loop',
+            'path': '/loop',
+            'check-path': '/loop/cont',
+            'patch': [
+                {'op': 'number/add', 'path': '/i', 'value': 1},
+                {
+                    'op': 'number/greater',
+                    'path': '/cont',
+                    'left-value': num_iterations,
+                    'right-value-path': '/i',
+                },
+            ],
+        },
+    ], require_decimal=False)
+
+
+def make_doc():
+    return JsonFactory.from_python(
+        {'loop': {'i': 0, 'cont': True}}, require_decimal=False
+    )
+
+
+long_patch = make_patch(20000)
+short_patch = make_patch(10)
+
+
+def measure(quantum):
+    scheduler = PatchScheduler(quantum=quantum)
+    for _ in range(NUM_LONG):
+        scheduler.submit(long_patch, make_doc(), tenant='batch')
+    jobs = [
+        scheduler.submit(short_patch, make_doc(), tenant=f'user{i % 20}')
+        for i in range(NUM_SHORT)
+    ]
+    start = scheduler.clock()
+    scheduler.run()
+    elapsed = scheduler.clock() - start
+    turnaround = sorted(job.finished_at - job.submitted_at for job in jobs)
+    return elapsed, turnaround[len(turnaround) // 2], turnaround[-1]
+
+
+# a quantum larger than any job amounts to first come first served
+for name, quantum in [('fcfs', 10**9), ('fair', 100)]:
+    elapsed, median, worst = measure(quantum)
+    print(
+        f'{name:6s} total {elapsed * 1000:8.1f} ms  '
+        f'short jobs median {median * 1000:8.2f} ms  '
+        f'max {worst * 1000:8.2f} ms'
+    )
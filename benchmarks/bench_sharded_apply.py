@@ -0,0 +1,57 @@
+# Sequential versus sharded application of `ctrl/apply-patch`
+# operations to the records of a document. Run from the repository
+# root via `python benchmarks/bench_sharded_apply.py`.
+import os
+import time
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.sharding import apply_sharded
+
+
+NUM_RECORDS = 2000
+
+json_doc = JsonFactory.from_python({
+    'lib': {
+        'fix': [
+            {'op': 'add', 'path': '/total', 'value': 0},
+            {
+                'op': 'ctrl/for-loop',
+                'path': '',
+                'start-value': 0,
+                'stop-value': 19,
+                'counter-path': '/i',
+                'patch': [
+                    {'op': 'number/add', 'path': '/total', 'value-path': '/i'},
+                ],
+            },
+            {'op': 'add', 'path': '/items/-', 'value-path': '/total'},
+        ],
+    },
+    'records': {
+        f'r{i}': {'id': i, 'i': 0, 'items': list(range(10))}
+        for i in range(NUM_RECORDS)
+    },
+}, require_decimal=False)
+
+patch = ExtJsonPatch.from_python([
+    {'op': 'ctrl/apply-patch', 'path': f'/records/r{i}', 'patch-path': '/lib/fix'}
+    for i in range(NUM_RECORDS)
+], require_decimal=False)
+
+
+def run(name, apply):
+    doc = deepcopy(json_doc)
+    start = time.perf_counter()
+    apply(doc)
+    elapsed = time.perf_counter() - start
+    assert doc['records']['r0']['total'] == 190
+    print(f'{name:24s} {NUM_RECORDS / elapsed:10.1f} records/s')
+
+
+num_cpus = os.cpu_count() or 1
+run('sequential', patch.apply)
+for max_workers in sorted(set([1, 2, num_cpus])):
+    run(f'sharded workers={max_workers}', lambda doc: apply_sharded(
+        patch, doc, '/records', max_workers=max_workers, chunksize=100
+    ))
@@ -0,0 +1,66 @@
+# Compares shipping a large function library with every document
+# to worker processes against mounting it from shared memory.
+# Run from the repository root via
+# `python benchmarks/bench_shared_document.py`.
+import os
+import time
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.batch import apply_many
+from jotvm.shared_document import (
+    SharedJsonDocument,
+    encode_document,
+)
+
+
+NUM_DOCS = 200
+CHUNKSIZE = 20
+MAX_WORKERS = os.cpu_count() or 1
+
+library = JsonFactory.from_python({
+    'double': [
+        {'op': 'add', 'path': '/out', 'value-path': '/inp/x'},
+        {'op': 'number/mul', 'path': '/out', 'value': 2},
+    ],
+    'tables': [
+        {'name': f'table-{i}', 'rows': [[j, j * 0.5, str(j)] for j in range(50)]}
+        for i in range(40)
+    ],
+}, require_decimal=False)
+
+patch = ExtJsonPatch.from_python([
+    {
+        'op': 'ctrl/call-func',
+        'patch-path': '/req/double',
+        'x-path': '/value',
+        'out-path': '/result',
+    },
+], require_decimal=False)
+
+
+def make_docs(with_library):
+    docs = []
+    for i in range(NUM_DOCS):
+        doc = JsonFactory.from_python({'value': i}, require_decimal=False)
+        if with_library:
+            doc['req'] = deepcopy(library)
+        docs.append(doc)
+    return docs
+
+
+def run(label, docs, **kwargs):
+    start = time.perf_counter()
+    results = list(apply_many(
+        patch, docs, executor='process', max_workers=MAX_WORKERS,
+        chunksize=CHUNKSIZE, **kwargs
+    ))
+    elapsed = time.perf_counter() - start
+    assert all(result.ok for result in results)
+    print(f'{label:24s} {NUM_DOCS / elapsed:10.1f} docs/s')
+
+
+print(f'encoded library size:    {len(encode_document(library))} bytes')
+run('library per document', make_docs(True))
+with SharedJsonDocument.create(library) as shared_doc:
+    run('shared library', make_docs(False), shared={'/req': shared_doc})
@@ -0,0 +1,79 @@
+# Element-wise `number/add` and the numeric reductions `array/sum`
+# and `array/dot` versus loops over the elements written as patches.
+# Run from the repository root via `python benchmarks/bench_vector_ops.py`.
+import random
+import time
+from decimal import Decimal
+from jotvm.context import ExecutionContext
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+SIZES = [64, 256, 1024]
+
+
+def counter_loop(size, patch_ops):
+    return [
+        {'op': 'add', 'path': '/i', 'value': 0},
+        {'op': 'ctrl/for-loop', 'path': '', 'counter-path': '/i',
+         'start-value': 0, 'stop-value': size - 1, 'patch': patch_ops},
+    ]
+
+
+def cases(size):
+    element = ['a', {'value-path': '/i'}]
+    yield 'add', counter_loop(size, [
+        {'op': 'number/add', 'path-segments': element,
+         'value-path-segments': ['b', {'value-path': '/i'}]},
+    ]), [
+        {'op': 'number/add', 'path': '/a', 'elementwise': True,
+         'value-path': '/b'},
+    ], '/a'
+    yield 'sum', [{'op': 'add', 'path': '/out', 'value': 0}] + counter_loop(
+        size, [
+            {'op': 'number/add', 'path': '/out',
+             'value-path-segments': element},
+        ]
+    ), [
+        {'op': 'array/sum', 'path': '/out', 'value-path': '/a'},
+    ], '/out'
+    yield 'dot', [
+        {'op': 'add', 'path': '/out', 'value': 0},
+        {'op': 'add', 'path': '/p', 'value': 0},
+    ] + counter_loop(size, [
+        {'op': 'copy', 'from-segments': element, 'path': '/p'},
+        {'op': 'number/mul', 'path': '/p',
+         'value-path-segments': ['b', {'value-path': '/i'}]},
+        {'op': 'number/add', 'path': '/out', 'value-path': '/p'},
+    ]), [
+        {'op': 'array/dot', 'path': '/out', 'left-value-path': '/a',
+         'right-value-path': '/b'},
+    ], '/out'
+
+
+def measure(patch_ops, doc, result_path):
+    patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    json_doc = JsonFactory.from_python(doc)
+    context = ExecutionContext(debug=False)
+    start = time.perf_counter()
+    patch.apply(json_doc, context=context)
+    elapsed = time.perf_counter() - start
+    return elapsed, context.stats()['ops'], json_doc[result_path[1:]]
+
+
+rng = random.Random(0)
+for size in SIZES:
+    doc = {
+        'a': [Decimal(rng.randint(-10**6, 10**6)) / 7 for _ in range(size)],
+        'b': [Decimal(rng.randint(-10**6, 10**6)) / 3 for _ in range(size)],
+    }
+    for name, loop_ops, native_ops, result_path in cases(size):
+        loop_time, loop_count, loop_result = measure(loop_ops, doc, result_path)
+        native_time, _, native_result = measure(native_ops, doc, result_path)
+        # exactly the same decimal results
+        assert loop_result == native_result
+        print(
+            f'{name:3s} n={size:5d}  patch loop {loop_time * 1000:8.2f} ms '
+            f'({loop_count:5d} ops)  native {native_time * 1000:6.3f} ms  '
+            f'speedup {loop_time / native_time:6.0f}x'
+        )
@@ -0,0 +1,227 @@
+import heapq
+import operator
+from decimal import (
+    Decimal,
+    localcontext,
+)
+from .json_patch_op_base import make_patch_op_class
+from .json_pointer import JsonPointer
+from .utils import (
+    copy_values,
+    make_numbers,
+    number_values,
+    obtain_value,
+    MissingValue,
+    ensure_array,
+    ensure_bool,
+    ensure_number,
+    ensure_string,
+)
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonArray,
+    JsonBool,
+    JsonNull,
+    JsonNumber,
+    JsonString,
+)
+from .json.json_value import JsonValue
+from .json.compact_array import CompactNumberArray
+
+
+__all__ = ['ARRAY_OP_CLASSES']
+
+
+# Native operations on whole arrays. Indices follow the Python
+# conventions: `stop` is exclusive and negative indices count from
+# the end of the array. Operands are read without copying, only the
+# elements ending up in the result are copied.
+
+def _obtain_array(field_name: str, fields, json_doc) -> JsonArray:
+    return ensure_array(obtain_value(field_name, fields, json_doc, copy=False))
+
+
+def _obtain_index(field_name: str, fields, json_doc):
+    value = obtain_value(
+        field_name, fields, json_doc, missing_ok=True, copy=False
+    )
+    if value is MissingValue:
+        return None
+    return operator.index(ensure_number(value))
+
+
+def _store(fields, json_doc: JsonContainerTypeHint, value: JsonValue) -> None:
+    JsonPointer(fields['path']).set(json_doc, value, create=True)
+
+
+def array_slice_apply(self, json_doc: JsonContainerTypeHint):
+    array = _obtain_array('value', self._fields, json_doc)
+    start = _obtain_index('start', self._fields, json_doc)
+    stop = _obtain_index('stop', self._fields, json_doc)
+    values = copy_values(array[start:stop])
+    _store(self._fields, json_doc, JsonArray(values))
+
+
+def array_concat_apply(self, json_doc: JsonContainerTypeHint):
+    left = _obtain_array('left-value', self._fields, json_doc)
+    right = _obtain_array('right-value', self._fields, json_doc)
+    values = copy_values(left.value + right.value)
+    _store(self._fields, json_doc, JsonArray(values))
+
+
+def array_reverse_apply(self, json_doc: JsonContainerTypeHint):
+    if 'value' in self._fields or 'value-path' in self._fields:
+        array = _obtain_array('value', self._fields, json_doc)
+        values = copy_values(array.value[::-1])
+    else:
+        # the elements are moved to the reversed array
+        path = JsonPointer(self._fields['path'])
+        values = ensure_array(path.get(json_doc)).value[::-1]
+    _store(self._fields, json_doc, JsonArray(values))
+
+
+def array_index_of_apply(self, json_doc: JsonContainerTypeHint):
+    array = _obtain_array('array', self._fields, json_doc)
+    value = obtain_value('value', self._fields, json_doc, copy=False)
+    start = _obtain_index('start', self._fields, json_doc) or 0
+    values = array.value
+    if start < 0:
+        start = max(start + len(values), 0)
+    # values of different types are never equal, e.g. `1` and `true`
+    value_type = type(value)
+    index = next((
+        i for i in range(start, len(values))
+        if type(values[i]) is value_type and values[i] == value
+    ), -1)
+    _store(self._fields, json_doc, JsonNumber(index))
+
+
+def array_extend_apply(self, json_doc: JsonContainerTypeHint):
+    path = JsonPointer(self._fields['path'])
+    array = ensure_array(path.get_scope(json_doc))
+    extension = _obtain_array('value', self._fields, json_doc)
+    # appended in place, the copies are taken first as the extension
+    # may be the array itself
+    for value in copy_values(extension):
+        array.insert(len(array), value)
+
+
+# Total order of the scalar types used for sorting
+_TYPE_RANKS = {JsonNull: 0, JsonBool: 1, JsonNumber: 2, JsonString: 3}
+
+
+def sort_key(value) -> tuple:
+    """Return the key ordering `null < false < true < numbers < strings`.
+
+    Numbers are ordered by value and strings by code points. Arrays
+    and objects cannot be ordered.
+    """
+    rank = _TYPE_RANKS.get(type(value))
+    if rank is None:
+        raise TypeError(f'Cannot order value {value!s} of type {type(value)}')
+    return (rank, value.value)
+
+
+def _sort_key_func(fields, json_doc):
+    key = obtain_value('key', fields, json_doc, missing_ok=True, copy=False)
+    if key is MissingValue:
+        return sort_key
+    key = JsonPointer(ensure_string(key))
+    return lambda value: sort_key(key.get(value))
+
+
+def _obtain_descending(fields, json_doc) -> bool:
+    descending = obtain_value(
+        'descending', fields, json_doc, missing_ok=True, copy=False
+    )
+    return descending is not MissingValue and ensure_bool(descending).value
+
+
+def array_sort_apply(self, json_doc: JsonContainerTypeHint):
+    key = _sort_key_func(self._fields, json_doc)
+    descending = _obtain_descending(self._fields, json_doc)
+    if 'value' in self._fields or 'value-path' in self._fields:
+        array = _obtain_array('value', self._fields, json_doc)
+        values = sorted(array.value, key=key, reverse=descending)
+        values = copy_values(values)
+    else:
+        # the elements are moved to the sorted array
+        path = JsonPointer(self._fields['path'])
+        array = ensure_array(path.get(json_doc))
+        values = sorted(array.value, key=key, reverse=descending)
+    _store(self._fields, json_doc, JsonArray(values))
+
+
+def array_merge_sorted_apply(self, json_doc: JsonContainerTypeHint):
+    key = _sort_key_func(self._fields, json_doc)
+    descending = _obtain_descending(self._fields, json_doc)
+    left = _obtain_array('left-value', self._fields, json_doc)
+    right = _obtain_array('right-value', self._fields, json_doc)
+    # on ties, elements of the left array come first
+    values = list(heapq.merge(
+        left.value, right.value, key=key, reverse=descending
+    ))
+    _store(self._fields, json_doc, JsonArray(copy_values(values)))
+
+
+# Reductions of numeric arrays, which are computed in a single
+# decimal context with the same rounding as the equivalent sequence
+# of `number/add` and `number/mul` operations
+
+def array_sum_apply(self, json_doc: JsonContainerTypeHint):
+    array = _obtain_array('value', self._fields, json_doc)
+    total = None
+    if isinstance(array, CompactNumberArray):
+        total = array.exact_sum()
+    if total is None:
+        with localcontext(JsonValue.CONTEXT):
+            total = sum(number_values(array), Decimal(0))
+    _store(self._fields, json_doc, make_numbers([total])[0])
+
+
+def array_dot_apply(self, json_doc: JsonContainerTypeHint):
+    left = number_values(_obtain_array('left-value', self._fields, json_doc))
+    right = number_values(_obtain_array('right-value', self._fields, json_doc))
+    if len(left) != len(right):
+        raise ValueError(
+            f'Arrays of lengths {len(left)} and {len(right)} have no dot product'
+        )
+    with localcontext(JsonValue.CONTEXT):
+        total = sum(map(operator.mul, left, right), Decimal(0))
+    _store(self._fields, json_doc, make_numbers([total])[0])
+
+
+def _extremum_apply(self, json_doc: JsonContainerTypeHint, func):
+    values = number_values(_obtain_array('value', self._fields, json_doc))
+    if not values:
+        raise ValueError('Empty array has no extremum')
+    _store(self._fields, json_doc, make_numbers([func(values)])[0])
+
+
+def array_min_apply(self, json_doc: JsonContainerTypeHint):
+    _extremum_apply(self, json_doc, min)
+
+
+def array_max_apply(self, json_doc: JsonContainerTypeHint):
+    _extremum_apply(self, json_doc, max)
+
+
+array_op_class_defs = [
+    ('ArraySlice', 'array/slice', array_slice_apply),
+    ('ArrayConcat', 'array/concat', array_concat_apply),
+    ('ArrayReverse', 'array/reverse', array_reverse_apply),
+    ('ArrayIndexOf', 'array/index-of', array_index_of_apply),
+    ('ArrayExtend', 'array/extend', array_extend_apply),
+    ('ArraySort', 'array/sort', array_sort_apply),
+    ('ArrayMergeSorted', 'array/merge-sorted', array_merge_sorted_apply),
+    ('ArraySum', 'array/sum', array_sum_apply),
+    ('ArrayDot', 'array/dot', array_dot_apply),
+    ('ArrayMin', 'array/min', array_min_apply),
+    ('ArrayMax', 'array/max', array_max_apply),
+]
+
+
+ARRAY_OP_CLASSES = [
+    make_patch_op_class(class_name, op_name, apply_func)
+    for class_name, op_name, apply_func in array_op_class_defs
+]
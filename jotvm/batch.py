@@ -0,0 +1,327 @@
+from __future__ import annotations
+import os
+import pickle
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice
+from typing import (
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+)
+from .change_feed import ChangeFeed
+from .context import ExecutionContext
+from .json_pointer import JsonPointer
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonArray,
+)
+
+
+__all__ = ['BatchResult', 'BatchRunner', 'apply_many']
+
+
+EXECUTOR_TYPES = ('serial', 'thread', 'process')
+
+
+class BatchResult(NamedTuple):
+    """Outcome of applying a patch to a single document."""
+
+    index: int
+    doc: Optional[JsonContainerTypeHint]
+    error: Optional[Exception]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _mount(doc: JsonContainerTypeHint, mounts: list) -> list:
+    """Mount the shared documents, which must not replace any value."""
+    views = []
+    try:
+        for pointer, shared_doc in mounts:
+            if pointer.exists(doc):
+                raise ValueError(
+                    f'Document has a value at the mount point "{pointer!s}"'
+                )
+            view = shared_doc.root()
+            pointer.add(doc, view)
+            views.append(view)
+    except Exception:
+        _unmount(doc, mounts, views)
+        raise
+    return views
+
+
+def _unmount(doc: JsonContainerTypeHint, mounts: list, views: list) -> None:
+    for (pointer, _), view in reversed(list(zip(mounts, views))):
+        if pointer.get(doc, None) is view:
+            pointer.remove(doc)
+
+
+def _apply_chunk(patch, docs: list, atomic: bool, mounts: list=()) -> list:
+    # nested patches are compiled once per chunk
+    context = ExecutionContext()
+    results = []
+    for doc in docs:
+        try:
+            views = _mount(doc, mounts)
+        except Exception as exc:
+            results.append((doc, exc))
+            continue
+        try:
+            patch.apply(doc, atomic=atomic, context=context)
+        except Exception as exc:
+            results.append((doc, exc))
+        else:
+            results.append((doc, None))
+        finally:
+            _unmount(doc, mounts, views)
+    return results
+
+
+def _apply_chunk_recorded(patch, docs: list, atomic: bool, mounts: list) -> list:
+    # only the net changes outside of the shared documents are returned
+    context = ExecutionContext()
+    results = []
+    for doc in docs:
+        try:
+            views = _mount(doc, mounts)
+        except Exception as exc:
+            results.append(([], exc))
+            continue
+        change_feed = ChangeFeed(doc)
+        error = None
+        with change_feed.track():
+            try:
+                patch.apply(doc, atomic=atomic, context=context)
+            except Exception as exc:
+                error = exc
+        _unmount(doc, mounts, views)
+        changes = [
+            op for op in change_feed.to_json_array()
+            if not any(
+                tuple(JsonPointer(op['path']))[:len(pointer)] == tuple(pointer)
+                for pointer, _ in mounts
+            )
+        ]
+        results.append((changes, error))
+    return results
+
+
+# Patch compiled once per worker process by `_init_worker`
+_worker_patch = None
+_worker_mounts = []
+
+
+def _init_worker(patch_class: type, patch_ops, shared: dict) -> None:
+    global _worker_patch, _worker_mounts
+    _worker_patch = patch_class.from_json_array(patch_ops)
+    _worker_mounts = [
+        (JsonPointer(pointer), shared_doc)
+        for pointer, shared_doc in shared.items()
+    ]
+
+
+def _worker_ready() -> bool:
+    return _worker_patch is not None
+
+
+def _picklable_error(error: Optional[Exception]) -> Optional[Exception]:
+    # errors are returned to the parent process
+    if error is None:
+        return None
+    try:
+        pickle.dumps(error)
+    except Exception:
+        return RuntimeError(repr(error))
+    return error
+
+
+def _worker_apply(docs: list, atomic: bool) -> list:
+    if _worker_mounts:
+        results = _apply_chunk_recorded(
+            _worker_patch, docs, atomic, _worker_mounts
+        )
+    else:
+        results = _apply_chunk(_worker_patch, docs, atomic)
+    return [(doc, _picklable_error(error)) for doc, error in results]
+
+
+class BatchRunner:
+    """Apply a patch to many independent documents.
+
+    The `executor` determines how the documents are processed:
+    `serial` applies the patch in the calling thread, `thread` uses a
+    thread pool sharing the patch and `process` uses a pool of worker
+    processes, which are started upfront and compile the patch once
+    in their initializer. Documents are submitted in chunks of
+    `chunksize` documents and at most two chunks per worker are in
+    flight, so that `docs` may be an unbounded stream.
+
+    With the `serial` and `thread` executors, the documents are
+    modified in place. With the `process` executor, the results hold
+    the modified copies returned by the workers. Errors raised while
+    applying the patch to a document are captured in its result.
+
+    `shared` maps JSON pointers to `SharedJsonDocument`s, which are
+    mounted read-only at these locations in every document during the
+    application of the patch, e.g. a function library under `/req`.
+    A document that already has a value at a mount point fails with a
+    `ValueError` and is left unchanged. Worker processes attach to the
+    shared memory once and decode only the parts that are accessed.
+    Changes to mounted documents are discarded. If shared documents are
+    given, the `process` executor returns only the net changes of each
+    document, which are applied to the original documents in place.
+    """
+
+    def __init__(
+        self, patch: 'JsonPatchBase', executor: str='serial',
+        max_workers: Optional[int]=None, chunksize: int=1, atomic: bool=False,
+        shared: Optional[dict]=None
+    ):
+        if executor not in EXECUTOR_TYPES:
+            raise ValueError(
+                f'`executor` must be one of {", ".join(EXECUTOR_TYPES)}'
+            )
+        if chunksize < 1:
+            raise ValueError('`chunksize` must be positive')
+        self.patch = patch
+        self.executor = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.atomic = atomic
+        self.shared = dict(shared or {})
+        self._mounts = [
+            (JsonPointer(pointer), shared_doc)
+            for pointer, shared_doc in self.shared.items()
+        ]
+        if any(len(pointer) == 0 for pointer, _ in self._mounts):
+            raise ValueError('Shared documents cannot be mounted at the root')
+        self._pool = None
+
+    def __enter__(self) -> 'BatchRunner':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start the worker pool."""
+        if self._pool is not None or self.executor == 'serial':
+            return
+        if self.executor == 'thread':
+            self._pool = ThreadPoolExecutor(self.max_workers)
+            return
+        self._pool = ProcessPoolExecutor(
+            self.max_workers, initializer=_init_worker,
+            initargs=(type(self.patch), self.patch.to_json_array(), self.shared)
+        )
+        # fork the workers before the first documents arrive
+        ready = [
+            self._pool.submit(_worker_ready) for _ in range(self.max_workers)
+        ]
+        for future in ready:
+            future.result()
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def apply_many(
+        self, docs: Iterable[JsonContainerTypeHint], ordered: bool=True
+    ) -> Iterator[BatchResult]:
+        """Apply the patch to `docs` and yield the results.
+
+        If `ordered` is false, results are yielded as soon as they are
+        available instead of in the order of `docs`.
+        """
+        if self.executor == 'serial':
+            for index, doc in enumerate(docs):
+                (doc, error), = _apply_chunk(
+                    self.patch, [doc], self.atomic, self._mounts
+                )
+                yield BatchResult(index, doc, error)
+            return
+        self.start()
+        chunks = self._chunks(docs)
+        max_pending = 2 * self.max_workers
+        # future -> documents in its chunk and their indices
+        pending = {}
+        try:
+            for chunk in islice(chunks, max_pending):
+                self._submit(chunk, pending)
+            while pending:
+                if ordered:
+                    done = [next(iter(pending))]
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    for next_chunk in islice(chunks, 1):
+                        self._submit(next_chunk, pending)
+                    yield from self._collect(future, chunk)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _chunks(self, docs: Iterable) -> Iterator[list]:
+        docs = enumerate(docs)
+        while True:
+            chunk = list(islice(docs, self.chunksize))
+            if not chunk:
+                return
+            yield chunk
+
+    def _submit(self, chunk: list, pending: dict) -> None:
+        docs = [doc for _, doc in chunk]
+        if self.executor == 'thread':
+            future = self._pool.submit(
+                _apply_chunk, self.patch, docs, self.atomic, self._mounts
+            )
+        else:
+            future = self._pool.submit(_worker_apply, docs, self.atomic)
+        pending[future] = chunk
+
+    def _collect(self, future, chunk: list) -> Iterator[BatchResult]:
+        try:
+            results = future.result()
+        except Exception as exc:
+            # e.g. a worker process died or a document cannot be pickled
+            for index, _ in chunk:
+                yield BatchResult(index, None, exc)
+            return
+        if self.executor != 'process' or not self._mounts:
+            for (index, _), (doc, error) in zip(chunk, results):
+                yield BatchResult(index, doc, error)
+            return
+        from .json_patch import JsonPatch
+        for (index, doc), (changes, error) in zip(chunk, results):
+            JsonPatch.from_json_array(JsonArray(changes)).apply(doc)
+            yield BatchResult(index, doc, error)
+
+
+def apply_many(
+    patch: 'JsonPatchBase', docs: Iterable[JsonContainerTypeHint],
+    executor: str='serial', max_workers: Optional[int]=None,
+    ordered: bool=True, chunksize: int=1, atomic: bool=False,
+    shared: Optional[dict]=None
+) -> Iterator[BatchResult]:
+    """Apply `patch` to each of `docs` and yield the results.
+
+    See `BatchRunner` for the meaning of the arguments. The worker
+    pool is shut down once all results have been yielded.
+    """
+    with BatchRunner(
+        patch, executor, max_workers, chunksize, atomic, shared
+    ) as runner:
+        yield from runner.apply_many(docs, ordered)
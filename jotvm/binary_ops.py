@@ -1,58 +1,120 @@
 from typing import Union
+from decimal import localcontext
 from .json_patch_op_base import JsonPatchOpBase
 from .json_pointer import JsonPointer
 from .utils import (
+    make_numbers,
+    number_values,
     obtain_value,
     MissingValue,
+    ensure_array,
+    ensure_bool,
 )
 import operator
 from .json.json_types import (
     JsonContainerTypes,
     JsonContainerTypeHint,
+    JsonArray,
     JsonBool,
 )
+from .json.json_value import JsonValue
 
 
 __all__ = ['BINARY_OP_CLASSES']
 
 
 class BinaryOpBase(JsonPatchOpBase):
-    """Abstract base class for in-place binary operation."""
+    """Abstract base class for in-place binary operation.
+
+    With `"elementwise": true`, the operation is applied to each
+    element of the array at `path` and the corresponding element of
+    the array `value`, or `value` itself if it is not an array.
+
+    If `left-value` is given, it is combined with `value` instead of
+    the value at `path` and the result is added at `path` as by `add`,
+    which fuses a `copy` to `path` with the operation.
+    """
+
+    # Operation on the `Decimal` values of numbers, which is applied
+    # element-wise in a single decimal context if given
+    decimal_op = None
 
     @classmethod
     def basic_op(cls, val1, val2):
         """Basic binary operation to be applied."""
         raise NotImplementedError('implement `basic_op` method')
 
+    @classmethod
+    def elementwise_op(cls, values1: JsonArray, value2) -> list:
+        values1 = ensure_array(values1)
+        if isinstance(value2, JsonArray):
+            values2 = value2
+            if len(values2) != len(values1):
+                raise ValueError(
+                    f'Arrays of lengths {len(values1)} and {len(values2)} '
+                    f'cannot be combined element-wise'
+                )
+        else:
+            values2 = [value2] * len(values1)
+        if cls.decimal_op is None:
+            return [cls.basic_op(v1, v2) for v1, v2 in zip(values1, values2)]
+        # same arithmetic as `JsonNumber` without a context per element
+        decimal_op = cls.decimal_op
+        with localcontext(JsonValue.CONTEXT):
+            return make_numbers([
+                decimal_op(v1, v2) for v1, v2 in zip(
+                    number_values(values1), number_values(values2)
+                )
+            ])
+
     def apply(self, json_doc: JsonContainerTypeHint):
         path = JsonPointer(self._fields['path'])
-        old_value = path.get(json_doc)
-        add_value = obtain_value('value', self._fields, json_doc)
-        new_value = self.basic_op(old_value, add_value)
-        path.remove(json_doc)
-        path.add(json_doc, new_value)
+        left_value = obtain_value(
+            'left-value', self._fields, json_doc, missing_ok=True
+        )
+        if left_value is MissingValue:
+            old_value = path.get(json_doc)
+        else:
+            old_value = left_value
+        elementwise = obtain_value(
+            'elementwise', self._fields, json_doc, missing_ok=True, copy=False
+        )
+        if elementwise is not MissingValue and ensure_bool(elementwise).value:
+            add_value = obtain_value('value', self._fields, json_doc, copy=False)
+            new_value = JsonArray(self.elementwise_op(old_value, add_value))
+        else:
+            add_value = obtain_value('value', self._fields, json_doc)
+            new_value = self.basic_op(old_value, add_value)
+        if left_value is MissingValue:
+            path.set(json_doc, new_value)
+        else:
+            path.add(json_doc, new_value)
 
 
-def make_binary_op_class(class_name: str, op_name: str, op_func: callable):
+def make_binary_op_class(
+    class_name: str, op_name: str, op_func: callable,
+    decimal_op: Union[callable, None]=None
+):
     return type(class_name, (BinaryOpBase,), {
         'get_op_name': classmethod(lambda cls: op_name),
         'basic_op': classmethod(lambda cls, v1, v2: op_func(v1, v2)),
+        'decimal_op': staticmethod(decimal_op) if decimal_op else None,
     })
 
 
 binary_op_class_defs = [
     # binary math operators
-    ('NumberAdd', 'number/add', operator.add),
-    ('NumberSub', 'number/sub', operator.sub),
-    ('NumberMul', 'number/mul', operator.mul),
-    ('NumberDiv', 'number/div', operator.truediv),
+    ('NumberAdd', 'number/add', operator.add, operator.add),
+    ('NumberSub', 'number/sub', operator.sub, operator.sub),
+    ('NumberMul', 'number/mul', operator.mul, operator.mul),
+    ('NumberDiv', 'number/div', operator.truediv, operator.truediv),
     # binary logic operators
-    ('BoolOr', 'bool/or', lambda x, y: JsonBool(x or y)),
-    ('BoolAnd', 'bool/and', lambda x, y: JsonBool(x and y)),
+    ('BoolOr', 'bool/or', lambda x, y: JsonBool(x or y), None),
+    ('BoolAnd', 'bool/and', lambda x, y: JsonBool(x and y), None),
 ]
 
 
 BINARY_OP_CLASSES = [
-    make_binary_op_class(name, op_name, func)
-    for name, op_name, func in binary_op_class_defs
+    make_binary_op_class(name, op_name, func, decimal_op)
+    for name, op_name, func, decimal_op in binary_op_class_defs
 ]
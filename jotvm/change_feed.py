@@ -0,0 +1,256 @@
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import contextmanager
+from .json_pointer import JsonPointer
+from .json.write_barrier import (
+    MissingEntry,
+    WriteObserverBase,
+    observe_writes,
+)
+from .json.json_types import (
+    JsonContainerTypes,
+    JsonContainerTypeHint,
+    JsonValue,
+    JsonObject,
+    JsonArray,
+    JsonString,
+)
+
+
+__all__ = ['ChangeFeed']
+
+
+def _is_equal(val1: JsonValue, val2: JsonValue) -> bool:
+    if type(val1) is not type(val2):
+        return False
+    if isinstance(val1, JsonContainerTypes):
+        return val1 == val2
+    # compare the serialization to distinguish e.g. 1 and 1.0
+    return val1.to_json() == val2.to_json()
+
+
+def _is_same_element(val1: JsonValue, val2: JsonValue) -> bool:
+    if val1 is val2:
+        return True
+    if isinstance(val1, JsonContainerTypes):
+        return False
+    return _is_equal(val1, val2)
+
+
+def _match_by_identity(orig: list, cur: list) -> list[tuple[int, int]]:
+    """Longest sequence of elements retained in the same order."""
+    orig_pos = {id(v): i for i, v in enumerate(orig)}
+    pairs = [(orig_pos[id(v)], j) for j, v in enumerate(cur) if id(v) in orig_pos]
+    # longest increasing subsequence of the original positions
+    tails = []
+    tail_idx = []
+    prev = [None] * len(pairs)
+    for k, (i, _) in enumerate(pairs):
+        pos = bisect_left(tails, i)
+        if pos == len(tails):
+            tails.append(i)
+            tail_idx.append(k)
+        else:
+            tails[pos] = i
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos-1] if pos > 0 else None
+    matches = []
+    k = tail_idx[-1] if tail_idx else None
+    while k is not None:
+        matches.append(pairs[k])
+        k = prev[k]
+    matches.reverse()
+    return matches
+
+
+def _make_op(op_name: str, path: tuple, value: JsonValue=None) -> JsonObject:
+    fields = {
+        JsonString('op'): JsonString(op_name),
+        JsonString('path'): JsonString(str(JsonPointer.from_segments(path))),
+    }
+    if value is not None:
+        fields[JsonString('value')] = value
+    return JsonObject(fields)
+
+
+class ChangeFeed(WriteObserverBase):
+    """Record the net change of a patch execution as a `JsonPatch`.
+
+    The first write to a container of the tracked document stores a
+    shallow copy of the container as it was before the write. The
+    positions of the containers within the document are learned
+    from the pointer walks reported by the write barrier. At the end,
+    only the containers that were written to are compared against
+    their snapshots, so scratch values that were added and removed
+    again do not appear in the emitted patch. Writes to detached
+    scratch documents, such as the work documents of
+    `ctrl/call-func`, are ignored.
+    """
+
+    def __init__(self, json_doc: JsonContainerTypeHint):
+        if not isinstance(json_doc, JsonContainerTypes):
+            raise TypeError('json_doc must be either JsonObject or JsonArray')
+        self._root = json_doc
+        # id(child) -> (child, parent, key)
+        self._links = {}
+        # id(container) -> (container, shallow copy before first write)
+        self._snapshots = {}
+
+    @contextmanager
+    def track(self):
+        """Record the writes to the document within the block."""
+        with observe_writes(self):
+            yield self
+
+    def _is_attached(self, container) -> bool:
+        return container is self._root or id(container) in self._links
+
+    def on_walk(self, containers: list, keys: tuple) -> None:
+        if not self._is_attached(containers[0]):
+            return
+        for parent, key, child in zip(containers, keys, containers[1:]):
+            link = self._links.get(id(child))
+            if link is not None and self._is_linked(*link):
+                # keep the first location, e.g. of an array element
+                # rather than of a loop variable bound to it
+                continue
+            self._links[id(child)] = (child, parent, key)
+
+    @staticmethod
+    def _is_linked(child, parent, key) -> bool:
+        return (
+            JsonPointer._exists(parent, key)
+            and JsonPointer._get(parent, key) is child
+        )
+
+    def on_write(self, container, key, old, new) -> None:
+        if id(container) in self._snapshots or not self._is_attached(container):
+            return
+        if isinstance(container, JsonArray):
+            # reconstruct the state before this write
+            snapshot = list(container.value)
+            if old is MissingEntry:
+                del snapshot[key]
+            elif new is MissingEntry:
+                snapshot.insert(key, old)
+            else:
+                snapshot[key] = old
+        else:
+            snapshot = dict(container.value)
+            if old is MissingEntry:
+                del snapshot[key]
+            else:
+                snapshot[key] = old
+        self._snapshots[id(container)] = (container, snapshot)
+
+    def to_json_array(self) -> JsonArray:
+        """Return the net change as array of patch operations."""
+        relevant = set()
+        children = {}
+        for child, parent, key in self._links.values():
+            children.setdefault(id(parent), []).append((key, child))
+        for container, _ in self._snapshots.values():
+            cur = container
+            while id(cur) not in relevant:
+                relevant.add(id(cur))
+                if cur is self._root:
+                    break
+                link = self._links.get(id(cur))
+                if link is None:
+                    break
+                cur = link[1]
+        ops = []
+        if id(self._root) in relevant:
+            self._emit(self._root, (), relevant, children, ops)
+        return JsonArray(ops)
+
+    def to_patch(self) -> 'JsonPatch':
+        """Return the net change as `JsonPatch`."""
+        from .json_patch import JsonPatch
+        return JsonPatch.from_json_array(self.to_json_array())
+
+    def _emit(self, container, path, relevant, children, ops) -> None:
+        snapshot = self._snapshots.get(id(container))
+        if snapshot is None:
+            # unchanged container, descend into changed children
+            for key, child in children.get(id(container), ()):
+                if (
+                    id(child) in relevant
+                    and JsonPointer._exists(container, key)
+                    and JsonPointer._get(container, key) is child
+                ):
+                    self._emit(child, path + (key,), relevant, children, ops)
+        elif isinstance(container, JsonObject):
+            self._emit_object(container, snapshot[1], path, relevant, children, ops)
+        else:
+            self._emit_array(container, snapshot[1], path, relevant, children, ops)
+
+    def _emit_value(self, old, new, path, relevant, children, ops) -> None:
+        if old is new:
+            if id(new) in relevant:
+                self._emit(new, path, relevant, children, ops)
+        elif not _is_equal(old, new):
+            ops.append(_make_op('replace', path, new))
+
+    def _emit_object(self, container, orig, path, relevant, children, ops) -> None:
+        for key in orig:
+            if key not in container.value:
+                ops.append(_make_op('remove', path + (key.value,)))
+        for key, new in container.value.items():
+            old = orig.get(key, MissingEntry)
+            if old is MissingEntry:
+                ops.append(_make_op('add', path + (key.value,), new))
+            else:
+                self._emit_value(
+                    old, new, path + (key.value,), relevant, children, ops
+                )
+
+    def _emit_array(self, container, orig, path, relevant, children, ops) -> None:
+        cur = container.value
+        max_common = min(len(orig), len(cur))
+        start = 0
+        while start < max_common and _is_same_element(orig[start], cur[start]):
+            start += 1
+        stop = 0
+        while (
+            stop < max_common - start
+            and _is_same_element(orig[-stop-1], cur[-stop-1])
+        ):
+            stop += 1
+        orig_mid = orig[start:len(orig)-stop]
+        cur_mid = cur[start:len(cur)-stop]
+        matches = _match_by_identity(orig_mid, cur_mid)
+
+        # Update the gaps between the retained elements, starting at
+        # the end so that the positions of preceding elements stay valid.
+        bounds = [(-1, -1)] + matches + [(len(orig_mid), len(cur_mid))]
+        for (i0, j0), (i1, j1) in reversed(list(zip(bounds, bounds[1:]))):
+            num_orig = i1 - i0 - 1
+            num_cur = j1 - j0 - 1
+            num_pairs = min(num_orig, num_cur)
+            base = start + i0 + 1
+            for t in range(num_pairs):
+                self._emit_value(
+                    orig_mid[i0+1+t], cur_mid[j0+1+t],
+                    path + (str(base+t),), relevant, children, ops
+                )
+            for t in reversed(range(num_pairs, num_orig)):
+                ops.append(_make_op('remove', path + (str(base+t),)))
+            for t in range(num_pairs, num_cur):
+                ops.append(_make_op('add', path + (str(base+t),), cur_mid[j0+1+t]))
+
+        # descend into the retained elements at their final positions
+        for i in range(start):
+            self._emit_value(
+                orig[i], cur[i], path + (str(i),), relevant, children, ops
+            )
+        for i, j in matches:
+            self._emit_value(
+                orig_mid[i], cur_mid[j], path + (str(start+j),),
+                relevant, children, ops
+            )
+        for k in range(1, stop+1):
+            self._emit_value(
+                orig[-k], cur[-k], path + (str(len(cur)-k),),
+                relevant, children, ops
+            )
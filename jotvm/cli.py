@@ -0,0 +1,281 @@
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import (
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    TextIO,
+)
+from .context import ExecutionContext
+from .json.json_factory import JsonFactory
+from .shared_document import (
+    decode_document,
+    encode_document,
+)
+from .json.json_types import (
+    JsonArray,
+    JsonObject,
+)
+
+
+__all__ = ['main']
+
+
+def _load_patch(args) -> tuple:
+    """Return the patch and the encoded bundle it belongs to, if any."""
+    from .json_patch import ExtJsonPatch
+    path = args.patch if args.patch is not None else args.bundle
+    with open(path, encoding='utf-8') as f:
+        value = JsonFactory.from_json(f.read())
+    bundle = None
+    if args.bundle is not None:
+        if not isinstance(value, JsonObject):
+            raise ValueError(f'Bundle {path} is not a JSON object')
+        if args.function not in value:
+            raise ValueError(f'Bundle {path} has no function {args.function}')
+        bundle = encode_document(value)
+        value = value[args.function]
+    if not isinstance(value, JsonArray):
+        raise ValueError('A patch must be a JSON array')
+    return ExtJsonPatch.from_json_array(value), bundle
+
+
+def _read_lines(paths: Sequence[str]) -> Iterator[tuple]:
+    """Yield the non-empty lines of the inputs with their locations."""
+    for path in paths or ['-']:
+        if path == '-':
+            name, f = '<stdin>', sys.stdin
+        else:
+            name, f = path, open(path, encoding='utf-8')
+        try:
+            for lineno, line in enumerate(f, start=1):
+                if line.strip():
+                    yield f'{name}:{lineno}', line
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def _apply_lines(
+    patch: 'JsonPatchBase', bundle: Optional[bytes], lines: list,
+    atomic: bool, context: ExecutionContext
+) -> list:
+    """Apply the patch to each document, or call it if it is a function.
+
+    A bundle function is called as by `ctrl/call-func` with the
+    document as `/inp` and a lazily decoded copy of the bundle as
+    `/req`, and its output is the result.
+    """
+    results = []
+    for line in lines:
+        start = time.perf_counter()
+        try:
+            json_doc = JsonFactory.from_json(line)
+            if bundle is None:
+                patch.apply(json_doc, atomic=atomic, context=context)
+            else:
+                json_doc = patch.call(
+                    json_doc, decode_document(bundle), atomic=atomic,
+                    context=context
+                )
+            output, error = json_doc.to_json(), None
+        except Exception as exc:
+            output, error = None, f'{type(exc).__name__}: {exc}'
+        results.append((output, error, time.perf_counter() - start))
+    return results
+
+
+# Patch compiled once per worker process by `_init_worker`
+_worker_patch = None
+_worker_bundle = None
+_worker_context = None
+
+
+def _init_worker(patch_ops: JsonArray, bundle: Optional[bytes]) -> None:
+    global _worker_patch, _worker_bundle, _worker_context
+    from .json_patch import ExtJsonPatch
+    _worker_patch = ExtJsonPatch.from_json_array(patch_ops)
+    _worker_bundle = bundle
+    _worker_context = ExecutionContext(debug=False)
+
+
+def _worker_apply(lines: list, atomic: bool) -> list:
+    return _apply_lines(
+        _worker_patch, _worker_bundle, lines, atomic, _worker_context
+    )
+
+
+def _process(
+    patch: 'JsonPatchBase', bundle: Optional[bytes],
+    chunks: Iterable[list], jobs: int, atomic: bool
+) -> Iterator[tuple]:
+    """Yield each chunk with its results in the order of the input."""
+    if jobs == 1:
+        context = ExecutionContext(debug=False)
+        for chunk in chunks:
+            lines = [line for _, line in chunk]
+            yield chunk, _apply_lines(patch, bundle, lines, atomic, context)
+        return
+    with ProcessPoolExecutor(
+        jobs, initializer=_init_worker,
+        initargs=(patch.to_json_array(), bundle)
+    ) as executor:
+        # at most two chunks per worker are in flight
+        pending = deque()
+        try:
+            for chunk in islice(chunks, 2 * jobs):
+                lines = [line for _, line in chunk]
+                pending.append((chunk, executor.submit(
+                    _worker_apply, lines, atomic
+                )))
+            while pending:
+                chunk, future = pending.popleft()
+                for next_chunk in islice(chunks, 1):
+                    lines = [line for _, line in next_chunk]
+                    pending.append((next_chunk, executor.submit(
+                        _worker_apply, lines, atomic
+                    )))
+                yield chunk, future.result()
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def _chunks(lines: Iterator[tuple], chunksize: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(lines, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _LatencySample:
+    """Uniform sample of bounded size of the document latencies."""
+
+    def __init__(self, max_size: int=100000):
+        self.max_size = max_size
+        self.count = 0
+        self.values = []
+        self._random = random.Random(0)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if len(self.values) < self.max_size:
+            self.values.append(value)
+            return
+        index = self._random.randrange(self.count)
+        if index < self.max_size:
+            self.values[index] = value
+
+
+def _print_stats(
+    num_docs: int, num_failed: int, elapsed: float,
+    sample: _LatencySample, stream: TextIO
+) -> None:
+    latencies = sorted(sample.values)
+
+    def percentile(fraction):
+        if not latencies:
+            return 0.0
+        return latencies[int(fraction * (len(latencies) - 1))] * 1000
+
+    throughput = num_docs / elapsed if elapsed > 0 else 0.0
+    print(
+        f'documents: {num_docs}  failed: {num_failed}  '
+        f'elapsed: {elapsed:.3f} s  throughput: {throughput:.1f} docs/s',
+        file=stream
+    )
+    print(
+        f'latency ms: p50 {percentile(0.5):.3f}  p90 {percentile(0.9):.3f}  '
+        f'p99 {percentile(0.99):.3f}  max {percentile(1.0):.3f}',
+        file=stream
+    )
+
+
+def _make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='jotvm',
+        description=(
+            'Apply a patch to each document of JSON Lines input and '
+            'write the results as JSON Lines.'
+        )
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('-p', '--patch', help='file with a JSON patch')
+    source.add_argument('-b', '--bundle', help='file with a function bundle')
+    parser.add_argument(
+        '-f', '--function', help='name of the bundle function to call'
+    )
+    parser.add_argument(
+        'inputs', nargs='*', metavar='FILE',
+        help='JSON Lines input files, standard input if none or -'
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='number of worker processes (default: 1, no workers)'
+    )
+    parser.add_argument(
+        '--chunksize', type=int, default=64,
+        help='documents read, processed and written at once'
+    )
+    parser.add_argument(
+        '--atomic', action='store_true',
+        help='apply the patch to each document atomically'
+    )
+    parser.add_argument(
+        '--stats', action='store_true',
+        help='print throughput and latency percentiles to standard error'
+    )
+    return parser
+
+
+def main(argv: Optional[Sequence[str]]=None) -> int:
+    """Run the command-line interface and return the exit status.
+
+    Documents that cannot be parsed or patched are reported on
+    standard error and omitted from the output, and the exit status
+    is then 1.
+    """
+    parser = _make_parser()
+    args = parser.parse_args(argv)
+    if args.bundle is not None and args.function is None:
+        parser.error('--bundle requires --function')
+    if args.jobs < 1 or args.chunksize < 1:
+        parser.error('--jobs and --chunksize must be positive')
+    try:
+        patch, bundle = _load_patch(args)
+    except Exception as exc:
+        parser.error(str(exc))
+    start = time.perf_counter()
+    num_docs = num_failed = 0
+    sample = _LatencySample()
+    chunks = _chunks(_read_lines(args.inputs), args.chunksize)
+    for chunk, results in _process(
+        patch, bundle, chunks, args.jobs, args.atomic
+    ):
+        outputs = []
+        for (location, _), (output, error, latency) in zip(chunk, results):
+            num_docs += 1
+            sample.add(latency)
+            if error is None:
+                outputs.append(output + '\n')
+            else:
+                num_failed += 1
+                print(f'{location}: {error}', file=sys.stderr)
+        sys.stdout.write(''.join(outputs))
+    sys.stdout.flush()
+    if args.stats:
+        elapsed = time.perf_counter() - start
+        _print_stats(num_docs, num_failed, elapsed, sample, sys.stderr)
+    return 1 if num_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
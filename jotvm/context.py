@@ -0,0 +1,195 @@
+from __future__ import annotations
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Executor
+from threading import Lock
+from typing import (
+    Callable,
+    Optional,
+    Sequence,
+)
+from .debug import SimpleDebugPrinter
+from .json.json_types import JsonArray
+
+
+__all__ = ['ExecutionContext', 'ExecutionLimitExceeded']
+
+
+# Cache of the copies of contexts received by this process
+_process_cache = None
+
+
+class ExecutionLimitExceeded(RuntimeError):
+    """Raised if a run executes more operations than allowed."""
+    pass
+
+
+class ExecutionContext:
+    """Configuration, statistics and caches of patch applications.
+
+    A context is passed explicitly from `JsonPatchBase.apply` to every
+    operation and from control operations to the nested patches they
+    apply. If no context is given, each application creates its own.
+
+    `debug` enables the tracing of each operation via `output`. If it
+    is `None`, the state of the global `SimpleDebugPrinter` at the
+    creation of the context is used. `max_ops` limits the number of
+    operations executed, including those of nested patches, and
+    `hooks` are called as `hook(op, json_doc)` before each operation.
+    Nested patches are compiled once per content and kept in a cache
+    of at most `max_cached_patches` entries. An array compiled before
+    is found by its identity and the identities of its operations, so
+    an operation whose members are modified in place is not compiled
+    again. Control operations may fan out work to `executor`, e.g. a
+    parallel `ctrl/map-func`.
+
+    Thread safety: a context may be shared by applications running
+    concurrently in several threads, as the statistics and the cache
+    are guarded by a lock and compiled patches are immutable. Hooks
+    and `output` are then called concurrently as well. A document
+    must not be modified by several threads at the same time. Copies
+    of a context sent to other processes have the same configuration
+    except for the executor but their own statistics and share a cache
+    per process. They start at the operation count of the original,
+    so that `max_ops` bounds the total, and their statistics are added
+    back via `add_worker_stats` once their results are collected.
+    """
+
+    def __init__(
+        self, debug: Optional[bool]=None, output: Callable=print,
+        max_ops: Optional[int]=None, hooks: Sequence[Callable]=(),
+        max_cached_patches: int=256, executor: Optional[Executor]=None
+    ):
+        if debug is None:
+            debug = SimpleDebugPrinter().is_active()
+        self.debug = debug
+        self.output = output
+        self.max_ops = max_ops
+        self.hooks = tuple(hooks)
+        self.max_cached_patches = max_cached_patches
+        self.executor = executor
+        self.num_ops = 0
+        self.num_compiled = 0
+        self.num_cache_hits = 0
+        self._patches = OrderedDict()
+        self._patches_by_id = OrderedDict()
+        self._lock = Lock()
+
+    def __reduce__(self):
+        return (ExecutionContext, (
+            self.debug, self.output, self.max_ops, self.hooks,
+            self.max_cached_patches
+        ), {'num_ops': self.num_ops})
+
+    def __setstate__(self, state: dict) -> None:
+        global _process_cache
+        self.__dict__.update(state)
+        # copies received by a worker process share its cache, so that
+        # patches are compiled once per process rather than per task
+        if _process_cache is None:
+            _process_cache = (self._patches, self._patches_by_id, self._lock)
+        self._patches, self._patches_by_id, self._lock = _process_cache
+
+    def trace(self, message) -> None:
+        """Output a debug message if debugging is enabled."""
+        if self.debug:
+            self.output(message)
+
+    def count_op(self, op, json_doc) -> None:
+        """Account for an operation about to be executed."""
+        self._add_ops(1)
+        for hook in self.hooks:
+            hook(op, json_doc)
+
+    def add_worker_stats(self, num_ops: int, num_compiled: int) -> None:
+        """Account for the work of a copy in another process."""
+        with self._lock:
+            self.num_compiled += num_compiled
+        self._add_ops(num_ops)
+
+    def _add_ops(self, num_ops: int) -> None:
+        with self._lock:
+            self.num_ops += num_ops
+            num_ops = self.num_ops
+        if self.max_ops is not None and num_ops > self.max_ops:
+            raise ExecutionLimitExceeded(
+                f'Limit of {self.max_ops} operations exceeded'
+            )
+
+    def compile(self, patch_ops: JsonArray) -> 'ExtJsonPatch':
+        """Return the compiled `ExtJsonPatch` for `patch_ops`."""
+        if not isinstance(patch_ops, JsonArray):
+            raise TypeError('`patch_ops` must be type `JsonArray`')
+        # the same array is usually compiled repeatedly, e.g. a called
+        # function, so it is looked up without serializing it first
+        op_ids = tuple(map(id, patch_ops.value))
+        with self._lock:
+            entry = self._patches_by_id.get(id(patch_ops))
+            if (
+                entry is not None and entry[0]() is patch_ops
+                and entry[1] == op_ids
+            ):
+                key, patch = entry[2:]
+                self._patches_by_id.move_to_end(id(patch_ops))
+                if key in self._patches:
+                    self._patches.move_to_end(key)
+                self.num_cache_hits += 1
+                return patch
+        key = patch_ops.to_json()
+        patch = self._compile_content(key, lambda: patch_ops)
+        with self._lock:
+            self._remember_identity(patch_ops, op_ids, key, patch)
+        return patch
+
+    def compile_json(self, patch_json: str) -> 'ExtJsonPatch':
+        """Return the compiled `ExtJsonPatch` for `patch_ops.to_json()`.
+
+        The JSON text is only parsed if the patch is not cached yet.
+        """
+        from .json.json_factory import JsonFactory
+        return self._compile_content(
+            patch_json, lambda: JsonFactory.from_json(patch_json)
+        )
+
+    def _compile_content(
+        self, key: str, get_patch_ops: Callable
+    ) -> 'ExtJsonPatch':
+        from .json_patch import ExtJsonPatch
+        with self._lock:
+            patch = self._patches.get(key)
+            if patch is not None:
+                self._patches.move_to_end(key)
+                self.num_cache_hits += 1
+                return patch
+        patch_ops = get_patch_ops()
+        if not isinstance(patch_ops, JsonArray):
+            raise TypeError('`patch_ops` must be type `JsonArray`')
+        # compile outside of the lock, so that other threads are not
+        # blocked; concurrent misses just compile the patch twice
+        patch = ExtJsonPatch.from_json_array(patch_ops)
+        with self._lock:
+            self.num_compiled += 1
+            self._patches[key] = patch
+            while len(self._patches) > self.max_cached_patches:
+                self._patches.popitem(last=False)
+        return patch
+
+    def _remember_identity(
+        self, patch_ops: JsonArray, op_ids: tuple, key: str,
+        patch: 'ExtJsonPatch'
+    ) -> None:
+        # called with the lock held
+        self._patches_by_id[id(patch_ops)] = (
+            weakref.ref(patch_ops), op_ids, key, patch
+        )
+        self._patches_by_id.move_to_end(id(patch_ops))
+        while len(self._patches_by_id) > self.max_cached_patches:
+            self._patches_by_id.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'ops': self.num_ops,
+                'compiled-patches': self.num_compiled,
+                'cache-hits': self.num_cache_hits,
+            }
@@ -1,4 +1,9 @@
-from typing import Union
+from typing import (
+    Iterator,
+    Optional,
+    Union,
+)
+import operator
 from copy import deepcopy
 from decimal import Decimal
 from .json_patch_op_base import (
@@ -6,9 +11,20 @@ from .json_patch_op_base import (
     make_patch_op_class,
 )
 from .json_pointer import JsonPointer
+from .context import ExecutionContext
+from .json.write_barrier import (
+    active_write_observers,
+    notify_release,
+    notify_walk,
+)
 from .utils import (
+    copy_values,
     obtain_value,
     MissingValue,
+    ensure_array,
+    ensure_bool,
+    ensure_number,
+    ensure_string,
 )
 from .json.json_types import (
     JsonContainerTypes,
@@ -23,27 +39,54 @@ __all__ = ['CONTROL_OP_CLASSES']
 
 
 class ControlOpBase(JsonPatchOpBase):
-    """Abstract base class for flow control operations."""
-    pass
-
-
-# Define the concrete .apply() methods of the
+    """Abstract base class for flow control operations.
+
+    Control operations are implemented as generators by `steps`,
+    which apply nested patches step by step via `JsonPatchBase._steps`
+    so that the application can be suspended before each nested
+    operation. `apply` runs them to completion.
+    """
+
+    def steps(
+        self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+    ) -> Iterator[tuple]:
+        raise NotImplementedError('implement `steps` method')
+
+    def apply(
+        self, json_doc: JsonContainerTypeHint,
+        context: Optional[ExecutionContext]=None
+    ) -> None:
+        if context is None:
+            context = ExecutionContext()
+        for _ in self.steps(json_doc, context):
+            pass
+
+    def __call__(
+        self, json_doc: JsonContainerTypeHint,
+        context: Optional[ExecutionContext]=None
+    ) -> None:
+        self.bind_segments(json_doc).apply(json_doc, context)
+
+
+# Define the concrete .steps() methods of the
 # ControlOpBase-derived classes implementing
 # specific control flow structures, such as
 # conditional assigment, loops, function calls
 
 
-def cond_apply_patch_op_apply(self, json_doc: JsonContainerTypeHint):
+def cond_apply_patch_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
     """Select and apply patch based on logical condition."""
     path = JsonPointer(self._fields['path'])
     bool_value = bool(obtain_value("check", self._fields, json_doc))
     if bool_value is True:
         patch_ops = obtain_value(
-            'true-patch', self._fields, json_doc, missing_ok=True
+            'true-patch', self._fields, json_doc, missing_ok=True, copy=False
         )
     elif bool_value is False:
         patch_ops = obtain_value(
-            'false-patch', self._fields, json_doc, missing_ok=True
+            'false-patch', self._fields, json_doc, missing_ok=True, copy=False
         )
     else:
         raise ValueError(
@@ -53,23 +96,24 @@ def cond_apply_patch_op_apply(self, json_doc: JsonContainerTypeHint):
     if patch_ops is MissingValue:
         return
 
-    target_dict = path.get(json_doc)
-    from .json_patch import ExtJsonPatch
-    patch = ExtJsonPatch.from_json_array(patch_ops)
-    patch.apply(target_dict)
+    target_dict = path.get_scope(json_doc)
+    patch = context.compile(patch_ops)
+    yield from patch._steps(target_dict, context)
 
 
-def cond_apply_patch_op_op_apply(self, json_doc: JsonContainerTypeHint):
+def cond_apply_patch_op_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
     """Select and apply a patch operation based on logical condition."""
     path = JsonPointer(self._fields['path'])
     bool_value = bool(obtain_value("check", self._fields, json_doc))
     if bool_value is True:
         patch_op = obtain_value(
-            'true-patch-op', self._fields, json_doc, missing_ok=True
+            'true-patch-op', self._fields, json_doc, missing_ok=True, copy=False
         )
     elif bool_value is False:
         patch_op = obtain_value(
-            'false-patch-op', self._fields, json_doc, missing_ok=True
+            'false-patch-op', self._fields, json_doc, missing_ok=True, copy=False
         )
     else:
         raise ValueError(
@@ -79,14 +123,15 @@ def cond_apply_patch_op_op_apply(self, json_doc: JsonContainerTypeHint):
     if patch_op is MissingValue:
         return
 
-    target_dict = path.get(json_doc)
-    from .json_patch import ExtJsonPatch
+    target_dict = path.get_scope(json_doc)
     # TODO: Get rid of this inefficient conversion
-    patch = ExtJsonPatch.from_json_array(JsonArray([patch_op]))
-    patch.apply(target_dict)
+    patch = context.compile(JsonArray([patch_op]))
+    yield from patch._steps(target_dict, context)
 
 
-def while_op_apply(self, json_doc: JsonContainerTypeHint):
+def while_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
     check_path = JsonPointer(self._fields['check-path'])
     path = JsonPointer(self._fields['path'])
     if check_path[:len(path)] != path:
@@ -95,18 +140,19 @@ def while_op_apply(self, json_doc: JsonContainerTypeHint):
         )
     local_check_path = check_path[len(path):]
 
-    patch_ops = obtain_value('patch', self._fields, json_doc)
-    from .json_patch import ExtJsonPatch
-    ext_patch = ExtJsonPatch.from_json_array(patch_ops)
-    work_dict = path.get(json_doc)
+    patch_ops = obtain_value('patch', self._fields, json_doc, copy=False)
+    ext_patch = context.compile(patch_ops)
+    work_dict = path.get_scope(json_doc)
     check_value = local_check_path.get(work_dict)
-    ext_patch.apply(work_dict)
+    yield from ext_patch._steps(work_dict, context)
     while check_value:
-        ext_patch.apply(work_dict)
+        yield from ext_patch._steps(work_dict, context)
         check_value = local_check_path.get(work_dict)
 
 
-def for_op_apply(self, json_doc: JsonContainerTypeHint):
+def for_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
     path = JsonPointer(self._fields['path'])
     local_counter_path = None
     if 'counter-path' in self._fields:
@@ -123,9 +169,8 @@ def for_op_apply(self, json_doc: JsonContainerTypeHint):
     if increment is MissingValue:
         increment = 1
 
-    patch_ops = obtain_value('patch', self._fields, json_doc)
-    from .json_patch import ExtJsonPatch
-    ext_patch = ExtJsonPatch.from_json_array(patch_ops)
+    patch_ops = obtain_value('patch', self._fields, json_doc, copy=False)
+    ext_patch = context.compile(patch_ops)
 
     counter_backup = False
     orig_counter_value = None
@@ -133,67 +178,163 @@ def for_op_apply(self, json_doc: JsonContainerTypeHint):
         counter_backup = True
         orig_counter_value = deepcopy(counter_path.get(json_doc))
 
-    work_dict = path.get(json_doc)
+    work_dict = path.get_scope(json_doc)
     for counter in range(start_value, stop_value+1, increment):
         json_counter = JsonNumber(Decimal(counter))
         if local_counter_path is not None:
             if not counter_backup:
                 local_counter_path.add(work_dict, json_counter)
             else:
-                # This special case is introduced to ensure
-                # that the counter value is replacing a list
-                # element rather than inserting into a list.
-                local_counter_path.remove(work_dict)
-                local_counter_path.add(work_dict, json_counter)
-        ext_patch.apply(work_dict)
+                # The counter value replaces a list element
+                # rather than being inserted into a list.
+                local_counter_path.set(work_dict, json_counter)
+        yield from ext_patch._steps(work_dict, context)
 
     if counter_backup:
-        # Remove the temporary counter...
-        local_counter_path.remove(work_dict)
-        # ... and restore the original value
-        local_counter_path.add(work_dict, orig_counter_value)
+        # Restore the original value of the temporary counter
+        local_counter_path.set(work_dict, orig_counter_value)
     else:
         local_counter_path.remove(json_doc)
 
 
-def apply_patch_op_apply(self, json_doc: JsonContainerTypeHint):
-    # here to avoid circular import
-    from .json_patch import ExtJsonPatch
+class _LoopVariable:
+    """Location within the scope of a loop that values are bound to.
+
+    The original value, if any, is restored after the loop.
+    """
+
+    def __init__(self, pointer: JsonPointer, work_dict: JsonContainerTypeHint):
+        if len(pointer) == 0:
+            raise ValueError('A loop variable cannot be the scope itself')
+        self.pointer = pointer
+        self.original = pointer.get(work_dict, MissingValue)
+        self.bound = self.original is not MissingValue
+
+    def bind(self, work_dict: JsonContainerTypeHint, value) -> None:
+        if not self.bound:
+            self.pointer.add(work_dict, value)
+            self.bound = True
+        else:
+            # replaced in place, without shifting array elements
+            self.pointer.set(work_dict, value)
+
+    def restore(self, work_dict: JsonContainerTypeHint) -> None:
+        if self.original is MissingValue:
+            if self.bound:
+                self.pointer.remove(work_dict)
+        else:
+            self.bind(work_dict, self.original)
+
+
+def _loop_variable(
+    self, field_name: str, path: JsonPointer, work_dict: JsonContainerTypeHint
+) -> Optional[_LoopVariable]:
+    if field_name not in self._fields:
+        return None
+    pointer = JsonPointer(self._fields[field_name])
+    if pointer[:len(path)] != path:
+        raise ValueError(
+            f'{field_name} "{pointer!s}" not within path "{path!s}"'
+        )
+    return _LoopVariable(pointer[len(path):], work_dict)
+
+
+def _obtain_bound(self, field_name: str, json_doc: JsonContainerTypeHint):
+    value = obtain_value(
+        field_name, self._fields, json_doc, missing_ok=True, copy=False
+    )
+    if value is MissingValue:
+        return None
+    return operator.index(ensure_number(value))
+
+
+def for_each_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
     path = JsonPointer(self._fields['path'])
-    target_dict = path.get(json_doc)
-    patch_ops = obtain_value('patch', self._fields, json_doc)
-    patch = ExtJsonPatch.from_json_array(patch_ops)
-    patch.apply(target_dict)
+    array = ensure_array(obtain_value('array', self._fields, json_doc, copy=False))
+    observed = bool(active_write_observers())
+    if observed and 'array-path' in self._fields:
+        # report the location of the array, so that the elements are
+        # linked to it rather than to the loop variable bound to them
+        JsonPointer(self._fields['array-path']).get_scope(json_doc)
+    # `start` and `stop` select a slice with the Python conventions
+    start = _obtain_bound(self, 'start', json_doc)
+    stop = _obtain_bound(self, 'stop', json_doc)
+
+    patch_ops = obtain_value('patch', self._fields, json_doc, copy=False)
+    ext_patch = context.compile(patch_ops)
+
+    work_dict = path.get_scope(json_doc)
+    item = _loop_variable(self, 'item-path', path, work_dict)
+    index = _loop_variable(self, 'index-path', path, work_dict)
+    # the elements are bound by reference, the array itself may be
+    # changed by the patch without affecting the iteration
+    elements = list(array.value)
+    for i in range(len(elements))[start:stop]:
+        if item is not None:
+            element = elements[i]
+            if (
+                observed and isinstance(element, JsonContainerTypes)
+                and i < len(array) and array.value[i] is element
+            ):
+                notify_walk([array, element], (str(i),))
+            item.bind(work_dict, element)
+        if index is not None:
+            index.bind(work_dict, JsonNumber(i))
+        yield from ext_patch._steps(work_dict, context)
+
+    for variable in (index, item):
+        if variable is not None:
+            variable.restore(work_dict)
+
+
+def apply_patch_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
+    path = JsonPointer(self._fields['path'])
+    target_dict = path.get_scope(json_doc)
+    patch_ops = obtain_value('patch', self._fields, json_doc, copy=False)
+    patch = context.compile(patch_ops)
+    yield from patch._steps(target_dict, context)
 
 
-def apply_patch_op_op_apply(self, json_doc: JsonContainerTypeHint):
-    # here to avoid circular import
-    from .json_patch import ExtJsonPatch
+def apply_patch_op_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
     path = JsonPointer(self._fields['path'])
-    target_dict = path.get(json_doc)
-    patch_op = obtain_value('patch-op', self._fields, json_doc)
-    patch = ExtJsonPatch.from_json_array(JsonArray([patch_op]))
-    patch.apply(target_dict)
+    target_dict = path.get_scope(json_doc)
+    patch_op = obtain_value('patch-op', self._fields, json_doc, copy=False)
+    patch = context.compile(JsonArray([patch_op]))
+    yield from patch._steps(target_dict, context)
 
 
-def call_patch_op_apply(self, json_doc: JsonContainerTypeHint):
+def _call_patch_inputs(
+    self, json_doc: JsonContainerTypeHint, work_dict: JsonObject,
+    reads: Optional[list]=None
+) -> JsonArray:
+    """Populate the work dict and return the patch to apply to it.
+
+    The locations read from `json_doc` are appended to `reads`.
+    """
     # prepare work dict by copying request fields into it
-    work_dict = JsonObject()
     if 'args' in self._fields:
         for local_path, value in self._fields['args'].items():
             value = deepcopy(value)
             JsonPointer(local_path).add(work_dict, value)
     if 'args-paths' in self._fields:
         for local_path, ext_path in self._fields['args-paths'].items():
-            value = deepcopy(JsonPointer(ext_path).get(json_doc))
+            ext_path = JsonPointer(ext_path)
+            value = deepcopy(ext_path.get(json_doc))
             JsonPointer(local_path).add(work_dict, value)
+            if reads is not None:
+                reads.append(tuple(ext_path))
+    return _obtain_patch(self, json_doc, reads)
 
-    # obtain json patch and apply it to work dict
-    from .json_patch import ExtJsonPatch
-    patch_ops = obtain_value('patch', self._fields, json_doc)
-    patch = ExtJsonPatch.from_json_array(patch_ops)
-    patch.apply(work_dict)
 
+def _call_patch_outputs(
+    self, json_doc: JsonContainerTypeHint, work_dict: JsonObject
+):
     # copy the requested fields from work dict back into the json dict
     if 'result-paths' in self._fields:
         for local_path, ext_path in self._fields['result-paths'].items():
@@ -201,8 +342,32 @@ def call_patch_op_apply(self, json_doc: JsonContainerTypeHint):
             JsonPointer(ext_path).add(json_doc, value)
 
 
+def _obtain_patch(
+    self, json_doc: JsonContainerTypeHint, reads: Optional[list]
+) -> JsonArray:
+    if reads is not None and 'patch-path' in self._fields:
+        reads.append(tuple(JsonPointer(self._fields['patch-path'])))
+    return obtain_value('patch', self._fields, json_doc, copy=False)
+
+
+def call_patch_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
+    work_dict = JsonObject()
+    try:
+        patch_ops = _call_patch_inputs(self, json_doc, work_dict)
+        # obtain json patch and apply it to work dict
+        patch = context.compile(patch_ops)
+        yield from patch._steps(work_dict, context)
+        _call_patch_outputs(self, json_doc, work_dict)
+    finally:
+        # the scratch document is discarded
+        notify_release(work_dict)
+
+
 def _prepare_func_input(
-    inp_dict: dict, inp_args: dict, json_doc: JsonContainerTypeHint
+    inp_dict: dict, inp_args: dict, json_doc: JsonContainerTypeHint,
+    reads: Optional[list]=None
 ):
     for inp_arg, value in inp_args.items():
         mod_inp_arg = inp_arg
@@ -210,58 +375,239 @@ def _prepare_func_input(
             inp_path = JsonPointer(value)
             value = deepcopy(inp_path.get(json_doc))
             mod_inp_arg = inp_arg[:-len('-path')]
+            if reads is not None:
+                reads.append(tuple(inp_path))
         # Recursively descend into dictionaries
         # and apply the same -path replace mechanism.
+        # The members are collected without observed writes, the
+        # object is accounted for once it is inserted into `inp_dict`.
         if isinstance(value, JsonObject):
-            child_inp_dict = JsonObject()
-            _prepare_func_input(child_inp_dict, value, json_doc)
-            value = child_inp_dict
+            child_inp_dict = {}
+            _prepare_func_input(child_inp_dict, value, json_doc, reads)
+            value = JsonObject(child_inp_dict)
 
         inp_dict[mod_inp_arg] = value
 
 
-def call_func_op_apply(self, json_doc: JsonContainerTypeHint):
+def _call_func_inputs(
+    self, json_doc: JsonContainerTypeHint, work_dict: JsonObject,
+    reads: Optional[list]=None
+) -> JsonArray:
+    """Populate the work dict and return the patch to apply to it.
+
+    The locations read from `json_doc` are appended to `reads`.
+    """
     # Prepare work dict by copying request fields into it.
     # Assume standard convention everything except
     # "op", "patch", "patch-path", "out" field gets mapped
     # to a field in "/inp" in the work dict. If the name
     # ends with "-path", the value is interpreted as JSON Pointer
     # and the value at the corresponding address copied.
-    work_dict = JsonObject()
-    inp_args = deepcopy(self._fields)
-    inp_args.pop('op', None)
-    inp_args.pop('patch', None)
-    inp_args.pop('patch-path', None)
-    inp_args.pop('out-path', None)
+    inp_args = deepcopy(JsonObject({
+        k: v for k, v in self._fields.items()
+        if k not in ('op', 'patch', 'patch-path', 'out-path')
+    }))
     inp_dict = work_dict.setdefault('inp', JsonObject())
-    _prepare_func_input(inp_dict, inp_args, json_doc)
+    _prepare_func_input(inp_dict, inp_args, json_doc, reads)
     # move injected dependencies under /inp/req to /req
     work_dict['req'] = work_dict['inp'].pop('req', JsonObject())
+    return _obtain_patch(self, json_doc, reads)
 
-    # obtain json patch and apply it to work dict
-    from .json_patch import ExtJsonPatch
-    patch_ops = obtain_value('patch', self._fields, json_doc)
-    patch = ExtJsonPatch.from_json_array(patch_ops)
-    patch.apply(work_dict)
 
+def _call_func_outputs(
+    self, json_doc: JsonContainerTypeHint, work_dict: JsonObject
+):
     # copy the requested fields from work dict back into the json dict
     out_path = JsonPointer(self._fields['out-path'])
     out_path.add(json_doc, work_dict['out'])
 
 
+def call_func_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
+    work_dict = JsonObject()
+    try:
+        patch_ops = _call_func_inputs(self, json_doc, work_dict)
+        # obtain json patch and apply it to work dict
+        patch = context.compile(patch_ops)
+        yield from patch._steps(work_dict, context)
+        _call_func_outputs(self, json_doc, work_dict)
+    finally:
+        # the scratch document is discarded
+        notify_release(work_dict)
+
+
+# Fields of `ctrl/map-func` and `ctrl/reduce-func` that are not
+# passed to the function
+_MAP_FUNC_FIELDS = (
+    'op', 'patch', 'patch-path', 'out-path', 'array', 'array-path',
+    'item', 'index', 'parallel',
+)
+_REDUCE_FUNC_FIELDS = _MAP_FUNC_FIELDS + ('acc', 'init', 'init-path')
+
+
+def _func_base_input(
+    self, json_doc: JsonContainerTypeHint, excluded: tuple
+) -> tuple:
+    """Return the `/inp` and `/req` shared by the calls of a function."""
+    inp_args = deepcopy(JsonObject({
+        k: v for k, v in self._fields.items() if k not in excluded
+    }))
+    inp_dict = JsonObject()
+    _prepare_func_input(inp_dict, inp_args, json_doc)
+    return inp_dict, inp_dict.pop('req', JsonObject())
+
+
+def _func_work_dict(inp: JsonObject, req: JsonObject, args: dict) -> JsonObject:
+    work_dict = JsonObject()
+    work_dict['inp'] = deepcopy(inp)
+    for name, value in args.items():
+        work_dict['inp'][name] = value
+    work_dict['req'] = deepcopy(req)
+    return work_dict
+
+
+def _arg_name(self, field_name: str, default: Optional[str]) -> Optional[str]:
+    if field_name not in self._fields:
+        return default
+    return ensure_string(self._fields[field_name]).value
+
+
+def _element_args(self, elements: list) -> list:
+    item = _arg_name(self, 'item', 'x')
+    index = _arg_name(self, 'index', None)
+    args = []
+    for i, element in enumerate(elements):
+        element_args = {item: element}
+        if index is not None:
+            element_args[index] = JsonNumber(i)
+        args.append(element_args)
+    return args
+
+
+def _map_concurrently(
+    patch, patch_ops: JsonArray, work_dicts: list, context: ExecutionContext
+) -> list:
+    # imported here as `parallel` depends on this module
+    from .parallel import (
+        _prepare_body,
+        _submit_body,
+        _body_result,
+    )
+    executor = context.executor
+    # prepared once for all elements
+    body = _prepare_body(executor, patch, patch_ops, context)
+    futures = []
+    try:
+        for work_dict in work_dicts:
+            futures.append(_submit_body(executor, body, work_dict, context))
+        # errors are raised in the order of the elements
+        return [_body_result(future, context)['out'] for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+        for work_dict in work_dicts:
+            notify_release(work_dict)
+
+
+def _run_parallel(self, json_doc, context: ExecutionContext) -> bool:
+    from .parallel import can_run_concurrently
+    if 'parallel' not in self._fields:
+        return False
+    parallel = obtain_value('parallel', self._fields, json_doc, copy=False)
+    return (
+        ensure_bool(parallel).value and context.executor is not None
+        and can_run_concurrently(context)
+    )
+
+
+def map_func_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
+    array = ensure_array(obtain_value('array', self._fields, json_doc, copy=False))
+    inp, req = _func_base_input(self, json_doc, _MAP_FUNC_FIELDS)
+    patch_ops = _obtain_patch(self, json_doc, None)
+    # compiled once for all elements
+    patch = context.compile(patch_ops)
+    args = _element_args(self, copy_values(array.value))
+    if _run_parallel(self, json_doc, context):
+        work_dicts = [_func_work_dict(inp, req, a) for a in args]
+        results = _map_concurrently(patch, patch_ops, work_dicts, context)
+    else:
+        results = []
+        for element_args in args:
+            work_dict = _func_work_dict(inp, req, element_args)
+            try:
+                yield from patch._steps(work_dict, context)
+                results.append(work_dict['out'])
+            finally:
+                notify_release(work_dict)
+    JsonPointer(self._fields['out-path']).add(json_doc, JsonArray(results))
+
+
+def reduce_func_op_steps(
+    self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+):
+    array = ensure_array(obtain_value('array', self._fields, json_doc, copy=False))
+    inp, req = _func_base_input(self, json_doc, _REDUCE_FUNC_FIELDS)
+    patch = context.compile(_obtain_patch(self, json_doc, None))
+    acc_name = _arg_name(self, 'acc', 'acc')
+    args = _element_args(self, copy_values(array.value))
+    acc = obtain_value('init', self._fields, json_doc, missing_ok=True)
+    if acc is MissingValue:
+        # the first element is the initial accumulator
+        if not args:
+            raise ValueError('Cannot reduce an empty array without `init`')
+        acc = args.pop(0)[_arg_name(self, 'item', 'x')]
+    for element_args in args:
+        element_args[acc_name] = acc
+        work_dict = _func_work_dict(inp, req, element_args)
+        try:
+            yield from patch._steps(work_dict, context)
+            acc = work_dict.pop('out')
+        finally:
+            notify_release(work_dict)
+    JsonPointer(self._fields['out-path']).add(json_doc, acc)
+
+
+# Phases of the operations calling a patch on a scratch document,
+# which are used to run independent calls concurrently:
+# inputs(op, json_doc, work_dict, reads) -> patch ops to apply
+# to the work dict, outputs(op, json_doc, work_dict)
+CALL_OP_PHASES = {
+    'ctrl/call-patch': (_call_patch_inputs, _call_patch_outputs),
+    'ctrl/call-func': (_call_func_inputs, _call_func_outputs),
+}
+
+
 control_op_class_defs = [
-    ('CondApplyPatchOp', 'ctrl/cond-apply-patch', cond_apply_patch_op_apply, ControlOpBase),
-    ('CondApplyPatchOpOp', 'ctrl/cond-apply-patch-op', cond_apply_patch_op_op_apply, ControlOpBase),
-    ('WhileOp', 'ctrl/while-loop', while_op_apply, ControlOpBase),
-    ('ForOp', 'ctrl/for-loop', for_op_apply, ControlOpBase),
-    ('ApplyPatchOp', 'ctrl/apply-patch', apply_patch_op_apply, ControlOpBase),
-    ('ApplyPatchOpOp', 'ctrl/apply-patch-op', apply_patch_op_op_apply, ControlOpBase),
-    ('CallPatchOp', 'ctrl/call-patch', call_patch_op_apply, ControlOpBase),
-    ('CallFuncOp', 'ctrl/call-func', call_func_op_apply, ControlOpBase),
+    ('CondApplyPatchOp', 'ctrl/cond-apply-patch', cond_apply_patch_op_steps, ControlOpBase),
+    ('CondApplyPatchOpOp', 'ctrl/cond-apply-patch-op', cond_apply_patch_op_op_steps, ControlOpBase),
+    ('WhileOp', 'ctrl/while-loop', while_op_steps, ControlOpBase),
+    ('ForOp', 'ctrl/for-loop', for_op_steps, ControlOpBase),
+    ('ForEachOp', 'ctrl/for-each', for_each_op_steps, ControlOpBase),
+    ('ApplyPatchOp', 'ctrl/apply-patch', apply_patch_op_steps, ControlOpBase),
+    ('ApplyPatchOpOp', 'ctrl/apply-patch-op', apply_patch_op_op_steps, ControlOpBase),
+    ('CallPatchOp', 'ctrl/call-patch', call_patch_op_steps, ControlOpBase),
+    ('CallFuncOp', 'ctrl/call-func', call_func_op_steps, ControlOpBase),
+    ('MapFuncOp', 'ctrl/map-func', map_func_op_steps, ControlOpBase),
+    ('ReduceFuncOp', 'ctrl/reduce-func', reduce_func_op_steps, ControlOpBase),
 ]
 
 
+def make_control_op_class(
+    class_name: str, op_name: str, steps_fun: callable,
+    base_class=ControlOpBase
+):
+    """Make concrete control op class from a generator function."""
+    op_class = make_patch_op_class(
+        class_name, op_name, base_class.apply, base_class
+    )
+    op_class.steps = steps_fun
+    return op_class
+
+
 CONTROL_OP_CLASSES = [
-    make_patch_op_class(class_name, op_name, apply_func, base_class)
-    for class_name, op_name, apply_func, base_class in control_op_class_defs
+    make_control_op_class(class_name, op_name, steps_func, base_class)
+    for class_name, op_name, steps_func, base_class in control_op_class_defs
 ]
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import asyncio
+import time
+from copy import deepcopy
+from typing import (
+    Awaitable,
+    Callable,
+    Optional,
+)
+from .context import ExecutionContext
+from .dependency import op_access
+from .transaction import (
+    Transaction,
+    current_transaction,
+)
+from .json.json_link import JsonLink
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonValue,
+    JsonArray,
+    JsonObject,
+)
+
+
+__all__ = ['apply_async']
+
+
+LinkResolver = Callable[[JsonLink], Awaitable[JsonValue]]
+
+
+async def _resolve_links(
+    op, json_doc: JsonContainerTypeHint, resolver: LinkResolver,
+    resolved: dict
+) -> None:
+    """Replace the links on the locations accessed by `op`.
+
+    Links are resolved on the way to the locations as well as at the
+    locations themselves, but not within the values stored there.
+    """
+    access = op_access(op._fields)
+    if access is None:
+        return
+    for location in access.reads + access.writes:
+        container = json_doc
+        for i, segment in enumerate(location):
+            if isinstance(container, JsonObject):
+                key = segment
+                if key not in container:
+                    break
+            elif isinstance(container, JsonArray):
+                if not segment.isdigit() or int(segment) >= len(container):
+                    break
+                key = int(segment)
+            else:
+                break
+            value = container[key]
+            if isinstance(value, JsonLink):
+                if value.target not in resolved:
+                    resolved[value.target] = await resolver(value)
+                value = deepcopy(resolved[value.target])
+                container[key] = value
+            container = value
+
+
+async def apply_async(
+    patch: 'JsonPatchBase', json_doc: JsonContainerTypeHint,
+    atomic: bool=False, context: Optional[ExecutionContext]=None,
+    yield_every: int=100, time_slice: float=0.005,
+    resolver: Optional[LinkResolver]=None
+) -> None:
+    """Apply a patch cooperatively within an asyncio event loop.
+
+    Control is returned to the event loop after every `yield_every`
+    operations, including those of nested patches, or once
+    `time_slice` seconds have passed since the last suspension,
+    whichever comes first. A single operation is never interrupted.
+
+    If the task is cancelled, the application is aborted at the next
+    suspension. With `atomic`, the document is then left unchanged,
+    as on any other error. If a `resolver` coroutine function is
+    given, `JsonLink`s on the way to the locations accessed by the
+    next operation are replaced by the awaited `resolver(link)`.
+    Each link target is resolved once per application.
+    """
+    if yield_every < 1:
+        raise ValueError('`yield_every` must be positive')
+    if context is None:
+        context = ExecutionContext()
+    if atomic and current_transaction() is None:
+        with Transaction().begin():
+            await _run_steps(
+                patch, json_doc, context, yield_every, time_slice, resolver
+            )
+    else:
+        await _run_steps(
+            patch, json_doc, context, yield_every, time_slice, resolver
+        )
+
+
+async def _run_steps(
+    patch, json_doc: JsonContainerTypeHint, context: ExecutionContext,
+    yield_every: int, time_slice: float, resolver: Optional[LinkResolver]
+) -> None:
+    steps = patch._steps(json_doc, context)
+    resolved = {}
+    num_ops = 0
+    deadline = time.monotonic() + time_slice
+    try:
+        for op, scope in steps:
+            if resolver is not None:
+                await _resolve_links(op, scope, resolver, resolved)
+            num_ops += 1
+            if num_ops >= yield_every or time.monotonic() >= deadline:
+                # The task is rescheduled ahead of the timers that
+                # became due meanwhile, so it suspends twice in order
+                # to not run a second time slice before them.
+                await asyncio.sleep(0)
+                await asyncio.sleep(0)
+                num_ops = 0
+                deadline = time.monotonic() + time_slice
+    finally:
+        # roll back the savepoints of the interrupted nested patches
+        steps.close()
@@ -0,0 +1,464 @@
+from __future__ import annotations
+import argparse
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import (
+    OrderedDict,
+    deque,
+)
+from decimal import Decimal
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from typing import (
+    Optional,
+    Sequence,
+)
+from .context import (
+    ExecutionContext,
+    ExecutionLimitExceeded,
+)
+from .json_diff import JsonDiff
+from .shared_document import (
+    decode_document,
+    encode_document,
+)
+from .json.json_factory import JsonFactory
+from .json.json_value import JsonValue
+from .json.json_types import (
+    JsonArray,
+    JsonObject,
+    JsonString,
+)
+
+
+__all__ = [
+    'BundleCache', 'DaemonClient', 'DaemonError', 'EvaluationDaemon', 'main'
+]
+
+
+class DaemonError(RuntimeError):
+    """Raised by a `DaemonClient` if the daemon rejects a request."""
+    pass
+
+
+def _to_json_value(value) -> JsonValue:
+    if isinstance(value, JsonValue):
+        return value
+    return JsonFactory.from_python(value, require_decimal=False)
+
+
+def _seconds(value: float) -> Decimal:
+    # microseconds are precise enough and keep responses short
+    return Decimal(value).quantize(Decimal('1e-6'))
+
+
+def _percentile(values: list, fraction: float) -> Optional[Decimal]:
+    if not values:
+        return None
+    return _seconds(values[int(fraction * (len(values) - 1))])
+
+
+class BundleCache:
+    """Function bundles kept in memory by their content hash.
+
+    A bundle is a JSON object whose members are patches, i.e. named
+    functions, which are called with a copy of the bundle as `/req`,
+    so that they can call each other. Bundles are kept encoded as
+    shared documents, so that a copy decodes only the functions it
+    accesses. Functions are compiled on their first use. At most
+    `max_bundles` bundles are kept, the least recently used ones are
+    dropped first.
+    """
+
+    def __init__(self, max_bundles: int=64):
+        if max_bundles < 1:
+            raise ValueError('`max_bundles` must be positive')
+        self.max_bundles = max_bundles
+        self.num_hits = 0
+        # hash -> (bundle, encoded bundle, compiled functions)
+        self._bundles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._bundles)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._bundles
+
+    def add(self, bundle: JsonObject) -> str:
+        """Add a bundle and return its content hash."""
+        if not isinstance(bundle, JsonObject):
+            raise TypeError('A bundle must be type `JsonObject`')
+        key = JsonDiff().content_hash(bundle).hex()
+        with self._lock:
+            if key in self._bundles:
+                self._bundles.move_to_end(key)
+                return key
+            self._bundles[key] = (bundle, encode_document(bundle), {})
+            while len(self._bundles) > self.max_bundles:
+                self._bundles.popitem(last=False)
+        return key
+
+    def copy(self, key: str) -> JsonObject:
+        """Return a lazily decoded copy of bundle `key`."""
+        with self._lock:
+            entry = self._bundles.get(key)
+        if entry is None:
+            raise KeyError(f'Unknown bundle {key}')
+        return decode_document(entry[1])
+
+    def get(self, key: str, name: str) -> 'ExtJsonPatch':
+        """Return the compiled function `name` of bundle `key`."""
+        from .json_patch import ExtJsonPatch
+        with self._lock:
+            entry = self._bundles.get(key)
+            if entry is None:
+                raise KeyError(f'Unknown bundle {key}')
+            self._bundles.move_to_end(key)
+            bundle, _, functions = entry
+            patch = functions.get(name)
+            if patch is not None:
+                self.num_hits += 1
+                return patch
+        patch_ops = bundle.value.get(JsonString(name))
+        if not isinstance(patch_ops, JsonArray):
+            raise KeyError(f'Bundle {key} has no function {name}')
+        # compile outside of the lock; concurrent misses compile twice
+        patch = ExtJsonPatch.from_json_array(patch_ops)
+        with self._lock:
+            functions[name] = patch
+        return patch
+
+
+class EvaluationDaemon:
+    """Evaluate patches for clients of a long-lived process.
+
+    Requests and responses are JSON objects, one per line on a Unix
+    socket or one per POST request via HTTP. Each request has a
+    `method` and optionally an `id`, which is returned unchanged:
+
+    - `register` with a `bundle` returns its content hash as `bundle`
+    - `apply` applies the inline `patch` to `doc`, or calls the
+      `function` of the registered `bundle` as by `ctrl/call-func`
+      with `doc` as `/inp` and the bundle as `/req`, and returns the
+      result as `doc`
+    - `stats` returns the request statistics as `stats`
+
+    Responses hold `ok`, the server-side `latency` in seconds and, if
+    the request failed, an `error` message. Bundles are kept compiled
+    in a `BundleCache` and inline patches in the cache of the shared
+    `ExecutionContext`, which is also used for nested patches.
+
+    Each request may execute at most `max_ops` operations, including
+    those of nested patches. HTTP requests must be POST requests of
+    type `application/json` of at most `max_request_size` bytes
+    without an `Origin` header, so that web pages cannot send them.
+    """
+
+    def __init__(
+        self, max_bundles: int=64, max_cached_patches: int=256,
+        max_ops: Optional[int]=1000000, max_request_size: int=16 * 2**20
+    ):
+        self.bundles = BundleCache(max_bundles)
+        self.max_ops = max_ops
+        self.max_request_size = max_request_size
+        self.context = ExecutionContext(
+            debug=False, max_cached_patches=max_cached_patches,
+            hooks=(self._count_request_op,)
+        )
+        self.num_requests = 0
+        self.num_errors = 0
+        self._latencies = deque(maxlen=10000)
+        self._lock = threading.Lock()
+        self._servers = []
+        # operations executed by the request of the current thread
+        self._request = threading.local()
+
+    def handle(self, request: JsonValue) -> JsonObject:
+        """Process a request and return the response."""
+        return self._handle(lambda: request)
+
+    def handle_line(self, line: str) -> str:
+        """Process a request given as JSON text."""
+        return self._handle(lambda: JsonFactory.from_json(line)).to_json()
+
+    def _count_request_op(self, op, json_doc) -> None:
+        num_ops = getattr(self._request, 'num_ops', 0) + 1
+        self._request.num_ops = num_ops
+        if self.max_ops is not None and num_ops > self.max_ops:
+            raise ExecutionLimitExceeded(
+                f'Limit of {self.max_ops} operations per request exceeded'
+            )
+
+    def _handle(self, read_request) -> JsonObject:
+        start = time.perf_counter()
+        response = {}
+        self._request.num_ops = 0
+        try:
+            request = read_request()
+            if not isinstance(request, JsonObject):
+                raise TypeError('A request must be a JSON object')
+            if 'id' in request:
+                response['id'] = request['id']
+            response.update(self._dispatch(request))
+            response['ok'] = True
+        except Exception as exc:
+            response['ok'] = False
+            response['error'] = f'{type(exc).__name__}: {exc}'
+        latency = time.perf_counter() - start
+        response['latency'] = _seconds(latency)
+        with self._lock:
+            self.num_requests += 1
+            self.num_errors += not response['ok']
+            self._latencies.append(latency)
+        return JsonObject({
+            JsonString(k): _to_json_value(v) for k, v in response.items()
+        })
+
+    def _dispatch(self, request: JsonObject) -> dict:
+        method = request['method'].to_python()
+        if method == 'register':
+            return {'bundle': self.bundles.add(request['bundle'])}
+        if method == 'apply':
+            json_doc = request['doc']
+            atomic = 'atomic' in request and request['atomic'].to_python()
+            if 'patch' in request:
+                patch = self.context.compile(request['patch'])
+                patch.apply(json_doc, atomic=atomic, context=self.context)
+                return {'doc': json_doc}
+            key = request['bundle'].to_python()
+            patch = self.bundles.get(key, request['function'].to_python())
+            json_doc = patch.call(
+                json_doc, self.bundles.copy(key), atomic=atomic,
+                context=self.context
+            )
+            return {'doc': json_doc}
+        if method == 'stats':
+            return {'stats': self.stats()}
+        raise ValueError(f'Unknown method {method}')
+
+    def stats(self) -> dict:
+        """Return the request and cache statistics."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                'requests': self.num_requests,
+                'errors': self.num_errors,
+            }
+        stats.update({
+            'latency-p50': _percentile(latencies, 0.5),
+            'latency-p99': _percentile(latencies, 0.99),
+            'bundles': len(self.bundles),
+            'bundle-hits': self.bundles.num_hits,
+        })
+        stats.update(self.context.stats())
+        return stats
+
+    def start(
+        self, socket_path: Optional[str]=None,
+        http_address: Optional[tuple]=None
+    ) -> None:
+        """Serve requests in background threads.
+
+        `socket_path` is the path of the Unix socket and
+        `http_address` the `(host, port)` of the HTTP server.
+        """
+        servers = []
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            servers.append(_UnixServer(socket_path, _LineHandler))
+            # only the user running the daemon may connect
+            os.chmod(socket_path, 0o600)
+        if http_address is not None:
+            servers.append(ThreadingHTTPServer(http_address, _HttpHandler))
+        if not servers:
+            raise ValueError('No socket path or HTTP address given')
+        for server in servers:
+            server.evaluation_daemon = self
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.extend(servers)
+
+    def shutdown(self) -> None:
+        """Stop serving requests."""
+        servers, self._servers = self._servers, []
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+            if isinstance(server, _UnixServer):
+                os.unlink(server.server_address)
+
+    @property
+    def http_address(self) -> Optional[tuple]:
+        for server in self._servers:
+            if isinstance(server, ThreadingHTTPServer):
+                return server.server_address[:2]
+        return None
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _LineHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.evaluation_daemon.handle_line(
+                line.decode('utf-8')
+            )
+            self.wfile.write(response.encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class _HttpHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self) -> None:
+        daemon = self.server.evaluation_daemon
+        # browsers send an `Origin` header with cross-origin requests
+        if 'Origin' in self.headers:
+            self.send_error(403, 'Cross-origin requests are not allowed')
+            return
+        if self.headers.get_content_type() != 'application/json':
+            self.send_error(415, 'Content type must be application/json')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.send_error(400, 'Invalid Content-Length')
+            return
+        if length < 0:
+            self.send_error(400, 'Invalid Content-Length')
+            return
+        if length > daemon.max_request_size:
+            self.send_error(413)
+            return
+        body = self.rfile.read(length).decode('utf-8')
+        response = daemon.handle_line(body)
+        response = response.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class DaemonClient:
+    """Send requests to an `EvaluationDaemon` over its Unix socket.
+
+    Documents, patches and bundles may be given as Python or JSON
+    values. Results are returned as JSON values.
+    """
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._socket = None
+        self._file = None
+
+    def __enter__(self) -> 'DaemonClient':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._socket is not None:
+            self._file.close()
+            self._socket.close()
+            self._socket = self._file = None
+
+    def request(self, method: str, **fields) -> JsonObject:
+        """Send a request and return the response."""
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(self.socket_path)
+            self._file = self._socket.makefile('rwb')
+        fields['method'] = method
+        request = JsonObject({
+            JsonString(k): _to_json_value(v) for k, v in fields.items()
+        })
+        self._file.write(request.to_json().encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            self.close()
+            raise DaemonError('Connection closed by the daemon')
+        response = JsonFactory.from_json(line.decode('utf-8'))
+        if not response['ok'].to_python():
+            raise DaemonError(response['error'].to_python())
+        return response
+
+    def register(self, bundle) -> str:
+        """Register a bundle and return its content hash."""
+        return self.request('register', bundle=bundle)['bundle'].to_python()
+
+    def apply(
+        self, json_doc, patch=None, bundle: Optional[str]=None,
+        function: Optional[str]=None, atomic: bool=False
+    ) -> JsonValue:
+        """Apply a patch or call a bundle function and return the result."""
+        fields = {'doc': json_doc, 'atomic': atomic}
+        if patch is not None:
+            if not isinstance(patch, (list, JsonArray)):
+                patch = patch.to_json_array()
+            fields['patch'] = patch
+        else:
+            fields['bundle'] = bundle
+            fields['function'] = function
+        return self.request('apply', **fields)['doc']
+
+    def stats(self) -> dict:
+        return self.request('stats')['stats'].to_python()
+
+
+def main(argv: Optional[Sequence[str]]=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog='python -m jotvm.daemon',
+        description='Serve patch evaluations with warm caches.'
+    )
+    parser.add_argument('--socket', help='path of the Unix socket')
+    parser.add_argument(
+        '--http-port', type=int, help='also serve HTTP on localhost'
+    )
+    parser.add_argument('--max-bundles', type=int, default=64)
+    parser.add_argument(
+        '--max-ops', type=int, default=1000000,
+        help='maximum number of operations per request'
+    )
+    parser.add_argument(
+        '--max-request-size', type=int, default=16 * 2**20,
+        help='maximum size of HTTP requests in bytes'
+    )
+    args = parser.parse_args(argv)
+    if args.socket is None and args.http_port is None:
+        parser.error('--socket or --http-port is required')
+    daemon = EvaluationDaemon(
+        max_bundles=args.max_bundles, max_ops=args.max_ops,
+        max_request_size=args.max_request_size
+    )
+    http_address = None
+    if args.http_port is not None:
+        http_address = ('127.0.0.1', args.http_port)
+    daemon.start(args.socket, http_address)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+from typing import (
+    NamedTuple,
+    Optional,
+)
+from .json_pointer import JsonPointer
+from .json_patch_op_base import SEGMENTS_SUFFIX
+from .json.json_types import (
+    JsonObject,
+    JsonString,
+)
+
+
+__all__ = ['OpAccess', 'op_access', 'is_independent']
+
+
+# Control operations applying a nested patch to the subtree at `path`
+SCOPE_OP_NAMES = (
+    'ctrl/cond-apply-patch',
+    'ctrl/cond-apply-patch-op',
+    'ctrl/while-loop',
+    'ctrl/for-loop',
+    'ctrl/for-each',
+    'ctrl/apply-patch',
+    'ctrl/apply-patch-op',
+)
+
+
+class OpAccess(NamedTuple):
+    """Locations of a document read and written by an operation.
+
+    Each location is a tuple of pointer segments and stands for the
+    whole subtree below it.
+    """
+
+    reads: tuple
+    writes: tuple
+
+
+def _pointer(value) -> tuple:
+    if not isinstance(value, JsonString):
+        raise TypeError('JSON pointer must be a string')
+    return tuple(JsonPointer(value))
+
+
+def _write_location(path: tuple) -> tuple:
+    # insertions and removals in an array shift the siblings
+    if not path:
+        return path
+    last = path[-1]
+    if last == '-' or last.lstrip('+-').isdigit():
+        return path[:-1]
+    return path
+
+
+def _indirect_reads(fields: JsonObject, exclude: tuple=()) -> list:
+    """Pointers in `*-path` fields, also within nested objects."""
+    reads = []
+    for key, value in fields.items():
+        if key in exclude:
+            continue
+        if key.endswith('-path'):
+            reads.append(_pointer(value))
+        elif isinstance(value, JsonObject):
+            reads.extend(_indirect_reads(value))
+    return reads
+
+
+def _mapping_pointers(fields: JsonObject, name: str) -> list:
+    mapping = fields.get(name, JsonObject())
+    if not isinstance(mapping, JsonObject):
+        raise TypeError(f'`{name}` must be an object')
+    return [_pointer(value) for value in mapping.values()]
+
+
+def _access(op_name: str, fields: JsonObject) -> OpAccess:
+    if op_name in ('ctrl/call-func', 'ctrl/map-func', 'ctrl/reduce-func'):
+        reads = _indirect_reads(fields, exclude=('out-path',))
+        writes = [_write_location(_pointer(fields['out-path']))]
+    elif op_name == 'ctrl/call-patch':
+        reads = _mapping_pointers(fields, 'args-paths')
+        if 'patch-path' in fields:
+            reads.append(_pointer(fields['patch-path']))
+        writes = [
+            _write_location(p) for p in _mapping_pointers(fields, 'result-paths')
+        ]
+    elif op_name in SCOPE_OP_NAMES:
+        path = _pointer(fields['path'])
+        reads = [path] + [
+            _pointer(value) for key, value in fields.items()
+            if key.endswith('-path')
+        ]
+        writes = [path]
+    elif op_name.startswith('ctrl/'):
+        raise ValueError(f'Unknown control operation `{op_name}`')
+    else:
+        # standard and unary/binary operations at `path`
+        path = _pointer(fields['path'])
+        reads = [path] + [
+            _pointer(value) for key, value in fields.items()
+            if key.endswith('-path')
+        ]
+        writes = [] if op_name == 'test' else [_write_location(path)]
+        if 'from' in fields:
+            from_path = _pointer(fields['from'])
+            reads.append(from_path)
+            if op_name == 'move':
+                writes.append(_write_location(from_path))
+    return OpAccess(tuple(reads), tuple(writes))
+
+
+def op_access(op_fields: JsonObject) -> Optional[OpAccess]:
+    """Return the read and write sets of a patch operation.
+
+    Returns `None` if they cannot be determined statically, e.g.
+    for pointers given as segments.
+    """
+    if any(key.endswith(SEGMENTS_SUFFIX) for key in op_fields):
+        return None
+    try:
+        return _access(op_fields['op'].to_python(), op_fields)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _overlap(path1: tuple, path2: tuple) -> bool:
+    n = min(len(path1), len(path2))
+    return path1[:n] == path2[:n]
+
+
+def is_independent(access1: OpAccess, access2: OpAccess) -> bool:
+    """Check whether two operations can be executed in any order."""
+    for write in access1.writes:
+        if any(_overlap(write, p) for p in access2.reads + access2.writes):
+            return False
+    for write in access2.writes:
+        if any(_overlap(write, p) for p in access1.reads):
+            return False
+    return True
@@ -36,9 +36,7 @@ class EndoUnaryOpBase(JsonPatchOpBase):
         if arg_value is MissingValue:
             arg_value = path.get(json_doc)
         result = self.basic_op(arg_value)
-        if path.exists(json_doc):
-            path.remove(json_doc)
-        path.add(json_doc, result)
+        path.set(json_doc, result, create=True)
 
 
 def make_endo_unary_op_class(class_name: str, op_name: str, op_func: callable):
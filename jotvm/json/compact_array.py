@@ -0,0 +1,273 @@
+from __future__ import annotations
+import operator
+from array import array
+from copy import deepcopy
+from decimal import Decimal
+from typing import Optional
+from .json_value import JsonValue
+from .json_types import (
+    JsonArray,
+    JsonObject,
+    JsonNumber,
+)
+from .write_barrier import (
+    MissingEntry,
+    active_write_observers,
+    notify_write,
+)
+
+
+__all__ = ['CompactNumberArray', 'compact_arrays']
+
+
+# Scaled integers have at most 18 digits, so that they fit a signed
+# 64-bit integer and are scaled exactly within the 28 digits of the
+# decimal context of `JsonNumber`
+_MAX_DIGITS = 18
+
+
+def _scaled(value, exponent: int) -> Optional[int]:
+    """Return `value` as integer multiple of `10**exponent` if exact."""
+    if type(value) is not JsonNumber:
+        return None
+    sign, digits, value_exponent = value.value.as_tuple()
+    # negative zero cannot be represented by an integer
+    if value_exponent != exponent or len(digits) > _MAX_DIGITS or (
+        sign and not any(digits)
+    ):
+        return None
+    return int(value.value.scaleb(-exponent, JsonValue.CONTEXT))
+
+
+class CompactNumberArray(JsonArray):
+    """`JsonArray` of numbers packed as scaled 64-bit integers.
+
+    All elements share the exponent of the first one, i.e. element `i`
+    is `packed[i] * 10**exponent` with the same `Decimal` representation
+    as before packing, so equality, serialization and content hashes
+    are unchanged. Elements are boxed as `JsonNumber` on access. Using
+    `value`, or storing a number that does not fit the packing, unpacks
+    the array into a list as for a plain `JsonArray`. Copies of an
+    unpacked array are plain `JsonArray`s.
+    """
+
+    def __init__(self, packed: array, exponent: int):
+        self._packed = packed
+        self._exponent = exponent
+        self._value = None
+
+    @classmethod
+    def from_numbers(cls, values: list) -> Optional['CompactNumberArray']:
+        """Pack JSON numbers, or return `None` if they do not fit."""
+        if not values or type(values[0]) is not JsonNumber:
+            return None
+        exponent = values[0].value.as_tuple().exponent
+        packed = array('q')
+        for value in values:
+            scaled = _scaled(value, exponent)
+            if scaled is None:
+                return None
+            packed.append(scaled)
+        return cls(packed, exponent)
+
+    @property
+    def is_packed(self) -> bool:
+        return self._packed is not None
+
+    @property
+    def value(self) -> list:
+        if self._packed is not None:
+            self._value = [self._box(n) for n in self._packed]
+            self._packed = None
+        return self._value
+
+    @value.setter
+    def value(self, value: list) -> None:
+        self._packed = None
+        self._value = value
+
+    def _decimal(self, scaled: int) -> Decimal:
+        if self._exponent == 0:
+            return Decimal(scaled)
+        return Decimal(scaled).scaleb(self._exponent, JsonValue.CONTEXT)
+
+    def _box(self, scaled: int) -> JsonNumber:
+        number = object.__new__(JsonNumber)
+        number.value = self._decimal(scaled)
+        return number
+
+    def _format(self, scaled: int) -> str:
+        # same as `str` of the `Decimal` value without creating it
+        exponent = self._exponent
+        if exponent == 0:
+            return str(scaled)
+        digits = str(abs(scaled))
+        if exponent > 0 or len(digits) - 1 + exponent < -6:
+            # exponential notation
+            return str(self._decimal(scaled))
+        if len(digits) <= -exponent:
+            digits = '0' * (1 - exponent - len(digits)) + digits
+        sign = '-' if scaled < 0 else ''
+        return f'{sign}{digits[:exponent]}.{digits[exponent:]}'
+
+    def exact_sum(self) -> Optional[Decimal]:
+        """Return the sum of the packed elements.
+
+        The result equals the sum computed with `Decimal` arithmetic.
+        `None` is returned if the array is unpacked or the sum might
+        be rounded.
+        """
+        if self._packed is None:
+            return None
+        # no partial sum has more digits than the decimal context
+        scale = 10**max(self._exponent, 0)
+        if sum(map(abs, self._packed)) * scale >= 10**JsonValue.CONTEXT.prec:
+            return None
+        total = sum(self._packed)
+        if self._exponent > 0:
+            # the sum starts at the integer zero
+            return Decimal(total * scale)
+        return self._decimal(total)
+
+    def decimals(self) -> list:
+        """Return the `Decimal` values of the elements."""
+        if self._packed is None:
+            return [v.value for v in self._value]
+        return [self._decimal(n) for n in self._packed]
+
+    # ------------ Packed Access -----------------
+
+    def __len__(self):
+        if self._packed is None:
+            return len(self._value)
+        return len(self._packed)
+
+    def __iter__(self):
+        if self._packed is None:
+            return iter(self._value)
+        return (self._box(n) for n in self._packed)
+
+    def __getitem__(self, index: int) -> JsonValue:
+        if self._packed is None:
+            return self._value[index]
+        if isinstance(index, slice):
+            return [self._box(n) for n in self._packed[index]]
+        return self._box(self._packed[index])
+
+    def __setitem__(self, index: int, value: JsonValue) -> None:
+        scaled = None
+        if self._packed is not None and not isinstance(index, slice):
+            scaled = _scaled(value, self._exponent)
+        if scaled is None:
+            super().__setitem__(index, value)
+            return
+        if active_write_observers():
+            index = self._normalize_index(index)
+            old = self._box(self._packed[index])
+            self._packed[index] = scaled
+            notify_write(self, index, old, value)
+        else:
+            self._packed[index] = scaled
+
+    def __delitem__(self, index: int) -> None:
+        if self._packed is None or isinstance(index, slice):
+            super().__delitem__(index)
+        elif active_write_observers():
+            index = self._normalize_index(index)
+            old = self._box(self._packed.pop(index))
+            notify_write(self, index, old, MissingEntry)
+        else:
+            del self._packed[index]
+
+    def insert(self, index: int, value: JsonValue) -> None:
+        scaled = None
+        if self._packed is not None:
+            scaled = _scaled(value, self._exponent)
+        if scaled is None:
+            super().insert(index, value)
+            return
+        if active_write_observers():
+            # clamp like list.insert so observers see the actual position
+            index = operator.index(index)
+            if index < 0:
+                index = max(index + len(self._packed), 0)
+            index = min(index, len(self._packed))
+            self._packed.insert(index, scaled)
+            notify_write(self, index, MissingEntry, value)
+        else:
+            self._packed.insert(index, scaled)
+
+    def _normalize_index(self, index: int) -> int:
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not (0 <= index < len(self)):
+            raise IndexError('list index out of range')
+        return index
+
+    # ------------ Conversions -------------------
+
+    def to_python(self) -> list:
+        return self.decimals()
+
+    def to_json(self, conv_args=None) -> str:
+        if self._packed is None:
+            return super().to_json()
+        return '[' + ','.join(map(self._format, self._packed)) + ']'
+
+    def __repr__(self):
+        if self._packed is None:
+            return f'JsonArray({self._value!r})'
+        return f'CompactNumberArray({self.decimals()!r})'
+
+    def __eq__(self, other):
+        if not isinstance(other, JsonArray):
+            return NotImplemented
+        if (
+            isinstance(other, CompactNumberArray) and self.is_packed
+            and other.is_packed and self._exponent == other._exponent
+        ):
+            return self._packed == other._packed
+        # compares the boxed elements without unpacking
+        return list(self) == list(other)
+
+    __hash__ = None
+
+    def __deepcopy__(self, memo):
+        if self._packed is None:
+            return JsonArray([deepcopy(v, memo) for v in self._value])
+        return CompactNumberArray(array('q', self._packed), self._exponent)
+
+    def __reduce__(self):
+        if self._packed is None:
+            return (JsonArray, (self._value,))
+        return (CompactNumberArray, (self._packed, self._exponent))
+
+
+def compact_arrays(json_doc: JsonValue, min_length: int=16) -> JsonValue:
+    """Pack the numeric arrays of a document and return the document.
+
+    Arrays with at least `min_length` numbers of the same exponent
+    are replaced by `CompactNumberArray`s. The replacement changes
+    only the representation, so it is not reported to write
+    observers. The returned document differs from `json_doc` only
+    if `json_doc` itself is packed.
+    """
+    def pack(value):
+        if isinstance(value, CompactNumberArray):
+            return value
+        if isinstance(value, JsonArray) and len(value) >= min_length:
+            compact = CompactNumberArray.from_numbers(value.value)
+            if compact is not None:
+                return compact
+        if isinstance(value, JsonObject):
+            items = value.value
+            for key, child in items.items():
+                items[key] = pack(child)
+        elif isinstance(value, JsonArray):
+            values = value.value
+            for i, child in enumerate(values):
+                values[i] = pack(child)
+        return value
+
+    return pack(json_doc)
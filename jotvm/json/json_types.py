@@ -1,5 +1,6 @@
 from __future__ import annotations
 import json
+import operator
 from abc import ABC, abstractmethod
 from collections.abc import (
     MutableMapping,
@@ -14,6 +15,11 @@ from typing import (
 from decimal import Decimal
 from .tokens import TokenStream
 from .json_value import JsonValue
+from .write_barrier import (
+    MissingEntry,
+    active_write_observers,
+    notify_write,
+)
 
 
 JsonValueType = TypeVar('JsonValueType', bound='JsonValue')
@@ -114,11 +120,20 @@ class JsonObject(
 
     def __setitem__(self, key: JsonString, value: JsonValue) -> None:
         key = self._normalize_key(key)
-        self.value[key] = value
+        if active_write_observers():
+            old = self.value.get(key, MissingEntry)
+            self.value[key] = value
+            notify_write(self, key, old, value)
+        else:
+            self.value[key] = value
 
     def __delitem__(self, key: JsonString) -> None:
         key = self._normalize_key(key)
-        del self.value[key]
+        if active_write_observers():
+            old = self.value.pop(key)
+            notify_write(self, key, old, MissingEntry)
+        else:
+            del self.value[key]
 
     def __iter__(self):
         return iter(self.value)
@@ -180,10 +195,21 @@ class JsonArray(
     def __setitem__(self, index: int, value: JsonValue) -> None:
         if not isinstance(value, JsonValue):
             raise TypeError('Value must be a JsonValue')
-        self.value[index] = value
+        if active_write_observers():
+            index = self._normalize_index(index)
+            old = self.value[index]
+            self.value[index] = value
+            notify_write(self, index, old, value)
+        else:
+            self.value[index] = value
 
     def __delitem__(self, index: int) -> None:
-        del self.value[index]
+        if active_write_observers():
+            index = self._normalize_index(index)
+            old = self.value.pop(index)
+            notify_write(self, index, old, MissingEntry)
+        else:
+            del self.value[index]
 
     def __len__(self):
         return len(self.value)
@@ -191,7 +217,24 @@ class JsonArray(
     def insert(self, index: int, value: JsonValue) -> None:
         if not isinstance(value, JsonValue):
             raise TypeError('Value must be a JsonValue')
-        self.value.insert(index, value)
+        if active_write_observers():
+            # clamp like list.insert so observers see the actual position
+            index = operator.index(index)
+            if index < 0:
+                index = max(index + len(self.value), 0)
+            index = min(index, len(self.value))
+            self.value.insert(index, value)
+            notify_write(self, index, MissingEntry, value)
+        else:
+            self.value.insert(index, value)
+
+    def _normalize_index(self, index: int) -> int:
+        index = operator.index(index)
+        if index < 0:
+            index += len(self.value)
+        if not (0 <= index < len(self.value)):
+            raise IndexError('list index out of range')
+        return index
 
 
 class JsonString(JsonValue, JsonParsableMixin):
@@ -348,9 +391,10 @@ class JsonBool(JsonValue, JsonParsableMixin):
 
 
 class JsonNull(JsonValue, JsonParsableMixin):
-    def __init__(obj=None) -> None:
+    def __init__(self, obj=None) -> None:
         if obj is not None:
             raise TypeError('Expected obj to be `None`')
+        self.value = None
 
     def __eq__(self, other):
         return isinstance(other, JsonNull)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class MissingEntryType:
+    """Marker for the absent side of a container write."""
+
+    def __repr__(self):
+        return 'MissingEntry'
+
+
+MissingEntry = MissingEntryType()
+
+
+class WriteObserverBase:
+    """Base class for observers of container mutations.
+
+    Observers are activated with `observe_writes` and are notified
+    by the setters of `JsonObject` and `JsonArray` (and hence by
+    every `JsonPointer` mutation) after the container was updated.
+    """
+
+    # Whether the observer needs to see the writes to the scratch
+    # documents of called patches, which prevents running them
+    # concurrently on other threads or processes.
+    observes_scratch = False
+
+    def on_write(self, container, key, old, new) -> None:
+        """Called after `container[key]` changed from `old` to `new`.
+
+        An insertion has `old` set to `MissingEntry`, a deletion
+        has `new` set to `MissingEntry`.
+        """
+        pass
+
+    def on_walk(self, containers: list, keys: tuple) -> None:
+        """Called when a `JsonPointer` walked from `containers[0]`.
+
+        `containers[i + 1]` was reached via `keys[i]`. The walk is
+        reported before the last container is mutated or used as
+        the scope of a nested patch.
+        """
+        pass
+
+    def on_release(self, value) -> None:
+        """Called when a scratch container is discarded.
+
+        The contents of the container were populated by observed
+        writes, but the container itself was not.
+        """
+        pass
+
+
+_write_observers: ContextVar[tuple] = ContextVar(
+    'jotvm_write_observers', default=()
+)
+
+
+def active_write_observers() -> tuple:
+    """Return the observers active in the current context."""
+    return _write_observers.get()
+
+
+@contextmanager
+def observe_writes(observer: WriteObserverBase):
+    """Activate `observer` for all container writes within the block."""
+    if not isinstance(observer, WriteObserverBase):
+        raise TypeError('`observer` must be of type `WriteObserverBase`')
+    token = _write_observers.set(_write_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _write_observers.reset(token)
+
+
+def notify_write(container, key, old, new) -> None:
+    # Every observer sees the write before the first error is raised,
+    # e.g. a transaction undoes a write rejected by a memory quota.
+    error = None
+    for observer in _write_observers.get():
+        try:
+            observer.on_write(container, key, old, new)
+        except Exception as exc:
+            if error is None:
+                error = exc
+    if error is not None:
+        raise error
+
+
+def notify_walk(containers: list, keys: tuple) -> None:
+    for observer in _write_observers.get():
+        observer.on_walk(containers, keys)
+
+
+def notify_release(value) -> None:
+    for observer in _write_observers.get():
+        observer.on_release(value)
@@ -0,0 +1,321 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from hashlib import blake2b
+from typing import Optional
+from .json_pointer import JsonPointer
+from .json.write_barrier import (
+    WriteObserverBase,
+    observe_writes,
+)
+from .json.json_types import (
+    JsonContainerTypes,
+    JsonValue,
+    JsonObject,
+    JsonArray,
+    JsonString,
+    JsonNumber,
+    JsonBool,
+    JsonNull,
+)
+
+
+__all__ = ['JsonDiff']
+
+
+def _make_op(
+    op_name: str, path: tuple, value: JsonValue=None, from_path: tuple=None
+) -> JsonObject:
+    op = {
+        JsonString('op'): JsonString(op_name),
+        JsonString('path'): JsonString(str(JsonPointer.from_segments(path))),
+    }
+    if from_path is not None:
+        op[JsonString('from')] = JsonString(str(JsonPointer.from_segments(from_path)))
+    if value is not None:
+        op[JsonString('value')] = value
+    return JsonObject(op)
+
+
+def _myers_matches(a: list, b: list, max_dist: int) -> Optional[list]:
+    """Return the matched index pairs of a shortest edit script.
+
+    Returns `None` if more than `max_dist` edits are required.
+    """
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(max_dist + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k-1] < v[k+1]):
+                x = v[k+1]
+            else:
+                x = v[k-1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _myers_backtrack(trace, n, m)
+    return None
+
+
+def _myers_backtrack(trace: list, x: int, y: int) -> list:
+    matches = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k-1] < v[k+1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+class JsonDiff(WriteObserverBase):
+    """Structural difference of two JSON documents as patch operations.
+
+    Content hashes of all nodes are computed once per diff, so that
+    identical subtrees are recognized in constant time. Within `track`,
+    the hashes are kept across diffs and the writes to the documents
+    invalidate those of the changed containers and the containers they
+    are part of, so that repeated diffs of a changing document only
+    rehash the changed paths. Arrays are
+    aligned with Myers' algorithm on the element hashes and elements
+    that changed their position are expressed as `move` operations.
+    If more than `max_edit_distance` insertions and deletions are
+    needed to align an array, its elements are compared position by
+    position instead.
+    """
+
+    def __init__(self, max_edit_distance: int=1000, detect_moves: bool=True):
+        if max_edit_distance < 0:
+            raise ValueError('`max_edit_distance` must be non-negative')
+        self.max_edit_distance = max_edit_distance
+        self.detect_moves = detect_moves
+        # id(value) -> (value, hash)
+        self._hashes = {}
+        # id(child) -> {id(container): container}
+        self._parents = {}
+        self._tracking = False
+
+    @contextmanager
+    def track(self):
+        """Keep the content hashes across the diffs within the block.
+
+        Documents must only be changed by observed writes, e.g. by
+        applying patches, within the block.
+        """
+        self._tracking = True
+        try:
+            with observe_writes(self):
+                yield self
+        finally:
+            self._tracking = False
+            self._clear()
+
+    def on_write(self, container, key, old, new) -> None:
+        # outdated are the hashes of the container and, transitively,
+        # of the containers it is part of
+        stack = [container]
+        while stack:
+            value = stack.pop()
+            cached = self._hashes.get(id(value))
+            if cached is None or cached[0] is not value:
+                continue
+            del self._hashes[id(value)]
+            stack.extend(self._parents.get(id(value), {}).values())
+
+    def _clear(self) -> None:
+        self._hashes.clear()
+        self._parents.clear()
+
+    def content_hash(self, value: JsonValue) -> bytes:
+        """Return the content hash of a JSON value."""
+        cached = self._hashes.get(id(value))
+        if cached is not None and cached[0] is value:
+            return cached[1]
+        h = blake2b(digest_size=16)
+        if isinstance(value, JsonObject):
+            h.update(b'o')
+            child_hashes = sorted(
+                self.content_hash(k) + self._child_hash(value, v)
+                for k, v in value.value.items()
+            )
+            for child_hash in child_hashes:
+                h.update(child_hash)
+        elif isinstance(value, JsonArray):
+            h.update(b'a')
+            for v in value:
+                h.update(self._child_hash(value, v))
+        elif isinstance(value, JsonString):
+            h.update(b's')
+            h.update(value.value.encode('utf-8', 'surrogatepass'))
+        elif isinstance(value, JsonNumber):
+            h.update(b'd')
+            h.update(value.to_json().encode())
+        elif isinstance(value, JsonBool):
+            h.update(b't' if value.value else b'f')
+        elif isinstance(value, JsonNull):
+            h.update(b'n')
+        else:
+            h.update(type(value).__name__.encode())
+            h.update(value.to_json().encode())
+        digest = h.digest()
+        # keep a reference so that the id is not reused while cached
+        self._hashes[id(value)] = (value, digest)
+        return digest
+
+    def _child_hash(self, container: JsonValue, child: JsonValue) -> bytes:
+        if isinstance(child, JsonContainerTypes):
+            self._parents.setdefault(id(child), {})[id(container)] = container
+        return self.content_hash(child)
+
+    def diff(self, old: JsonValue, new: JsonValue) -> JsonArray:
+        """Return the patch operations transforming `old` into `new`."""
+        if not (
+            isinstance(old, JsonContainerTypes) and type(old) is type(new)
+        ):
+            raise TypeError(
+                '`old` and `new` must both be either JsonObject or JsonArray'
+            )
+        ops = []
+        try:
+            self._diff(old, new, (), ops)
+        finally:
+            if not self._tracking:
+                self._clear()
+        return JsonArray(ops)
+
+    def _diff(self, old: JsonValue, new: JsonValue, path: tuple, ops: list) -> None:
+        if old is new or self.content_hash(old) == self.content_hash(new):
+            return
+        if isinstance(old, JsonObject) and isinstance(new, JsonObject):
+            self._diff_object(old, new, path, ops)
+        elif isinstance(old, JsonArray) and isinstance(new, JsonArray):
+            self._diff_array(old, new, path, ops)
+        else:
+            ops.append(_make_op('replace', path, value=new))
+
+    def _diff_object(self, old: JsonObject, new: JsonObject, path: tuple, ops: list) -> None:
+        removed = [k for k in old.value if k not in new.value]
+        added = [k for k in new.value if k not in old.value]
+        if self.detect_moves and removed and added:
+            # renamed keys
+            sources = {}
+            for key in removed:
+                sources.setdefault(self.content_hash(old.value[key]), []).append(key)
+            remaining = []
+            for key in added:
+                candidates = sources.get(self.content_hash(new.value[key]))
+                if candidates:
+                    from_key = candidates.pop()
+                    ops.append(_make_op(
+                        'move', path + (key.value,),
+                        from_path=path + (from_key.value,)
+                    ))
+                    removed.remove(from_key)
+                else:
+                    remaining.append(key)
+            added = remaining
+        for key in removed:
+            ops.append(_make_op('remove', path + (key.value,)))
+        for key in added:
+            ops.append(_make_op('add', path + (key.value,), value=new.value[key]))
+        for key, old_value in old.value.items():
+            new_value = new.value.get(key)
+            if new_value is not None:
+                self._diff(old_value, new_value, path + (key.value,), ops)
+
+    def _diff_array(self, old: JsonArray, new: JsonArray, path: tuple, ops: list) -> None:
+        old_hashes = [self.content_hash(v) for v in old]
+        new_hashes = [self.content_hash(v) for v in new]
+        # trim the common prefix and suffix
+        start = 0
+        max_common = min(len(old_hashes), len(new_hashes))
+        while start < max_common and old_hashes[start] == new_hashes[start]:
+            start += 1
+        stop = 0
+        while (
+            stop < max_common - start
+            and old_hashes[-stop-1] == new_hashes[-stop-1]
+        ):
+            stop += 1
+        a = old_hashes[start:len(old_hashes)-stop]
+        b = new_hashes[start:len(new_hashes)-stop]
+
+        matches = _myers_matches(a, b, self.max_edit_distance)
+        if matches is None:
+            matches = []
+
+        # unmatched elements grouped by the gaps between matches
+        gaps = []
+        bounds = [(-1, -1)] + matches + [(len(a), len(b))]
+        for (i0, j0), (i1, j1) in zip(bounds, bounds[1:]):
+            gaps.append((list(range(i0 + 1, i1)), list(range(j0 + 1, j1))))
+
+        # index in `a` of the element ending up at each position of `b`
+        # (or None for inserted elements)
+        source = [None] * len(b)
+        for i, j in matches:
+            source[j] = i
+        moved = set()
+        if self.detect_moves:
+            deleted = {}
+            for dels, _ in gaps:
+                for i in dels:
+                    deleted.setdefault(a[i], []).append(i)
+            for _, ins in gaps:
+                for j in ins:
+                    candidates = deleted.get(b[j])
+                    if candidates:
+                        i = candidates.pop(0)
+                        source[j] = i
+                        moved.add(i)
+        # pair the remaining elements within each gap
+        pairs = []
+        for dels, ins in gaps:
+            dels = [i for i in dels if i not in moved]
+            ins = [j for j in ins if source[j] is None]
+            for i, j in zip(dels, ins):
+                source[j] = i
+                pairs.append((i, j))
+        kept = set(i for i in source if i is not None)
+
+        # 1. remove deleted elements, starting at the end
+        for i in reversed(range(len(a))):
+            if i not in kept:
+                ops.append(_make_op('remove', path + (str(start + i),)))
+        # 2. move elements next to their predecessor in the target order
+        work = [i for i in range(len(a)) if i in kept]
+        target = [i for i in source if i is not None]
+        for q, i in enumerate(target):
+            if i not in moved:
+                continue
+            src = work.index(i)
+            work.pop(src)
+            dst = work.index(target[q-1]) + 1 if q > 0 else 0
+            work.insert(dst, i)
+            if src != dst:
+                ops.append(_make_op(
+                    'move', path + (str(start + dst),),
+                    from_path=path + (str(start + src),)
+                ))
+        # 3. insert new elements
+        for j, i in enumerate(source):
+            if i is None:
+                ops.append(_make_op(
+                    'add', path + (str(start + j),), value=new[start + j]
+                ))
+        # 4. descend into elements changed in place
+        for i, j in pairs:
+            self._diff(old[start + i], new[start + j], path + (str(start + j),), ops)
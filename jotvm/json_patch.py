@@ -1,24 +1,49 @@
 from __future__ import annotations
-from typing import Union
+from concurrent.futures import Executor
+from typing import (
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
 from .json_patch_ops import PATCH_OP_CLASSES
 from .binary_ops import BINARY_OP_CLASSES
 from .relation_ops import RELATION_OP_CLASSES
-from .controls import CONTROL_OP_CLASSES
+from .controls import (
+    CONTROL_OP_CLASSES,
+    ControlOpBase,
+)
 from .trafo_unary_ops import TRAFO_UNARY_OP_CLASSES
 from .endo_unary_ops import ENDO_UNARY_OP_CLASSES
+from .array_ops import ARRAY_OP_CLASSES
 from .json.json_types import (
     JsonContainerTypeHint,
     JsonContainerTypes,
     JsonArray,
+    JsonObject,
+    JsonString,
+)
+from .json.json_value import JsonValue
+from .context import ExecutionContext
+from .json_diff import JsonDiff
+from .json_patch_compose import JsonPatchComposer
+from .json_patch_optimize import PeepholeOptimizer
+from .json_patch_specialize import PartialEvaluator
+from .parallel import (
+    can_run_concurrently,
+    apply_concurrently,
+)
+from .transaction import (
+    Transaction,
+    atomic_scope,
+    current_transaction,
 )
-from .debug import SimpleDebugPrinter
 
 
 class JsonPatchBase:
 
     def __init__(self, patch_ops: list['JsonPatchOpBase']):
         self._patch_ops = patch_ops.copy()
-        self._debugger = SimpleDebugPrinter()
 
     @classmethod
     def _get_op_types(self):
@@ -50,25 +75,120 @@ class JsonPatchBase:
         json_arr = self.to_json_array()
         return json_arr.to_python()
 
-    def __call__(self, json_doc: JsonContainerTypeHint):
+    def __call__(
+        self, json_doc: JsonContainerTypeHint,
+        executor: Optional[Executor]=None,
+        context: Optional[ExecutionContext]=None
+    ):
+        if not isinstance(json_doc, JsonContainerTypes):
+            raise TypeError('json_doc must be either JsonObject or JsonArray')
+        if context is None:
+            context = ExecutionContext()
+
+        if executor is not None and can_run_concurrently(context):
+            with atomic_scope():
+                apply_concurrently(self._patch_ops, json_doc, executor, context)
+            return
+        for _ in self._steps(json_doc, context):
+            pass
+
+    def _steps(
+        self, json_doc: JsonContainerTypeHint, context: ExecutionContext
+    ) -> Iterator[tuple]:
+        """Apply the patch step by step.
+
+        Yields the operation to be applied next together with the
+        document it is applied to, including the operations of nested
+        patches, so that the caller can suspend the application.
+        """
         if not isinstance(json_doc, JsonContainerTypes):
             raise TypeError('json_doc must be either JsonObject or JsonArray')
 
-        debug_msg = self._debugger.debug
-        debug_msg('\n=== Initial State of JSON Document ===\n')
-        debug_msg(json_doc.to_python())
-        debug_msg('\n=== Start of patch application ===\n')
+        # Only render the document if debugging is enabled, as this
+        # would dominate the execution time and decode lazy documents.
+        debugging = context.debug
+        debug_msg = context.trace
+        if debugging:
+            debug_msg('\n=== Initial State of JSON Document ===\n')
+            debug_msg(json_doc.to_python())
+            debug_msg('\n=== Start of patch application ===\n')
 
-        for op in self._patch_ops:
-            debug_msg(f'Applying {op!r}')
-            op(json_doc)
-            debug_msg('\n---> New State of JSON Document:\n')
-            debug_msg(str(json_doc.to_python()) + '\n')
+        # Within a transaction, every (nested) patch application
+        # acts as a savepoint that is rolled back on failure.
+        with atomic_scope():
+            for op in self._patch_ops:
+                yield op, json_doc
+                if debugging:
+                    debug_msg(f'Applying {op!r}')
+                context.count_op(op, json_doc)
+                op = op.bind_segments(json_doc)
+                if isinstance(op, ControlOpBase):
+                    yield from op.steps(json_doc, context)
+                else:
+                    op(json_doc, context)
+                if debugging:
+                    debug_msg('\n---> New State of JSON Document:\n')
+                    debug_msg(str(json_doc.to_python()) + '\n')
 
         debug_msg('=== End of Patch Application ===\n')
 
-    def apply(self, json_doc: JsonContainerTypeHint):
-        self(json_doc)
+    def apply(
+        self, json_doc: JsonContainerTypeHint, atomic: bool=False,
+        executor: Optional[Executor]=None,
+        context: Optional[ExecutionContext]=None
+    ):
+        """Apply the patch to `json_doc`.
+
+        If `atomic` is true, the document is left unchanged if any
+        operation of the patch fails. If an `executor` is given,
+        independent calls of the patch are run concurrently on it,
+        see `apply_concurrently`. The `context` is passed on to all
+        operations, a new `ExecutionContext` is used if it is `None`.
+        """
+        if atomic and current_transaction() is None:
+            with Transaction().begin():
+                self(json_doc, executor, context)
+        else:
+            self(json_doc, executor, context)
+
+    async def apply_async(
+        self, json_doc: JsonContainerTypeHint, atomic: bool=False,
+        context: Optional[ExecutionContext]=None, **kwargs
+    ):
+        """Apply the patch without blocking the asyncio event loop.
+
+        See `apply_async` in `jotvm.cooperative` for the arguments.
+        """
+        from .cooperative import apply_async
+        await apply_async(self, json_doc, atomic, context, **kwargs)
+
+    def apply_and_record(
+        self, json_doc: JsonContainerTypeHint, atomic: bool=False
+    ) -> 'JsonPatch':
+        """Apply the patch and return the net change as `JsonPatch`."""
+        from .change_feed import ChangeFeed
+        change_feed = ChangeFeed(json_doc)
+        with change_feed.track():
+            self.apply(json_doc, atomic)
+        return change_feed.to_patch()
+
+    def call(
+        self, inp: JsonValue, req: Optional[JsonValue]=None,
+        atomic: bool=False, context: Optional[ExecutionContext]=None
+    ) -> JsonValue:
+        """Apply the patch as function and return its output.
+
+        As for `ctrl/call-func`, the patch is applied to a work document
+        with `inp` at `/inp` and the dependencies `req` at `/req`, an
+        empty object if `None`, and the value at `/out` is returned.
+        Neither `inp` nor `req` is copied.
+        """
+        work_dict = JsonObject({
+            JsonString('inp'): inp,
+            JsonString('req'): JsonObject() if req is None else req,
+        })
+        self.apply(work_dict, atomic, context=context)
+        return work_dict['out']
 
 
 class JsonPatch(JsonPatchBase):
@@ -79,6 +199,32 @@ class JsonPatch(JsonPatchBase):
             cl.get_op_name(): cl for cl in PATCH_OP_CLASSES
         }
 
+    @classmethod
+    def from_diff(
+        cls, old: JsonContainerTypeHint, new: JsonContainerTypeHint,
+        max_edit_distance: int=1000, detect_moves: bool=True
+    ) -> 'JsonPatch':
+        """Create the patch that transforms `old` into `new`."""
+        patch_ops = JsonDiff(max_edit_distance, detect_moves).diff(old, new)
+        return cls.from_json_array(patch_ops)
+
+    @classmethod
+    def compose(
+        cls, *patches: 'JsonPatch', assume_new_members: bool=False
+    ) -> 'JsonPatch':
+        """Compose patches into a single equivalent patch.
+
+        See `JsonPatchComposer` for the applied simplifications.
+        """
+        composer = JsonPatchComposer(assume_new_members)
+        for patch in patches:
+            composer.extend(patch.to_json_array())
+        return JsonPatch.from_json_array(composer.to_json_array())
+
+    def squash(self, assume_new_members: bool=False) -> 'JsonPatch':
+        """Return an equivalent patch with redundant operations merged."""
+        return self.compose(self, assume_new_members=assume_new_members)
+
 
 class ExtJsonPatch(JsonPatch):
 
@@ -100,4 +246,24 @@ class ExtJsonPatch(JsonPatch):
         op_types.update({
             cl.get_op_name(): cl for cl in ENDO_UNARY_OP_CLASSES
         })
+        op_types.update({
+            cl.get_op_name(): cl for cl in ARRAY_OP_CLASSES
+        })
         return op_types
+
+    def optimize(self, assume_new_members: bool=False) -> 'ExtJsonPatch':
+        """Return an equivalent patch with operation sequences fused.
+
+        See `PeepholeOptimizer` for the applied rewrites.
+        """
+        optimizer = PeepholeOptimizer(assume_new_members)
+        return self.from_json_array(optimizer.optimize(self.to_json_array()))
+
+    def specialize(
+        self, json_doc: JsonContainerTypeHint, immutable: Iterable[str]
+    ) -> 'ExtJsonPatch':
+        """Return the patch specialized for the immutable parts of `json_doc`.
+
+        See `PartialEvaluator` for the applied simplifications.
+        """
+        return PartialEvaluator(immutable).specialize(self, json_doc)
@@ -0,0 +1,366 @@
+from __future__ import annotations
+from copy import deepcopy
+from .json_pointer import JsonPointer
+from .json_patch_ops import PATCH_OP_CLASSES
+from .json_diff import _make_op
+from .json.json_types import (
+    JsonObject,
+    JsonArray,
+)
+
+
+__all__ = ['JsonPatchComposer']
+
+
+_OP_TYPES = {cl.get_op_name(): cl for cl in PATCH_OP_CLASSES}
+
+_KNOWN_FIELDS = {
+    'add': ('op', 'path', 'value'),
+    'remove': ('op', 'path'),
+    'replace': ('op', 'path', 'value'),
+    'move': ('op', 'path', 'from'),
+    'copy': ('op', 'path', 'from'),
+    'test': ('op', 'path', 'value'),
+}
+
+# result of merging two operations if the earlier one was dropped
+# and the search for a merge partner should go on
+_CONTINUE = object()
+
+
+def _is_index(segment: str) -> bool:
+    """Check if a segment may address an array element."""
+    if segment == '-':
+        return True
+    try:
+        int(segment)
+    except ValueError:
+        return False
+    return True
+
+
+def _relative(prefix: tuple, path: tuple):
+    """Return `path` relative to `prefix` or `None` if outside."""
+    if path[:len(prefix)] == prefix:
+        return path[len(prefix):]
+    return None
+
+
+class _Op:
+
+    __slots__ = ('name', 'path', 'from_path', 'value', 'fields')
+
+    def __init__(self, name, path=None, from_path=None, value=None, fields=None):
+        self.name = name
+        self.path = path
+        self.from_path = from_path
+        self.value = value
+        # original fields of operations that are not analyzed
+        self.fields = fields
+
+    def paths(self):
+        """Yield the paths together with a flag for structural changes."""
+        if self.from_path is not None:
+            yield self.from_path, self.name == 'move'
+        yield self.path, self.name in ('add', 'remove', 'move', 'copy')
+
+    def has_value(self) -> bool:
+        return (
+            self.name in ('add', 'replace')
+            and self.path[-1] != '-'
+        )
+
+    def to_json_object(self) -> JsonObject:
+        if self.fields is not None:
+            return self.fields
+        return _make_op(self.name, self.path, self.value, self.from_path)
+
+
+class _PathNode:
+
+    __slots__ = ('children', 'here', 'shift')
+
+    def __init__(self):
+        self.children = {}
+        # operations whose path ends at this node
+        self.here = []
+        # operations inserting or removing elements at an array index
+        # of this node, thereby shifting the positions of the siblings
+        self.shift = []
+
+
+class JsonPatchComposer:
+    """Compose a sequence of JSON patch operations into an equivalent one.
+
+    Each operation is merged with the latest earlier operation that
+    touches a related location, as long as the result provably has the
+    same effect: successive replacements are merged, changes within an
+    added or replaced value are folded into that value, values that
+    are overwritten or removed afterwards are dropped and operations
+    below the target of a `move` are rewritten to its source in order
+    to find a merge partner. Operations at array indices are never
+    merged across insertions or removals in the same array. The
+    composed patch is equivalent on all documents the original
+    sequence applies to without error.
+
+    In general, an `add` followed by a `remove` of the same location
+    cannot be cancelled, since `add` replaces an existing object member.
+    If `assume_new_members` is true, `add` operations are assumed to
+    never target existing members, which holds for patches created by
+    `JsonPatch.from_diff` and `ChangeFeed`.
+    """
+
+    def __init__(self, assume_new_members: bool=False):
+        self.assume_new_members = assume_new_members
+        self._ops = []
+        self._root = _PathNode()
+        # position of the latest operation no other one is moved across
+        self._barrier = -1
+
+    def extend(self, patch_ops: JsonArray) -> None:
+        """Append the operations of a patch given as array."""
+        for op_fields in patch_ops:
+            self.append(op_fields)
+
+    def append(self, op_fields: JsonObject) -> None:
+        """Append a single patch operation.
+
+        The values of the operation are taken over without copying.
+        """
+        op = self._parse(op_fields)
+        if op.fields is not None:
+            self._barrier = len(self._ops)
+            self._ops.append(op)
+        elif op.name == 'move' and op.from_path == op.path:
+            pass
+        elif not self._combine(op, len(self._ops)):
+            self._insert(op)
+
+    def to_json_array(self) -> JsonArray:
+        """Return the composed patch operations."""
+        return JsonArray([
+            op.to_json_object() for op in self._ops if op is not None
+        ])
+
+    @staticmethod
+    def _parse(op_fields: JsonObject) -> _Op:
+        name = op_fields['op'].to_python()
+        if name not in _KNOWN_FIELDS:
+            raise ValueError(f'Unsupported operation `{name}`')
+        known_fields = _KNOWN_FIELDS[name]
+        if not all(field in op_fields for field in known_fields):
+            # e.g. a `value-path` instead of a `value` field
+            return _Op(name, fields=op_fields)
+        path = tuple(JsonPointer(op_fields['path']))
+        from_path = None
+        if 'from' in known_fields:
+            from_path = tuple(JsonPointer(op_fields['from']))
+        if len(path) == 0 or from_path == ():
+            return _Op(name, fields=op_fields)
+        value = None
+        if 'value' in known_fields:
+            value = op_fields['value']
+        return _Op(name, path, from_path, value)
+
+    # ------------ Bookkeeping -------------------
+
+    def _insert(self, op: _Op) -> None:
+        self._ops.append(op)
+        self._index(len(self._ops) - 1, op)
+
+    def _index(self, pos: int, op: _Op) -> None:
+        # Entries of replaced operations are kept, which only
+        # results in additional candidates for merging.
+        for path, structural in op.paths():
+            node = self._root
+            for segment in path[:-1]:
+                node = node.children.setdefault(segment, _PathNode())
+            if structural and _is_index(path[-1]):
+                node.shift.append(pos)
+            node = node.children.setdefault(path[-1], _PathNode())
+            node.here.append(pos)
+
+    def _gather(self, path: tuple, structural: bool, found: list) -> None:
+        """Collect the operations that may interfere with a path."""
+        node = self._root
+        last = len(path) - 1
+        for i, segment in enumerate(path):
+            found.extend(self._live(node.here))
+            if _is_index(segment):
+                if structural and i == last:
+                    for key, child in node.children.items():
+                        if key != segment and _is_index(key):
+                            self._collect(child, found)
+                else:
+                    found.extend(self._live(node.shift))
+            node = node.children.get(segment)
+            if node is None:
+                return
+        self._collect(node, found)
+
+    def _collect(self, node: _PathNode, found: list) -> None:
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            found.extend(self._live(node.here))
+            stack.extend(node.children.values())
+
+    def _live(self, positions: list) -> list:
+        # discard the entries of dropped operations
+        positions[:] = [
+            pos for pos in positions
+            if pos > self._barrier and self._ops[pos] is not None
+        ]
+        return positions
+
+    def _candidates(self, op: _Op, limit: int) -> list:
+        found = []
+        for path, structural in op.paths():
+            self._gather(path, structural, found)
+        return sorted(set(pos for pos in found if pos < limit), reverse=True)
+
+    # ------------ Merging -----------------------
+
+    def _combine(self, op: _Op, limit: int) -> bool:
+        """Merge `op` into the operations before position `limit`.
+
+        Returns true if `op` has been absorbed.
+        """
+        for pos in self._candidates(op, limit):
+            prev = self._ops[pos]
+            if prev is None:
+                continue
+            if op.from_path is None:
+                result = self._merge(pos, prev, op)
+            else:
+                result = self._merge_transfer(pos, prev, op)
+            if result is not _CONTINUE:
+                return result
+        return False
+
+    def _drop(self, pos: int) -> None:
+        self._ops[pos] = None
+
+    def _merge(self, pos: int, prev: _Op, op: _Op):
+        """Merge an `add`, `remove`, `replace` or `test` operation."""
+        if prev.has_value():
+            if op.path == prev.path:
+                return self._merge_same(pos, prev, op)
+            rel_path = _relative(prev.path, op.path)
+            if rel_path is not None:
+                return self._apply_local(
+                    prev, _Op(op.name, rel_path, value=op.value)
+                )
+        if prev.name == 'remove' and op.name == 'add' and op.path == prev.path:
+            if op.path[-1] == '-':
+                return False
+            # removal and insertion at the same position
+            self._ops[pos] = _Op('replace', op.path, value=op.value)
+            return True
+        if prev.name == 'move':
+            rel_path = _relative(prev.path, op.path)
+            if rel_path:
+                # apply the operation before the value is moved
+                moved_op = _Op(op.name, prev.from_path + rel_path, value=op.value)
+                return self._combine(moved_op, pos)
+        if (
+            prev.name in ('move', 'copy') and op.name == 'remove'
+            and op.path == prev.path and self.assume_new_members
+        ):
+            if prev.name == 'move':
+                self._ops[pos] = _Op('remove', prev.from_path)
+            else:
+                self._drop(pos)
+            return True
+        return self._merge_overwrite(pos, prev, op)
+
+    def _merge_same(self, pos: int, prev: _Op, op: _Op):
+        if op.name == 'replace':
+            prev.value = op.value
+            return True
+        if op.name == 'add':
+            if _is_index(op.path[-1]):
+                # two insertions if the parent is an array
+                return False
+            prev.value = op.value
+            return True
+        if op.name == 'test':
+            return prev.value == op.value
+        # remove
+        if prev.name == 'replace':
+            self._ops[pos] = _Op('remove', prev.path)
+            return True
+        if self.assume_new_members:
+            self._drop(pos)
+            return True
+        return False
+
+    def _merge_overwrite(self, pos: int, prev: _Op, op: _Op):
+        """Drop earlier operations within a removed or replaced value."""
+        if op.name == 'test' or prev.name == 'test':
+            return False
+        if op.name == 'add' and _is_index(op.path[-1]):
+            return False
+        if _relative(op.path, prev.path) in (None, ()):
+            return False
+        if prev.name == 'move' and _relative(op.path, prev.from_path) in (None, ()):
+            return False
+        self._drop(pos)
+        return _CONTINUE
+
+    def _merge_transfer(self, pos: int, prev: _Op, op: _Op):
+        """Merge a `move` or `copy` operation."""
+        if prev.has_value():
+            rel_from = _relative(prev.path, op.from_path)
+            rel_path = _relative(prev.path, op.path)
+            if rel_from and rel_path:
+                return self._apply_local(
+                    prev, _Op(op.name, rel_path, rel_from)
+                )
+            if rel_from is None or rel_path is not None:
+                return False
+            value = prev.value
+            if rel_from:
+                try:
+                    value = JsonPointer.from_segments(rel_from).get(value)
+                except (KeyError, IndexError, TypeError, ValueError):
+                    return False
+            if op.name == 'move':
+                if rel_from:
+                    if not self._apply_local(prev, _Op('remove', rel_from)):
+                        return False
+                elif prev.name == 'replace':
+                    self._ops[pos] = _Op('remove', prev.path)
+                elif self.assume_new_members:
+                    self._drop(pos)
+                else:
+                    return False
+            else:
+                value = deepcopy(value)
+            self.append(_make_op('add', op.path, value))
+            return True
+        if (
+            prev.name in ('move', 'copy') and op.name == 'move'
+            and op.from_path == prev.path and self.assume_new_members
+        ):
+            if prev.name == 'move' and prev.from_path == op.path:
+                self._drop(pos)
+            else:
+                prev.path = op.path
+                self._index(pos, prev)
+            return True
+        return False
+
+    @staticmethod
+    def _apply_local(prev: _Op, op: _Op) -> bool:
+        """Apply an operation with relative paths to the value of `prev`."""
+        op_fields = _make_op(op.name, op.path, op.value, op.from_path)
+        value = prev.value
+        if op.name == 'move':
+            value = deepcopy(value)
+        try:
+            _OP_TYPES[op.name](op_fields).apply(value)
+        except (KeyError, IndexError, TypeError, ValueError):
+            return False
+        prev.value = value
+        return True
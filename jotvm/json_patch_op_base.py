@@ -1,6 +1,13 @@
-from typing import Union
-from .json_pointer import JsonPointer
+from typing import (
+    Optional,
+    Union,
+)
+from .json_pointer import (
+    JsonPointer,
+    PointerString,
+)
 from copy import deepcopy
+from .utils import resolve_segments
 from .json.json_types import (
     JsonString,
     JsonObject,
@@ -8,6 +15,9 @@ from .json.json_types import (
 )
 
 
+SEGMENTS_SUFFIX = '-segments'
+
+
 class JsonPatchOpBase:
     """Abstract base class for JSON patch op classes."""
 
@@ -33,6 +43,17 @@ class JsonPatchOpBase:
             if isinstance(fields[key], JsonPointer):
                 fields[key] = str(fields[key])
         self._fields = fields
+        # a field `X-segments` gives the pointer of the field `X`
+        self._segment_fields = tuple(
+            (key, JsonString(key.value[:-len(SEGMENTS_SUFFIX)]))
+            for key in fields if key.endswith(SEGMENTS_SUFFIX)
+        )
+        for key, pointer_key in self._segment_fields:
+            if pointer_key in fields:
+                raise ValueError(
+                    f'Fields `{pointer_key.value}` and `{key.value}` '
+                    f'are mutually exclusive'
+                )
 
     @classmethod
     def _verify(cls, json_doc: JsonContainerTypeHint):
@@ -44,8 +65,36 @@ class JsonPatchOpBase:
                 f'Expected operation `{expect_op}` but encountered `{current_op}`.'
             )
 
-    def __call__(self, json_doc: JsonContainerTypeHint) -> None:
-        self.apply(json_doc)
+    def __call__(
+        self, json_doc: JsonContainerTypeHint,
+        context: Optional['ExecutionContext']=None
+    ) -> None:
+        self.bind_segments(json_doc).apply(json_doc)
+
+    def bind_segments(self, json_doc: JsonContainerTypeHint) -> 'JsonPatchOpBase':
+        """Return the operation with its `*-segments` fields resolved.
+
+        The pointers are built from the segments and the values they
+        reference in `json_doc` and stored as `PointerString`s, which
+        `JsonPointer` takes over without encoding or parsing them. The
+        operation itself is returned if it has no such fields.
+        """
+        if not self._segment_fields:
+            return self
+        fields = dict(self._fields.value)
+        for key, pointer_key in self._segment_fields:
+            segments = fields.pop(key)
+            fields[pointer_key] = PointerString(JsonPointer.from_segments(
+                resolve_segments(segments, json_doc)
+            ))
+        op = object.__new__(type(self))
+        op.__dict__.update(self.__dict__)
+        # the fields are not part of a document, so writes to them
+        # must not be seen by write observers
+        op._fields = JsonObject()
+        op._fields.value = fields
+        op._segment_fields = ()
+        return op
 
     @classmethod
     def from_json_object(cls, json_doc: JsonObject) -> 'JsonPatchOpBase':
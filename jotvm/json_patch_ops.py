@@ -28,8 +28,7 @@ def remove_op_apply(self, json_doc: JsonContainerTypeHint):
 def replace_op_apply(self, json_doc: JsonContainerTypeHint):
     path = JsonPointer(self._fields['path'])
     value = obtain_value('value', self._fields, json_doc)
-    path.remove(json_doc)
-    path.add(json_doc, value)
+    path.set(json_doc, value)
 
 
 def move_op_apply(self, json_doc: JsonContainerTypeHint):
@@ -0,0 +1,238 @@
+from __future__ import annotations
+from typing import (
+    NamedTuple,
+    Optional,
+)
+from .binary_ops import BINARY_OP_CLASSES
+from .trafo_unary_ops import TRAFO_UNARY_OP_CLASSES
+from .dependency import (
+    _overlap,
+    _write_location,
+)
+from .json_patch_compose import _is_index
+from .json_patch_op_base import SEGMENTS_SUFFIX
+from .json_pointer import JsonPointer
+from .json.json_types import (
+    JsonObject,
+    JsonArray,
+    JsonString,
+)
+
+
+__all__ = ['Rewrite', 'PeepholeOptimizer']
+
+
+_BINARY_OP_NAMES = frozenset(cl.get_op_name() for cl in BINARY_OP_CLASSES)
+
+# Operations storing a result at `path` that is computed beforehand
+_STORE_OP_NAMES = frozenset(
+    ['add'] + [cl.get_op_name() for cl in TRAFO_UNARY_OP_CLASSES]
+)
+
+_BINARY_FIELDS = frozenset([
+    'op', 'path', 'value', 'value-path', 'elementwise', 'elementwise-path',
+])
+_COPY_FIELDS = frozenset(['op', 'path', 'from'])
+_REMOVE_FIELDS = frozenset(['op', 'path'])
+
+
+class Rewrite(NamedTuple):
+    """Operations replaced by the `PeepholeOptimizer`.
+
+    `location` points to the array of operations within the patch,
+    e.g. `/2/patch` for the nested patch of the third operation.
+    """
+
+    rule: str
+    location: str
+    eliminated: tuple
+    replacement: tuple
+
+
+def _op_name(op_fields: JsonObject) -> Optional[str]:
+    op_name = op_fields.get('op')
+    return op_name.value if isinstance(op_name, JsonString) else None
+
+
+def _pointer(op_fields: JsonObject, field_name: str='path') -> Optional[tuple]:
+    # `None` for a missing or invalid pointer
+    value = op_fields.get(field_name)
+    if not isinstance(value, JsonString):
+        return None
+    try:
+        return tuple(JsonPointer(value))
+    except ValueError:
+        return None
+
+
+def _has_fields(op_fields: JsonObject, known_fields: frozenset) -> bool:
+    return all(key in known_fields for key in op_fields)
+
+
+def _is_static(op_fields: JsonObject) -> bool:
+    # pointers given as segments are only known when applied
+    return not any(key.endswith(SEGMENTS_SUFFIX) for key in op_fields)
+
+
+def _with_field(op_fields: JsonObject, name: str, value, after: str) -> JsonObject:
+    items = {}
+    for key, field_value in op_fields.items():
+        if key != name:
+            items[key] = field_value
+        if key == after:
+            items[JsonString(name)] = value
+    return JsonObject(items)
+
+
+class PeepholeOptimizer:
+    """Rewrite short sequences of operations into cheaper ones.
+
+    The following sequences of adjacent operations are rewritten,
+    also within the literal `patch` of control operations:
+
+    - `fuse-copy-binary`: a `copy` to `path` followed by a binary
+      operation on `path` becomes the binary operation with the
+      source as `left-value-path`.
+    - `drop-scratch`: an `add` or `copy` to `path` followed by a
+      `remove` of `path` is dropped.
+    - `forward-scratch`: a result stored at `path` by `add`, a fused
+      binary operation or a transforming unary operation such as
+      `array/join-path`, which is copied once to another location and
+      then removed, is stored at that location directly.
+
+    The optimized patch is equivalent on all documents the original
+    one applies to without error. Removing a scratch value undoes
+    storing it only if it was not an existing object member, so the
+    last two rules are applied only if `assume_new_members` is true,
+    i.e. if scratch values are never stored at existing members.
+    The applied rewrites are listed in `rewrites`.
+    """
+
+    def __init__(self, assume_new_members: bool=False):
+        self.assume_new_members = assume_new_members
+        self.rewrites = []
+        self._rules = [
+            ('forward-scratch', 3, self._forward_scratch),
+            ('fuse-copy-binary', 2, self._fuse_copy_binary),
+            ('drop-scratch', 2, self._drop_scratch),
+        ]
+
+    @property
+    def num_eliminated(self) -> int:
+        """Number of operations eliminated by the rewrites."""
+        return sum(
+            len(rewrite.eliminated) - len(rewrite.replacement)
+            for rewrite in self.rewrites
+        )
+
+    def optimize(self, patch_ops: JsonArray, location: str='') -> JsonArray:
+        """Return the rewritten operations of a patch given as array.
+
+        The operations are not modified; unchanged ones are taken
+        over without copying.
+        """
+        optimized = []
+        for i, op_fields in enumerate(patch_ops):
+            optimized.append(self._optimize_nested(op_fields, f'{location}/{i}'))
+            while self._rewrite(optimized, location):
+                pass
+        return JsonArray(optimized)
+
+    def _optimize_nested(self, op_fields: JsonObject, location: str) -> JsonObject:
+        patch_ops = op_fields.get('patch')
+        name = _op_name(op_fields)
+        if name is None or not name.startswith('ctrl/'):
+            return op_fields
+        if not isinstance(patch_ops, JsonArray):
+            return op_fields
+        num_rewrites = len(self.rewrites)
+        optimized = self.optimize(patch_ops, f'{location}/patch')
+        if len(self.rewrites) == num_rewrites:
+            return op_fields
+        return _with_field(op_fields, 'patch', optimized, 'patch')
+
+    def _rewrite(self, optimized: list, location: str) -> bool:
+        """Apply the first matching rule to the last operations."""
+        for rule, length, rewrite in self._rules:
+            if len(optimized) < length:
+                continue
+            eliminated = optimized[-length:]
+            if not all(map(_is_static, eliminated)):
+                continue
+            replacement = rewrite(*eliminated)
+            if replacement is None:
+                continue
+            del optimized[-length:]
+            optimized.extend(replacement)
+            self.rewrites.append(Rewrite(
+                rule, location, tuple(eliminated), tuple(replacement)
+            ))
+            return True
+        return False
+
+    # ------------ Rules -------------------------
+
+    @staticmethod
+    def _fuse_copy_binary(copy_op: JsonObject, binary_op: JsonObject):
+        if _op_name(copy_op) != 'copy' or not _has_fields(copy_op, _COPY_FIELDS):
+            return None
+        if _op_name(binary_op) not in _BINARY_OP_NAMES:
+            return None
+        if not _has_fields(binary_op, _BINARY_FIELDS):
+            return None
+        path = _pointer(copy_op)
+        if not path or _pointer(copy_op, 'from') is None:
+            return None
+        if _pointer(binary_op) != path:
+            return None
+        # the operands must not be changed by the copy
+        written = _write_location(path)
+        for key in binary_op:
+            if key.endswith('-path'):
+                operand = _pointer(binary_op, key)
+                if operand is None or _overlap(written, operand):
+                    return None
+        return [_with_field(binary_op, 'left-value-path', copy_op['from'], 'path')]
+
+    def _drop_scratch(self, store_op: JsonObject, remove_op: JsonObject):
+        if not self.assume_new_members:
+            return None
+        if _op_name(store_op) not in ('add', 'copy'):
+            return None
+        if _op_name(remove_op) != 'remove' or not _has_fields(remove_op, _REMOVE_FIELDS):
+            return None
+        path = _pointer(store_op)
+        if not path or path[-1] == '-' or _pointer(remove_op) != path:
+            return None
+        return []
+
+    def _forward_scratch(
+        self, store_op: JsonObject, copy_op: JsonObject, remove_op: JsonObject
+    ):
+        if not self.assume_new_members:
+            return None
+        name = _op_name(store_op)
+        # results added as by `add`, which inserts into arrays
+        inserts = name == 'add' or (
+            name in _BINARY_OP_NAMES
+            and ('left-value' in store_op or 'left-value-path' in store_op)
+        )
+        if name not in _STORE_OP_NAMES and not inserts:
+            return None
+        if _op_name(copy_op) != 'copy' or not _has_fields(copy_op, _COPY_FIELDS):
+            return None
+        if _op_name(remove_op) != 'remove' or not _has_fields(remove_op, _REMOVE_FIELDS):
+            return None
+        path = _pointer(store_op)
+        target = _pointer(copy_op)
+        if not path or path[-1] == '-' or not target:
+            return None
+        if _pointer(copy_op, 'from') != path or _pointer(remove_op) != path:
+            return None
+        # the target must not be moved by the scratch value
+        if _overlap(_write_location(path), target):
+            return None
+        # unlike `copy`, unary operations replace array elements
+        if not inserts and (_is_index(path[-1]) or _is_index(target[-1])):
+            return None
+        return [_with_field(store_op, 'path', copy_op['path'], 'path')]
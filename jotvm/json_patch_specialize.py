@@ -0,0 +1,363 @@
+from __future__ import annotations
+from collections import OrderedDict
+from copy import deepcopy
+from typing import (
+    Iterable,
+    Union,
+)
+from .binary_ops import BINARY_OP_CLASSES
+from .relation_ops import RELATION_OP_CLASSES
+from .endo_unary_ops import ENDO_UNARY_OP_CLASSES
+from .trafo_unary_ops import TRAFO_UNARY_OP_CLASSES
+from .dependency import (
+    SCOPE_OP_NAMES,
+    _overlap,
+    op_access,
+)
+from .json_patch_optimize import (
+    _is_static,
+    _op_name,
+    _pointer,
+)
+from .json_pointer import JsonPointer
+from .utils import MissingValue
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonObject,
+    JsonArray,
+    JsonBool,
+    JsonString,
+)
+from .json.json_value import JsonValue
+
+
+__all__ = ['PartialEvaluator']
+
+
+_BINARY_OPS = {cl.get_op_name(): cl for cl in BINARY_OP_CLASSES}
+_RELATION_OPS = {cl.get_op_name(): cl for cl in RELATION_OP_CLASSES}
+# Unary operations storing their result at `path`
+_UNARY_OPS = {
+    cl.get_op_name(): cl
+    for cl in ENDO_UNARY_OP_CLASSES + TRAFO_UNARY_OP_CLASSES
+}
+
+_ENDO_OP_NAMES = frozenset(cl.get_op_name() for cl in ENDO_UNARY_OP_CLASSES)
+
+# Pointer fields that address a location instead of a value to be read,
+# including the array whose elements `ctrl/for-each` binds by reference
+_LOCATION_FIELDS = {
+    'ctrl/while-loop': ('check-path',),
+    'ctrl/for-loop': ('counter-path',),
+    'ctrl/for-each': ('item-path', 'index-path', 'array-path'),
+    'ctrl/call-func': ('out-path',),
+    'ctrl/map-func': ('out-path',),
+    'ctrl/reduce-func': ('out-path',),
+}
+
+# Fields of control operations with patches applied to the scope
+_NESTED_FIELDS = (
+    'patch', 'true-patch', 'false-patch',
+    'patch-op', 'true-patch-op', 'false-patch-op',
+)
+
+# Exceptions of operations on constants, which are left to be raised
+# when the patch is applied
+_EVAL_ERRORS = (KeyError, IndexError, TypeError, ValueError, ArithmeticError)
+
+
+def _make_op(op_name: str, path: JsonString, value: JsonValue) -> JsonObject:
+    return JsonObject({
+        JsonString('op'): JsonString(op_name),
+        JsonString('path'): path,
+        JsonString('value'): value,
+    })
+
+
+def _get(value: JsonValue, pointer: tuple):
+    if not pointer:
+        return value
+    try:
+        return JsonPointer.from_segments(pointer).get(value, MissingValue)
+    except _EVAL_ERRORS:
+        return MissingValue
+
+
+class PartialEvaluator:
+    """Specialize patches for documents with immutable parts.
+
+    The values at the `immutable` pointers must not change while a
+    patch is applied. Specialization replaces operands read from them,
+    or from values added by earlier operations of the same patch, by
+    literals: `*-path` fields become the corresponding fields, a `copy`
+    becomes an `add`, relations and arithmetic on constants are replaced
+    by their results and passing `test` operations are dropped. A
+    `ctrl/cond-apply-patch(-op)` with a constant check is replaced by
+    the selected branch and `ctrl/apply-patch(-op)` operations with a
+    known patch on the whole document are inlined. Nested patches are
+    specialized as well, except for those of function calls.
+
+    The specialized patch is equivalent to the original one on all
+    documents with the same immutable values that the original one
+    applies to without error. Specialized patches are cached for each
+    patch and combination of immutable values in a cache of at most
+    `max_cached_patches` entries.
+    """
+
+    def __init__(
+        self, immutable: Iterable[Union[str, JsonPointer]],
+        max_cached_patches: int=256
+    ):
+        self.immutable = tuple(tuple(JsonPointer(p)) for p in immutable)
+        self.max_cached_patches = max_cached_patches
+        self.num_specialized = 0
+        self.num_cache_hits = 0
+        self._patches = OrderedDict()
+
+    def specialize(
+        self, patch: 'ExtJsonPatch', json_doc: JsonContainerTypeHint
+    ) -> 'ExtJsonPatch':
+        """Return the specialized patch for the immutable values of `json_doc`."""
+        patch_ops = patch.to_json_array()
+        key = (patch_ops.to_json(), self.shape_key(json_doc))
+        specialized = self._patches.get(key)
+        if specialized is not None:
+            self._patches.move_to_end(key)
+            self.num_cache_hits += 1
+            return specialized
+        specialized = patch.from_json_array(
+            self.specialize_ops(patch_ops, json_doc)
+        )
+        self.num_specialized += 1
+        self._patches[key] = specialized
+        while len(self._patches) > self.max_cached_patches:
+            self._patches.popitem(last=False)
+        return specialized
+
+    def shape_key(self, json_doc: JsonContainerTypeHint) -> tuple:
+        """Return the immutable values of `json_doc` serialized as key."""
+        values = (_get(json_doc, pointer) for pointer in self.immutable)
+        return tuple(
+            None if value is MissingValue else value.to_json()
+            for value in values
+        )
+
+    def specialize_ops(
+        self, patch_ops: JsonArray, json_doc: JsonContainerTypeHint
+    ) -> JsonArray:
+        """Return the specialized operations of a patch given as array.
+
+        The operations are not modified; constants are copied into
+        the specialized ones.
+        """
+        self._json_doc = json_doc
+        try:
+            return JsonArray(self._specialize_ops(patch_ops, (), {}))
+        finally:
+            del self._json_doc
+
+    def stats(self) -> dict:
+        return {
+            'specialized-patches': self.num_specialized,
+            'cache-hits': self.num_cache_hits,
+        }
+
+    # ------------ Constants ---------------------
+
+    def _constant(self, pointer: tuple, scope: tuple, known: dict):
+        """Return the constant value at a pointer within `scope`."""
+        location = scope + pointer
+        if any(location[:len(p)] == p for p in self.immutable):
+            return _get(self._json_doc, location)
+        for known_pointer, value in known.items():
+            if pointer[:len(known_pointer)] == known_pointer:
+                return _get(value, pointer[len(known_pointer):])
+        return MissingValue
+
+    def _fold_operands(
+        self, op_fields: JsonObject, op_name: str, scope: tuple, known: dict
+    ) -> JsonObject:
+        """Replace `*-path` fields reading constants by literals."""
+        locations = _LOCATION_FIELDS.get(op_name, ())
+        items = {}
+        for key, value in op_fields.items():
+            items[key] = value
+            if not key.endswith('-path') or key in locations:
+                continue
+            name = key[:-len('-path')]
+            pointer = _pointer(op_fields, key)
+            if name in op_fields or pointer is None:
+                continue
+            constant = self._constant(pointer, scope, known)
+            if constant is not MissingValue:
+                del items[key]
+                items[name] = deepcopy(constant)
+        return JsonObject(items)
+
+    @staticmethod
+    def _update_known(op_fields: JsonObject, known: dict) -> None:
+        """Track the values added by an operation."""
+        access = op_access(op_fields)
+        if access is None:
+            known.clear()
+            return
+        for write in access.writes:
+            for pointer in [p for p in known if _overlap(p, write)]:
+                del known[pointer]
+        if _op_name(op_fields) in ('add', 'replace') and 'value' in op_fields:
+            path = _pointer(op_fields)
+            if path and path[-1] != '-':
+                known[path] = op_fields['value']
+
+    # ------------ Operations --------------------
+
+    def _specialize_ops(self, patch_ops: JsonArray, scope: tuple, known: dict) -> list:
+        specialized = []
+        for op_fields in patch_ops:
+            specialized.extend(self._specialize_op(op_fields, scope, known))
+        return specialized
+
+    def _specialize_op(self, op_fields: JsonObject, scope: tuple, known: dict) -> list:
+        op_name = _op_name(op_fields)
+        if op_name is None or not _is_static(op_fields):
+            known.clear()
+            return [op_fields]
+        op_fields = self._fold_operands(op_fields, op_name, scope, known)
+        if op_name.startswith('ctrl/'):
+            inlined = self._specialize_control(op_fields, op_name, scope, known)
+            if inlined is not None:
+                return inlined
+            op_fields = self._specialize_nested(op_fields, op_name, scope)
+        else:
+            op_fields = self._evaluate(op_fields, op_name, scope, known)
+        if op_fields is None:
+            return []
+        self._update_known(op_fields, known)
+        return [op_fields]
+
+    def _specialize_control(
+        self, op_fields: JsonObject, op_name: str, scope: tuple, known: dict
+    ):
+        """Return the operations replacing a control operation, if any."""
+        if op_name in ('ctrl/cond-apply-patch', 'ctrl/cond-apply-patch-op'):
+            check = op_fields.get('check')
+            if not isinstance(check, JsonBool) or 'path' not in op_fields:
+                return None
+            # `patch` or `patch-op` of the selected branch
+            field_name = op_name[len('ctrl/cond-apply-'):]
+            branch = ('true-' if check.value else 'false-') + field_name
+            for suffix in ('', '-path'):
+                if branch + suffix in op_fields:
+                    break
+            else:
+                return []
+            selected = JsonObject({
+                JsonString('op'): JsonString(op_name.replace('cond-', '')),
+                JsonString('path'): op_fields['path'],
+                JsonString(field_name + suffix): op_fields[branch + suffix],
+            })
+            return self._specialize_op(selected, scope, known)
+        if _pointer(op_fields) != ():
+            return None
+        if op_name == 'ctrl/apply-patch-op':
+            patch_op = op_fields.get('patch-op')
+            if isinstance(patch_op, JsonObject):
+                return self._specialize_op(patch_op, scope, known)
+        elif op_name == 'ctrl/apply-patch':
+            patch_ops = op_fields.get('patch')
+            if isinstance(patch_ops, JsonArray):
+                return self._specialize_ops(patch_ops, scope, known)
+        return None
+
+    def _specialize_nested(
+        self, op_fields: JsonObject, op_name: str, scope: tuple
+    ) -> JsonObject:
+        """Specialize the literal patch applied to the scope at `path`."""
+        path = _pointer(op_fields)
+        if op_name not in SCOPE_OP_NAMES or path is None:
+            return op_fields
+        for key in _NESTED_FIELDS:
+            nested = op_fields.get(key)
+            if isinstance(nested, JsonArray) and key.endswith('patch'):
+                nested = JsonArray(self._specialize_ops(nested, scope + path, {}))
+            elif isinstance(nested, JsonObject) and key.endswith('patch-op'):
+                nested = self._specialize_op(nested, scope + path, {})
+                if len(nested) != 1:
+                    continue
+                nested = nested[0]
+            else:
+                continue
+            op_fields = JsonObject({
+                k: (nested if k == key else v) for k, v in op_fields.items()
+            })
+        return op_fields
+
+    def _evaluate(
+        self, op_fields: JsonObject, op_name: str, scope: tuple, known: dict
+    ):
+        """Replace an operation on constants by its result.
+
+        Returns `None` if the operation is dropped.
+        """
+        path = op_fields['path'] if 'path' in op_fields else None
+        pointer = _pointer(op_fields)
+        if pointer is None:
+            return op_fields
+        if op_name == 'copy':
+            from_pointer = _pointer(op_fields, 'from')
+            if from_pointer is None or len(op_fields) != 3:
+                return op_fields
+            value = self._constant(from_pointer, scope, known)
+            if value is MissingValue:
+                return op_fields
+            return _make_op('add', path, deepcopy(value))
+        if op_name == 'test':
+            value = self._constant(pointer, scope, known)
+            if value is not MissingValue and value == op_fields.get('value'):
+                return None
+            return op_fields
+        if any(key.endswith('-path') for key in op_fields):
+            return op_fields
+        try:
+            if op_name in _RELATION_OPS:
+                relation = _RELATION_OPS[op_name].basic_op(
+                    op_fields['left-value'], op_fields['right-value']
+                )
+                return _make_op('add', path, JsonBool(relation))
+            if op_name in _BINARY_OPS:
+                return self._evaluate_binary(op_fields, op_name, scope, known)
+            if op_name in _UNARY_OPS:
+                # the result replaces the value at `path`, if it exists
+                old_value = self._constant(pointer, scope, known)
+                if op_name in _ENDO_OP_NAMES:
+                    value = op_fields.get('value', old_value)
+                else:
+                    value = op_fields.get('value', MissingValue)
+                if old_value is MissingValue or value is MissingValue:
+                    return op_fields
+                result = _UNARY_OPS[op_name].basic_op(deepcopy(value))
+                if isinstance(result, JsonValue):
+                    return _make_op('replace', path, result)
+        except _EVAL_ERRORS:
+            pass
+        return op_fields
+
+    def _evaluate_binary(
+        self, op_fields: JsonObject, op_name: str, scope: tuple, known: dict
+    ) -> JsonObject:
+        op_class = _BINARY_OPS[op_name]
+        if 'left-value' in op_fields:
+            left_value = op_fields['left-value']
+            result_op = 'add'
+        else:
+            left_value = self._constant(_pointer(op_fields), scope, known)
+            result_op = 'replace'
+        elementwise = op_fields.get('elementwise', JsonBool(False))
+        if left_value is MissingValue or not isinstance(elementwise, JsonBool):
+            return op_fields
+        value = deepcopy(op_fields['value'])
+        if elementwise.value:
+            result = JsonArray(op_class.elementwise_op(deepcopy(left_value), value))
+        else:
+            result = op_class.basic_op(deepcopy(left_value), value)
+        return _make_op(result_op, op_fields['path'], result)
@@ -1,6 +1,7 @@
 from typing import Union
 from collections.abc import Sequence
 from decimal import Decimal
+from functools import lru_cache
 from .json.json_types import (
     JsonContainerTypes,
     JsonContainerTypeHint,
@@ -10,11 +11,29 @@ from .json.json_types import (
     JsonArray,
     JsonObject,
 )
+from .json.write_barrier import (
+    active_write_observers,
+    notify_walk,
+)
+
+
+@lru_cache(maxsize=4096)
+def _parse(json_pointer: str) -> tuple:
+    # the pointers of a patch are parsed again on every application
+    if json_pointer == '':
+        return tuple()
+    if not json_pointer.startswith('/'):
+        raise ValueError(f'Invalid JSON pointer `{json_pointer!s}`')
+    segments = json_pointer.split('/')[1:]
+    return tuple(JsonPointer._decode_segment(s) for s in segments)
 
 
 class JsonPointer(Sequence):
 
     def __init__(self, json_pointer):
+        if isinstance(json_pointer, PointerString):
+            self._path = json_pointer.pointer._path
+            return
         if isinstance(json_pointer, JsonPointer):
             self._path = tuple(json_pointer)
             return
@@ -23,13 +42,7 @@ class JsonPointer(Sequence):
             json_pointer = json_pointer.to_python()
 
         if isinstance(json_pointer, str):
-            if json_pointer == '':
-                self._path = tuple()
-            elif json_pointer.startswith('/'):
-                segments = json_pointer.split('/')[1:]
-                self._path = tuple(self._decode_segment(s) for s in segments)
-            else:
-                raise ValueError(f'Invalid JSON pointer `{json_pointer!s}`')
+            self._path = _parse(json_pointer)
         elif isinstance(json_pointer, (list, tuple)):
             err_prefix = f'Invalid tuple representation of JSON pointer {json_pointer}: '
             if any(v != int(v) for v in json_pointer if isinstance(v, (float, Decimal))):
@@ -52,6 +65,13 @@ class JsonPointer(Sequence):
         else:
             raise TypeError(f'Unsupported type {type(json_pointer)}')
 
+    @classmethod
+    def from_segments(cls, segments) -> 'JsonPointer':
+        """Create a pointer from already decoded string segments."""
+        pointer = cls.__new__(cls)
+        pointer._path = tuple(segments)
+        return pointer
+
     # ------------ Escaping Utilities ------------
 
     @staticmethod
@@ -140,10 +160,19 @@ class JsonPointer(Sequence):
             obj = self._get(obj, p)
         return obj
 
-    def add(self, obj: JsonContainerTypeHint, value: JsonValue) -> None:
+    def get_scope(self, obj: JsonContainerTypeHint) -> JsonContainerTypeHint:
+        """Get the container a nested patch is applied to."""
         check_container_type(obj)
-        for p in self._path[:-1]:
+        if active_write_observers():
+            return self._observed_walk(obj, self._path)
+        for p in self._path:
             obj = self._get(obj, p)
+        check_container_type(obj)
+        return obj
+
+    def add(self, obj: JsonContainerTypeHint, value: JsonValue) -> None:
+        check_container_type(obj)
+        obj = self._walk_to_parent(obj)
         p = self._sanitize_key(obj, self._path[-1])
         if isinstance(obj, JsonObject):
             obj[p] = value
@@ -152,9 +181,75 @@ class JsonPointer(Sequence):
                     raise IndexError(f'Index {p} out of bounds for JSON array')
             obj.insert(p, value)
 
+    def set(
+        self, obj: JsonContainerTypeHint, value: JsonValue, create: bool=False
+    ) -> None:
+        """Replace the value at the pointer in place.
+
+        Unlike `remove` followed by `add`, the parent is resolved once
+        and the following array elements are not shifted. If `create`
+        is true, a missing value is added as by `add`.
+        """
+        check_container_type(obj)
+        obj = self._walk_to_parent(obj)
+        p = self._sanitize_key(obj, self._path[-1])
+        if isinstance(obj, JsonObject):
+            if not create and p not in obj:
+                raise KeyError(p)
+            obj[p] = value
+        elif isinstance(obj, JsonArray):
+            if create and p == len(obj):
+                obj.insert(p, value)
+            elif 0 <= p < len(obj):
+                obj[p] = value
+            else:
+                raise IndexError(f'Index {p} out of bounds for JSON array')
+
     def remove(self, obj: JsonContainerTypeHint) -> None:
         check_container_type(obj)
-        for p in self._path[:-1]:
-            obj = self._get(obj, p)
+        obj = self._walk_to_parent(obj)
         p = self._sanitize_key(obj, self._path[-1])
         del obj[p]
+
+    def _walk_to_parent(self, obj: JsonContainerTypeHint) -> JsonContainerTypeHint:
+        if active_write_observers():
+            return self._observed_walk(obj, self._path[:-1])
+        for p in self._path[:-1]:
+            obj = self._get(obj, p)
+        return obj
+
+    @classmethod
+    def _observed_walk(cls, obj: JsonContainerTypeHint, path: tuple) -> JsonContainerTypeHint:
+        # write barrier: report the containers passed on the way
+        containers = [obj]
+        for p in path:
+            obj = cls._get(obj, p)
+            containers.append(obj)
+        check_container_type(obj)
+        notify_walk(containers, path)
+        return obj
+
+
+class PointerString(JsonString):
+    """`JsonString` holding a pointer that is encoded only when read.
+
+    `JsonPointer` takes over its segments without parsing, so pointers
+    built at run time, e.g. from `*-segments` fields, can be passed as
+    field values without encoding and decoding them.
+    """
+
+    def __init__(self, pointer: JsonPointer):
+        if not isinstance(pointer, JsonPointer):
+            raise TypeError('`pointer` must be type `JsonPointer`')
+        self.pointer = pointer
+
+    @property
+    def value(self) -> str:
+        return str(self.pointer)
+
+    def __deepcopy__(self, memo):
+        # immutable like the pointer
+        return self
+
+    def __reduce__(self):
+        return (JsonString, (self.value,))
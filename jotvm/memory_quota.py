@@ -0,0 +1,143 @@
+from __future__ import annotations
+import sys
+from contextlib import contextmanager
+from typing import Optional
+from .json.write_barrier import (
+    MissingEntry,
+    WriteObserverBase,
+    observe_writes,
+)
+from .json.json_types import (
+    JsonValue,
+    JsonObject,
+    JsonArray,
+    JsonString,
+    JsonNumber,
+)
+
+
+__all__ = [
+    'MemoryQuotaExceeded',
+    'MemoryAccountant',
+    'estimate_size',
+]
+
+
+# Approximate sizes (in bytes) used for the accounting. They do not
+# depend on the capacity of the underlying Python containers so that
+# adding and later removing the same value always cancels exactly.
+NODE_BYTES = 48
+ARRAY_SLOT_BYTES = 8
+OBJECT_SLOT_BYTES = 24
+
+
+class MemoryQuotaExceeded(MemoryError):
+    """Raised if a patch execution exceeds its memory quota."""
+    pass
+
+
+def _key_size(key) -> int:
+    if isinstance(key, JsonString):
+        return OBJECT_SLOT_BYTES + NODE_BYTES + sys.getsizeof(key.value)
+    return ARRAY_SLOT_BYTES
+
+
+def estimate_size(value: JsonValue) -> tuple[int, int]:
+    """Return the approximate node count and byte size of a JSON value."""
+    nodes = 0
+    size = 0
+    stack = [value]
+    while stack:
+        cur = stack.pop()
+        nodes += 1
+        size += NODE_BYTES
+        if isinstance(cur, JsonObject):
+            for key, child in cur.value.items():
+                size += _key_size(key)
+                stack.append(child)
+        elif isinstance(cur, JsonArray):
+            size += ARRAY_SLOT_BYTES * len(cur)
+            stack.extend(cur)
+        elif isinstance(cur, (JsonString, JsonNumber)):
+            size += sys.getsizeof(cur.value)
+    return nodes, size
+
+
+class MemoryAccountant(WriteObserverBase):
+    """Incremental accounting of document sizes during patch execution.
+
+    The initial document is measured once by `track`. Afterwards, only
+    the values inserted into or removed from containers are measured,
+    so the cost is proportional to the mutations and not to the size
+    of the document. Scratch documents of `ctrl/call-func` and
+    `ctrl/call-patch` are counted while they exist.
+    """
+
+    observes_scratch = True
+
+    def __init__(
+        self, max_bytes: Optional[int]=None, max_nodes: Optional[int]=None
+    ):
+        self.max_bytes = max_bytes
+        self.max_nodes = max_nodes
+        self.live_nodes = 0
+        self.live_bytes = 0
+        self.peak_nodes = 0
+        self.peak_bytes = 0
+
+    @contextmanager
+    def track(self, json_doc: Optional[JsonValue]=None):
+        """Account for `json_doc` and all writes within the block."""
+        if json_doc is not None:
+            self._account(*estimate_size(json_doc))
+        with observe_writes(self):
+            yield self
+
+    def on_write(self, container, key, old, new) -> None:
+        if old is new:
+            return
+        nodes = 0
+        size = 0
+        if old is MissingEntry:
+            size += _key_size(key)
+        else:
+            old_nodes, old_size = estimate_size(old)
+            nodes -= old_nodes
+            size -= old_size
+        if new is MissingEntry:
+            size -= _key_size(key)
+        else:
+            new_nodes, new_size = estimate_size(new)
+            nodes += new_nodes
+            size += new_size
+        self._account(nodes, size)
+
+    def on_release(self, value) -> None:
+        # only the contents of the scratch container were
+        # accounted for via writes, not the container itself
+        nodes, size = estimate_size(value)
+        self._account(1 - nodes, NODE_BYTES - size)
+
+    def stats(self) -> dict:
+        return {
+            'live-nodes': self.live_nodes,
+            'live-bytes': self.live_bytes,
+            'peak-nodes': self.peak_nodes,
+            'peak-bytes': self.peak_bytes,
+        }
+
+    def _account(self, nodes: int, size: int) -> None:
+        self.live_nodes += nodes
+        self.live_bytes += size
+        self.peak_nodes = max(self.peak_nodes, self.live_nodes)
+        self.peak_bytes = max(self.peak_bytes, self.live_bytes)
+        if self.max_bytes is not None and self.live_bytes > self.max_bytes:
+            raise MemoryQuotaExceeded(
+                f'Memory quota of {self.max_bytes} bytes exceeded '
+                f'({self.live_bytes} bytes in use)'
+            )
+        if self.max_nodes is not None and self.live_nodes > self.max_nodes:
+            raise MemoryQuotaExceeded(
+                f'Memory quota of {self.max_nodes} nodes exceeded '
+                f'({self.live_nodes} nodes in use)'
+            )
@@ -0,0 +1,182 @@
+from __future__ import annotations
+from concurrent.futures import (
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+)
+from .context import ExecutionContext
+from .controls import CALL_OP_PHASES
+from .dependency import (
+    OpAccess,
+    op_access,
+    is_independent,
+)
+from .json.write_barrier import (
+    active_write_observers,
+    notify_release,
+)
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonArray,
+    JsonObject,
+)
+
+
+__all__ = ['can_run_concurrently', 'apply_concurrently']
+
+
+def can_run_concurrently(context: ExecutionContext) -> bool:
+    """Check whether calls may be executed outside the current context.
+
+    Patches applied to scratch documents on a worker are not traced
+    and invisible to the write observers of the calling context.
+    """
+    if context.debug:
+        return False
+    return not any(
+        observer.observes_scratch for observer in active_write_observers()
+    )
+
+
+def _run_body(
+    patch, work_dict: JsonObject, context: ExecutionContext
+) -> tuple:
+    patch.apply(work_dict, context=context)
+    # the statistics are kept by the shared context
+    return work_dict, 0, 0
+
+
+def _run_body_in_process(
+    patch_json: str, work_dict: JsonObject, context: ExecutionContext
+) -> tuple:
+    # the copy of the context starts at the count of the original
+    num_ops = context.num_ops
+    patch = context.compile_json(patch_json)
+    patch.apply(work_dict, context=context)
+    return work_dict, context.num_ops - num_ops, context.num_compiled
+
+
+def _prepare_body(
+    executor: Executor, patch, patch_ops: JsonArray,
+    context: ExecutionContext
+):
+    """Return the called patch as sent to `executor`.
+
+    `patch` is the compiled `patch_ops` or `None` to compile it when
+    needed. Threads share the compiled patch, worker processes receive
+    the operations as JSON text and compile them once per process.
+    """
+    if not isinstance(executor, ThreadPoolExecutor):
+        return patch_ops.to_json()
+    if patch is None:
+        patch = context.compile(patch_ops)
+    return patch
+
+
+def _submit_body(
+    executor: Executor, body, work_dict: JsonObject,
+    context: ExecutionContext
+) -> Future:
+    """Submit the application of a called patch to a scratch document."""
+    if isinstance(body, str):
+        return executor.submit(_run_body_in_process, body, work_dict, context)
+    return executor.submit(_run_body, body, work_dict, context)
+
+
+def _body_result(future: Future, context: ExecutionContext) -> JsonObject:
+    """Return the scratch document of a submitted called patch."""
+    work_dict, num_ops, num_compiled = future.result()
+    context.add_worker_stats(num_ops, num_compiled)
+    return work_dict
+
+
+def _call_access(op) -> OpAccess:
+    if op.get_op_name() not in CALL_OP_PHASES:
+        return None
+    return op_access(op._fields)
+
+
+def apply_concurrently(
+    patch_ops: list, json_doc: JsonContainerTypeHint, executor: Executor,
+    context: ExecutionContext
+) -> None:
+    """Apply operations, running independent calls on `executor`.
+
+    Consecutive `ctrl/call-func` and `ctrl/call-patch` operations are
+    grouped as long as their read and write sets do not overlap.
+    The inputs of a group are prepared in the calling thread, the
+    called patches are applied to the scratch documents on `executor`
+    and the outputs are written back in the order of the operations.
+    All other operations are applied sequentially. The resulting
+    document and the raised error are the same as for sequential
+    application. Threads share `context`, worker processes receive
+    a copy of it whose operations are added back to `context`.
+    """
+    group = []
+    for op in patch_ops:
+        access = _call_access(op)
+        if access is not None and all(
+            is_independent(access, other) for _, other in group
+        ):
+            group.append((op, access))
+            continue
+        _run_group(group, json_doc, executor, context)
+        group = []
+        if access is None:
+            context.count_op(op, json_doc)
+            op(json_doc, context)
+        else:
+            group.append((op, access))
+    _run_group(group, json_doc, executor, context)
+
+
+def _run_group(
+    group: list, json_doc: JsonContainerTypeHint, executor: Executor,
+    context: ExecutionContext
+):
+    if len(group) <= 1:
+        for op, _ in group:
+            context.count_op(op, json_doc)
+            op(json_doc, context)
+        return
+    # operation, work dict and future of the submitted calls
+    submitted = []
+    rest = []
+    try:
+        for i, (op, access) in enumerate(group):
+            inputs, _ = CALL_OP_PHASES[op.get_op_name()]
+            work_dict = JsonObject()
+            reads = list(access.reads)
+            try:
+                patch_ops = inputs(op, json_doc, work_dict, reads)
+                access = OpAccess(tuple(reads), access.writes)
+                conflict = not all(
+                    is_independent(access, other) for _, other in group[:i]
+                )
+                if not conflict:
+                    context.count_op(op, json_doc)
+            except Exception:
+                # retried after the outputs of the preceding calls are
+                # written, so the error is raised in the same state
+                if i == 0:
+                    raise
+                conflict = True
+            if conflict:
+                # e.g. a pointer within an input value to an output
+                notify_release(work_dict)
+                rest = group[i:]
+                break
+            body = _prepare_body(executor, None, patch_ops, context)
+            future = _submit_body(executor, body, work_dict, context)
+            submitted.append((op, work_dict, future))
+        for op, _, future in submitted:
+            _, outputs = CALL_OP_PHASES[op.get_op_name()]
+            outputs(op, json_doc, _body_result(future, context))
+    finally:
+        for _, work_dict, future in submitted:
+            future.cancel()
+            notify_release(work_dict)
+    if rest:
+        apply_concurrently(
+            [op for op, _ in rest], json_doc, executor, context
+        )
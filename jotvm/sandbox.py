@@ -0,0 +1,313 @@
+from __future__ import annotations
+import math
+import multiprocessing
+import os
+import signal
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from queue import Queue
+from threading import Lock
+from typing import (
+    Iterable,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+from .batch import _picklable_error
+from .context import (
+    ExecutionContext,
+    ExecutionLimitExceeded,
+)
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonArray,
+)
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+__all__ = ['SandboxError', 'SandboxPool', 'SandboxResult']
+
+
+class SandboxError(RuntimeError):
+    """Raised if a sandboxed worker dies or does not answer in time."""
+    pass
+
+
+class SandboxResult(NamedTuple):
+    """Outcome of a sandboxed patch application.
+
+    `cpu_time` is the CPU time in seconds spent on the job and
+    `max_rss` the peak resident set size in bytes of the worker
+    process so far. Both are `None` if the worker failed to answer.
+    """
+
+    doc: Optional[JsonContainerTypeHint]
+    error: Optional[Exception]
+    num_ops: int
+    cpu_time: Optional[float]
+    max_rss: Optional[int]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _max_rss() -> int:
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes except on macOS
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _cpu_exceeded(signum, frame):
+    raise ExecutionLimitExceeded('CPU time limit exceeded')
+
+
+def _set_cpu_limit(seconds) -> None:
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        soft = hard
+    else:
+        soft = int(math.ceil(_cpu_time())) + seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(
+    conn, cpu_time: Optional[int], max_memory: Optional[int],
+    max_ops: Optional[int], warm_patches: list
+) -> None:
+    if max_memory is not None:
+        # the hard limit cannot be raised again by the patches
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+    if cpu_time is not None:
+        signal.signal(signal.SIGXCPU, _cpu_exceeded)
+    # keeps the compiled patches across the jobs of the worker
+    context = ExecutionContext(debug=False, max_ops=max_ops)
+    for patch_ops in warm_patches:
+        context.compile(patch_ops)
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        patch_ops, json_doc, atomic = message
+        context.num_ops = 0
+        start = _cpu_time()
+        error = None
+        try:
+            _set_cpu_limit(cpu_time)
+            try:
+                patch = context.compile(patch_ops)
+                patch.apply(json_doc, atomic=atomic, context=context)
+            finally:
+                _set_cpu_limit(None)
+        except Exception as exc:
+            error = exc
+        conn.send((
+            json_doc, _picklable_error(error), context.num_ops,
+            _cpu_time() - start, _max_rss()
+        ))
+
+
+class _Worker:
+
+    def __init__(self, mp_context, args: tuple):
+        self.conn, child_conn = mp_context.Pipe()
+        self.process = mp_context.Process(
+            target=_worker_main, args=(child_conn, *args), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.num_jobs = 0
+
+    def close(self, kill: bool=False) -> None:
+        if self.conn.closed:
+            return
+        if not kill:
+            try:
+                self.conn.send(None)
+            except OSError:
+                kill = True
+        if kill:
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    """Apply untrusted patches in pre-forked worker processes.
+
+    Each worker process enforces OS resource limits on itself: at
+    most `cpu_time` seconds of CPU time per job, which are rounded up
+    to whole seconds by the operating system, and an address space of
+    at most `max_memory` bytes. `max_ops` limits the number of
+    operations executed per job. A job taking longer than `timeout`
+    seconds of wall-clock time kills its worker.
+
+    Workers are forked from a server process that has imported
+    `jotvm` already, and they keep their compiled patches across
+    jobs, which can be warmed up upfront with `warm_patches`. Workers
+    are replaced after a failed job and after `max_jobs_per_worker`
+    jobs. Patches are applied as `ExtJsonPatch`. The pool may be
+    used from several threads at the same time.
+
+    Resource limits require the `resource` module, i.e. a Unix
+    system. As the fork server imports the main module, scripts
+    using the pool must guard their code by `if __name__ == '__main__'`.
+    """
+
+    def __init__(
+        self, max_workers: Optional[int]=None, cpu_time: Optional[int]=None,
+        max_memory: Optional[int]=None, max_ops: Optional[int]=None,
+        timeout: Optional[float]=None, max_jobs_per_worker: int=1000,
+        warm_patches: Sequence['JsonPatchBase']=()
+    ):
+        if resource is None:
+            raise RuntimeError('Sandboxing requires the `resource` module')
+        if max_jobs_per_worker < 1:
+            raise ValueError('`max_jobs_per_worker` must be positive')
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.cpu_time = cpu_time
+        self.max_memory = max_memory
+        self.max_ops = max_ops
+        self.timeout = timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.warm_patches = [patch.to_json_array() for patch in warm_patches]
+        self._workers = None
+        self._idle = Queue()
+        self._lock = Lock()
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._mp_context = multiprocessing.get_context('forkserver')
+            self._mp_context.set_forkserver_preload(['jotvm.json_patch'])
+        else:
+            self._mp_context = multiprocessing.get_context('spawn')
+
+    def __enter__(self) -> 'SandboxPool':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        with self._lock:
+            if self._workers is not None:
+                return
+            self._workers = set()
+            for _ in range(self.max_workers):
+                self._idle.put(self._new_worker())
+
+    def close(self) -> None:
+        """Stop the worker processes once their jobs are finished."""
+        with self._lock:
+            workers, self._workers = self._workers, None
+        if workers is None:
+            return
+        for _ in range(len(workers)):
+            self._idle.get().close()
+
+    def _new_worker(self) -> _Worker:
+        worker = _Worker(self._mp_context, (
+            self.cpu_time, self.max_memory, self.max_ops, self.warm_patches
+        ))
+        self._workers.add(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, kill: bool) -> _Worker:
+        worker.close(kill)
+        with self._lock:
+            if self._workers is None:
+                # the pool was closed meanwhile, `close` takes the
+                # closed worker from the idle queue
+                return worker
+            self._workers.discard(worker)
+            return self._new_worker()
+
+    def apply(
+        self, patch: 'JsonPatchBase', json_doc: JsonContainerTypeHint,
+        atomic: bool=False
+    ) -> SandboxResult:
+        """Apply `patch` to a copy of `json_doc` in a worker.
+
+        Errors raised by the patch, exceeded limits and dead workers
+        are reported in the result, which holds the modified copy.
+        """
+        if self._workers is None:
+            self.start()
+        patch_ops = patch.to_json_array()
+        worker = self._idle.get()
+        try:
+            result = self._run(worker, patch_ops, json_doc, atomic)
+        except BaseException:
+            worker = self._replace(worker, kill=True)
+            raise
+        else:
+            if not result.ok or worker.num_jobs >= self.max_jobs_per_worker:
+                # a worker that did not answer may be stuck
+                worker = self._replace(worker, kill=result.doc is None)
+        finally:
+            self._idle.put(worker)
+        return result
+
+    def _run(
+        self, worker: _Worker, patch_ops: JsonArray,
+        json_doc: JsonContainerTypeHint, atomic: bool
+    ) -> SandboxResult:
+        worker.num_jobs += 1
+        try:
+            worker.conn.send((patch_ops, json_doc, atomic))
+            if not worker.conn.poll(self.timeout):
+                raise SandboxError(
+                    f'Job did not finish within {self.timeout} seconds'
+                )
+            result = SandboxResult(*worker.conn.recv())
+        except (OSError, EOFError, SandboxError) as exc:
+            worker.process.join(0.1)
+            if not isinstance(exc, SandboxError):
+                exc = SandboxError(
+                    f'Worker exited with code {worker.process.exitcode}'
+                )
+            result = SandboxResult(None, exc, 0, None, None)
+        return result
+
+    def apply_many(
+        self, patch: 'JsonPatchBase', docs: Iterable[JsonContainerTypeHint],
+        atomic: bool=False
+    ) -> Iterator[SandboxResult]:
+        """Apply `patch` to each of `docs` and yield the results in order."""
+        self.start()
+        docs = iter(docs)
+        # at most two jobs per worker are in flight
+        pending = deque()
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            try:
+                for doc in islice(docs, 2 * self.max_workers):
+                    pending.append(
+                        executor.submit(self.apply, patch, doc, atomic)
+                    )
+                while pending:
+                    result = pending.popleft().result()
+                    for doc in islice(docs, 1):
+                        pending.append(
+                            executor.submit(self.apply, patch, doc, atomic)
+                        )
+                    yield result
+            finally:
+                for future in pending:
+                    future.cancel()
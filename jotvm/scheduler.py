@@ -0,0 +1,248 @@
+from __future__ import annotations
+import time
+from collections import deque
+from contextvars import copy_context
+from typing import (
+    Callable,
+    Hashable,
+    Iterator,
+    Optional,
+)
+from .context import ExecutionContext
+from .transaction import (
+    Transaction,
+    current_transaction,
+)
+from .json.json_types import JsonContainerTypeHint
+
+
+__all__ = ['PatchJob', 'PatchScheduler']
+
+
+def _job_steps(
+    patch: 'JsonPatchBase', json_doc: JsonContainerTypeHint, atomic: bool,
+    context: ExecutionContext
+) -> Iterator[tuple]:
+    if atomic and current_transaction() is None:
+        with Transaction().begin():
+            yield from patch._steps(json_doc, context)
+    else:
+        yield from patch._steps(json_doc, context)
+
+
+class PatchJob:
+    """Application of a patch managed by a `PatchScheduler`.
+
+    `submitted_at`, `started_at` and `finished_at` are clock values
+    of the scheduler. `service_time` is the time spent executing the
+    job and `queue_time` the time it waited for execution so far.
+    """
+
+    def __init__(
+        self, patch: 'JsonPatchBase', json_doc: JsonContainerTypeHint,
+        tenant: Hashable, atomic: bool, context: ExecutionContext,
+        submitted_at: float
+    ):
+        self.patch = patch
+        self.json_doc = json_doc
+        self.tenant = tenant
+        self.context = context
+        self.state = 'queued'
+        self.error = None
+        self.num_ops = 0
+        self.service_time = 0.0
+        self.submitted_at = submitted_at
+        self.started_at = None
+        self.finished_at = None
+        # each job has its own transaction and observers
+        self._run_context = copy_context()
+        self._steps = _job_steps(patch, json_doc, atomic, context)
+
+    def __repr__(self):
+        return f'PatchJob(tenant={self.tenant!r}, state={self.state!r})'
+
+    def done(self) -> bool:
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def queue_time(self, now: Optional[float]=None) -> float:
+        if self.finished_at is not None:
+            now = self.finished_at
+        elif now is None:
+            raise ValueError('`now` is required for unfinished jobs')
+        return now - self.submitted_at - self.service_time
+
+    def _run(self, max_ops: int) -> None:
+        """Execute at most `max_ops` operations."""
+        self._run_context.run(self._run_ops, max_ops)
+
+    def _run_ops(self, max_ops: int) -> None:
+        # each step completes the previous operation and suspends
+        # before the next one
+        for _ in range(max_ops):
+            try:
+                next(self._steps)
+            except StopIteration:
+                self.state = 'done'
+                return
+            except Exception as exc:
+                self.state = 'failed'
+                self.error = exc
+                return
+            self.num_ops += 1
+
+    def _close(self) -> None:
+        # rolls back the open savepoints
+        self._run_context.run(self._steps.close)
+
+
+class _Tenant:
+
+    __slots__ = (
+        'weight', 'priority', 'vtime', 'jobs',
+        'num_jobs', 'num_ops', 'service_time', 'queue_time', 'max_queue_time'
+    )
+
+    def __init__(self, weight: float, priority: int):
+        self.weight = weight
+        self.priority = priority
+        # operations executed divided by the weight
+        self.vtime = 0.0
+        self.jobs = deque()
+        self.num_jobs = 0
+        self.num_ops = 0
+        self.service_time = 0.0
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+
+
+class PatchScheduler:
+    """Interleave many patch applications on a single thread.
+
+    Jobs are resumable applications of patches, which are executed in
+    quanta of `quantum` operations, including those of nested patches.
+    Among the tenants with queued jobs, those with the highest
+    priority are served first. Tenants of the same priority share the
+    executed operations in proportion to their weight, by always
+    serving the tenant that received the least operations per weight.
+    A tenant that becomes active again does not get credit for the
+    time it was idle. The jobs of a tenant are served round robin,
+    so short jobs are not stuck behind long-running loops.
+
+    Each job runs in a copy of the context of its submission, so that
+    atomic jobs have their own transaction.
+    """
+
+    def __init__(self, quantum: int=100, clock: Callable=time.perf_counter):
+        if quantum < 1:
+            raise ValueError('`quantum` must be positive')
+        self.quantum = quantum
+        self.clock = clock
+        self._tenants = {}
+
+    def set_tenant(
+        self, tenant: Hashable, weight: float=1.0, priority: int=0
+    ) -> None:
+        """Configure the share of a tenant."""
+        if weight <= 0:
+            raise ValueError('`weight` must be positive')
+        state = self._tenant(tenant)
+        state.weight = weight
+        state.priority = priority
+
+    def _tenant(self, tenant: Hashable) -> _Tenant:
+        state = self._tenants.get(tenant)
+        if state is None:
+            state = self._tenants[tenant] = _Tenant(1.0, 0)
+        return state
+
+    def submit(
+        self, patch: 'JsonPatchBase', json_doc: JsonContainerTypeHint,
+        tenant: Hashable='default', atomic: bool=False,
+        context: Optional[ExecutionContext]=None
+    ) -> PatchJob:
+        """Queue the application of `patch` to `json_doc`."""
+        if context is None:
+            context = ExecutionContext()
+        state = self._tenant(tenant)
+        if not state.jobs:
+            active = [t.vtime for t in self._tenants.values() if t.jobs]
+            if active:
+                state.vtime = max(state.vtime, min(active))
+        job = PatchJob(patch, json_doc, tenant, atomic, context, self.clock())
+        state.jobs.append(job)
+        return job
+
+    def cancel(self, job: PatchJob) -> None:
+        """Abort a job that is not finished yet."""
+        if job.done():
+            return
+        self._tenants[job.tenant].jobs.remove(job)
+        job._close()
+        job.state = 'cancelled'
+        job.finished_at = self.clock()
+
+    def pending(self) -> int:
+        """Return the number of unfinished jobs."""
+        return sum(len(t.jobs) for t in self._tenants.values())
+
+    def _next_tenant(self) -> Optional[_Tenant]:
+        best = None
+        for state in self._tenants.values():
+            if state.jobs and (
+                best is None
+                or (-state.priority, state.vtime) < (-best.priority, best.vtime)
+            ):
+                best = state
+        return best
+
+    def run_quantum(self) -> Optional[PatchJob]:
+        """Run the next job for one quantum and return it.
+
+        Returns `None` if there are no jobs.
+        """
+        state = self._next_tenant()
+        if state is None:
+            return None
+        job = state.jobs.popleft()
+        start = self.clock()
+        if job.started_at is None:
+            job.started_at = start
+            job.state = 'running'
+        num_ops = job.num_ops
+        job._run(self.quantum)
+        end = self.clock()
+        num_ops = job.num_ops - num_ops
+        job.service_time += end - start
+        state.vtime += max(num_ops, 1) / state.weight
+        state.num_ops += num_ops
+        state.service_time += end - start
+        if job.done():
+            job.finished_at = end
+            queue_time = job.queue_time()
+            state.num_jobs += 1
+            state.queue_time += queue_time
+            state.max_queue_time = max(state.max_queue_time, queue_time)
+        else:
+            state.jobs.append(job)
+        return job
+
+    def run(self, max_time: Optional[float]=None) -> None:
+        """Run jobs until all are finished or `max_time` has passed."""
+        deadline = None if max_time is None else self.clock() + max_time
+        while self.run_quantum() is not None:
+            if deadline is not None and self.clock() >= deadline:
+                return
+
+    def stats(self) -> dict:
+        """Return the metrics of the finished jobs of each tenant."""
+        return {
+            tenant: {
+                'jobs': state.num_jobs,
+                'ops': state.num_ops,
+                'service-time': state.service_time,
+                'queue-time': state.queue_time,
+                'max-queue-time': state.max_queue_time,
+                'pending': len(state.jobs),
+            }
+            for tenant, state in self._tenants.items()
+        }
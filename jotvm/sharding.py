@@ -0,0 +1,212 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+from typing import (
+    Optional,
+    Union,
+)
+from .batch import _picklable_error
+from .context import ExecutionContext
+from .dependency import SCOPE_OP_NAMES
+from .json_pointer import JsonPointer
+from .json.json_types import (
+    JsonContainerTypeHint,
+    JsonArray,
+    JsonObject,
+    JsonString,
+)
+
+
+__all__ = ['ShardingError', 'apply_sharded']
+
+
+SHARD_EXECUTOR_TYPES = ('serial', 'process')
+
+# Pointer fields that address a location within the scope of the
+# operation, all other `*-path` fields refer to values to be read
+_LOCATION_FIELDS = {
+    'ctrl/while-loop': ('check-path',),
+    'ctrl/for-loop': ('counter-path',),
+    'ctrl/for-each': ('item-path', 'index-path'),
+}
+
+
+class ShardingError(ValueError):
+    """Raised if a patch cannot be partitioned into shards."""
+    pass
+
+
+def _shard_of(path: tuple, shard_roots: list) -> Optional[tuple]:
+    # the deepest shard root wins for nested roots
+    for root in shard_roots:
+        if len(path) > len(root) and path[:len(root)] == root:
+            return path[:len(root)+1]
+    return None
+
+
+def _within(path: tuple, prefix: tuple) -> bool:
+    return path[:len(prefix)] == prefix
+
+
+def _plan(patch_ops: JsonArray, shard_roots: list) -> dict:
+    """Assign the operations to shards.
+
+    Returns a dict mapping the shard locations to the indices of
+    their operations in the patch and the fields of the operations.
+    """
+    shards = {}
+    for index, op_fields in enumerate(patch_ops):
+        op_name = op_fields['op'].to_python()
+        if op_name not in SCOPE_OP_NAMES:
+            raise ShardingError(
+                f'Operation {index} of type `{op_name}` cannot be sharded, '
+                f'only operations applying a patch to a scope can'
+            )
+        path = tuple(JsonPointer(op_fields['path']))
+        shard = _shard_of(path, shard_roots)
+        if shard is None:
+            raise ShardingError(
+                f'Operation {index} at path "{op_fields["path"]}" '
+                f'is not confined to a member of a shard root'
+            )
+        for key in _LOCATION_FIELDS.get(op_name, ()):
+            if key in op_fields and not _within(
+                tuple(JsonPointer(op_fields[key])), shard
+            ):
+                raise ShardingError(
+                    f'`{key}` of operation {index} escapes its shard'
+                )
+        indices, ops = shards.setdefault(shard, ([], []))
+        indices.append(index)
+        ops.append(op_fields)
+    return shards
+
+
+def _overlaps_shard(location: tuple, shards: dict, shard_prefixes: set) -> bool:
+    return location in shard_prefixes or any(
+        location[:i] in shards for i in range(len(location))
+    )
+
+
+def _localize(
+    op_fields: JsonObject, shard: tuple, shards: dict,
+    shard_prefixes: set, json_doc: JsonContainerTypeHint, inlined: dict
+) -> JsonObject:
+    """Rewrite the pointers of an operation relative to its shard.
+
+    Values read from outside all shards are inlined, as these
+    locations are not changed by the patch. They are copied once
+    and shared by all operations via `inlined`, since operations
+    copy the values they read anyway.
+    """
+    local_fields = JsonObject()
+    for key, value in op_fields.items():
+        if key != 'path' and not key.endswith('-path'):
+            local_fields[key] = value
+            continue
+        location = tuple(JsonPointer(value))
+        if _within(location, shard):
+            local_path = JsonPointer.from_segments(location[len(shard):])
+            local_fields[key] = JsonString(str(local_path))
+            continue
+        if location not in inlined:
+            if _overlaps_shard(location, shards, shard_prefixes):
+                raise ShardingError(
+                    f'`{key}` "{value}" refers to another shard'
+                )
+            inlined[location] = deepcopy(JsonPointer(value).get(json_doc))
+        local_fields[key[:-len('-path')]] = inlined[location]
+    return local_fields
+
+
+def _apply_shards(shards: list) -> list:
+    # nested patches are compiled once per chunk of shards
+    context = ExecutionContext()
+    results = []
+    for indices, patch_ops, value in shards:
+        patch = context.compile(patch_ops)
+        error = None
+        for index, op in zip(indices, patch._patch_ops):
+            try:
+                context.count_op(op, value)
+                op(value, context)
+            except Exception as exc:
+                error = (index, _picklable_error(exc))
+                break
+        results.append((value, error))
+    return results
+
+
+def apply_sharded(
+    patch: 'JsonPatchBase', json_doc: JsonContainerTypeHint,
+    shard_roots: Union[str, list]='', executor: str='process',
+    max_workers: Optional[int]=None, chunksize: int=1
+) -> None:
+    """Apply a patch by partitioning `json_doc` into independent shards.
+
+    The members of the containers at the `shard_roots` pointers are
+    the shards, by default the top-level members of the document.
+    The patch may only consist of operations applying a nested patch
+    to a scope, such as `ctrl/apply-patch`, whose `path` is within a
+    shard. The operations of each shard are applied to a copy of the
+    shard in a worker process and the modified shards are put back
+    into `json_doc`. Operations with the root path, at a shard root
+    itself or with pointers into other shards are rejected with a
+    `ShardingError`, as they are not confined to a single shard.
+
+    The document is only changed if the operations of all shards
+    succeed. Otherwise the error raised by the first failing
+    operation in the order of the patch is raised.
+    """
+    if executor not in SHARD_EXECUTOR_TYPES:
+        raise ValueError(
+            f'`executor` must be one of {", ".join(SHARD_EXECUTOR_TYPES)}'
+        )
+    if chunksize < 1:
+        raise ValueError('`chunksize` must be positive')
+    if isinstance(shard_roots, str):
+        shard_roots = [shard_roots]
+    shard_roots = sorted(
+        (tuple(JsonPointer(root)) for root in shard_roots),
+        key=len, reverse=True
+    )
+    shards = _plan(patch.to_json_array(), shard_roots)
+    # a location contains a shard if it is one of these prefixes
+    shard_prefixes = set(
+        shard[:i] for shard in shards for i in range(len(shard) + 1)
+    )
+    tasks = []
+    inlined = {}
+    for shard, (indices, ops) in shards.items():
+        patch_ops = JsonArray([
+            _localize(
+                op_fields, shard, shards, shard_prefixes, json_doc, inlined
+            )
+            for op_fields in ops
+        ])
+        value = JsonPointer.from_segments(shard).get(json_doc)
+        tasks.append((indices, patch_ops, value))
+
+    chunks = [
+        tasks[i:i+chunksize] for i in range(0, len(tasks), chunksize)
+    ]
+    if executor == 'serial':
+        results = [
+            _apply_shards([
+                (indices, patch_ops, deepcopy(value))
+                for indices, patch_ops, value in chunk
+            ])
+            for chunk in chunks
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers) as pool:
+            results = list(pool.map(_apply_shards, chunks))
+    results = [result for chunk_results in results for result in chunk_results]
+
+    errors = [error for _, error in results if error is not None]
+    if errors:
+        raise min(errors, key=lambda error: error[0])[1]
+    for shard, (value, _) in zip(shards, results):
+        parent = JsonPointer.from_segments(shard[:-1]).get(json_doc)
+        key = int(shard[-1]) if isinstance(parent, JsonArray) else shard[-1]
+        parent[key] = value
@@ -0,0 +1,293 @@
+from __future__ import annotations
+import struct
+from copy import deepcopy
+from decimal import Decimal
+from multiprocessing import shared_memory
+from .json.json_types import (
+    JsonValue,
+    JsonObject,
+    JsonArray,
+    JsonString,
+    JsonNumber,
+    JsonBool,
+    JsonNull,
+)
+
+
+__all__ = [
+    'encode_document',
+    'decode_document',
+    'SharedJsonDocument',
+]
+
+
+# Binary layout (little endian, offsets relative to the buffer start):
+#   header: magic `JVD1`, u32 offset of the root node
+#   string: `s`, u32 length, UTF-8 bytes
+#   number: `d`, u32 length, ASCII representation
+#   true, false, null: `t`, `f`, `n`
+#   array:  `a`, u32 count, count * u32 element offset
+#   object: `o`, u32 count, count * (u32 key offset, u32 value offset)
+# Children precede their parents and equal strings and numbers
+# are stored only once.
+
+MAGIC = b'JVD1'
+_HEADER = struct.Struct('<4sI')
+_TAG_COUNT = struct.Struct('<cI')
+_MAX_OFFSET = 2**32 - 1
+
+
+class _Encoder:
+
+    def __init__(self):
+        self.buf = bytearray(_HEADER.size)
+        self.atoms = {}
+
+    def encode(self, value: JsonValue) -> int:
+        if isinstance(value, JsonObject):
+            offsets = []
+            for key, child in value.value.items():
+                offsets.append(self.encode(key))
+                offsets.append(self.encode(child))
+            return self._write(b'o', len(value.value), offsets)
+        if isinstance(value, JsonArray):
+            offsets = [self.encode(child) for child in value.value]
+            return self._write(b'a', len(offsets), offsets)
+        if isinstance(value, JsonString):
+            return self._write_atom(
+                b's', value.value.encode('utf-8', 'surrogatepass')
+            )
+        if isinstance(value, JsonNumber):
+            return self._write_atom(b'd', str(value.value).encode('ascii'))
+        if isinstance(value, JsonBool):
+            return self._write_atom(b't' if value.value else b'f', None)
+        if isinstance(value, JsonNull):
+            return self._write_atom(b'n', None)
+        raise TypeError(f'Unsupported type {type(value)}')
+
+    def _write_atom(self, tag: bytes, data) -> int:
+        offset = self.atoms.get((tag, data))
+        if offset is None:
+            offset = len(self.buf)
+            if data is None:
+                self.buf += tag
+            else:
+                self.buf += _TAG_COUNT.pack(tag, len(data)) + data
+            self.atoms[(tag, data)] = offset
+        return offset
+
+    def _write(self, tag: bytes, count: int, offsets: list) -> int:
+        offset = len(self.buf)
+        self.buf += _TAG_COUNT.pack(tag, count)
+        self.buf += struct.pack(f'<{len(offsets)}I', *offsets)
+        return offset
+
+
+def encode_document(json_doc: JsonValue) -> bytes:
+    """Encode a JSON value in the binary layout of shared documents."""
+    encoder = _Encoder()
+    root = encoder.encode(json_doc)
+    if len(encoder.buf) > _MAX_OFFSET:
+        raise ValueError('Encoded document exceeds 4 GiB')
+    _HEADER.pack_into(encoder.buf, 0, MAGIC, root)
+    return bytes(encoder.buf)
+
+
+class _Reader:
+
+    def __init__(self, buf):
+        self.buf = buf
+
+    def root(self) -> JsonValue:
+        magic, root = _HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError('Buffer does not contain an encoded document')
+        return self.decode(root)
+
+    def decode(self, offset: int) -> JsonValue:
+        tag = self.buf[offset:offset+1]
+        if tag == b'o':
+            return LazyJsonObject(self, offset)
+        if tag == b'a':
+            return LazyJsonArray(self, offset)
+        if tag == b's':
+            return JsonString(self._bytes(offset).decode('utf-8', 'surrogatepass'))
+        if tag == b'd':
+            return JsonNumber(Decimal(self._bytes(offset).decode('ascii')))
+        if tag == b't':
+            return JsonBool(True)
+        if tag == b'f':
+            return JsonBool(False)
+        if tag == b'n':
+            return JsonNull()
+        raise ValueError(f'Invalid tag {tag!r} at offset {offset}')
+
+    def _bytes(self, offset: int) -> bytes:
+        _, length = _TAG_COUNT.unpack_from(self.buf, offset)
+        start = offset + _TAG_COUNT.size
+        return bytes(self.buf[start:start+length])
+
+    def offsets(self, offset: int, per_entry: int) -> tuple:
+        _, count = _TAG_COUNT.unpack_from(self.buf, offset)
+        return struct.unpack_from(
+            f'<{count * per_entry}I', self.buf, offset + _TAG_COUNT.size
+        )
+
+
+def decode_document(buf) -> JsonValue:
+    """Return a lazy view of a document encoded in `buf`."""
+    return _Reader(buf).root()
+
+
+class LazyJsonObject(JsonObject):
+    """`JsonObject` whose members are decoded on first access.
+
+    Changes are applied to the decoded members and never written
+    back to the underlying buffer. Copies are plain `JsonObject`s.
+    """
+
+    def __init__(self, reader: _Reader, offset: int):
+        self._reader = reader
+        self._offset = offset
+        self._value = None
+
+    @property
+    def value(self) -> dict:
+        if self._value is None:
+            offsets = self._reader.offsets(self._offset, 2)
+            decode = self._reader.decode
+            self._value = {
+                decode(offsets[i]): decode(offsets[i+1])
+                for i in range(0, len(offsets), 2)
+            }
+        return self._value
+
+    @value.setter
+    def value(self, value: dict) -> None:
+        self._value = value
+
+    def __eq__(self, other):
+        if isinstance(other, JsonObject):
+            return self.value == other.value
+        return NotImplemented
+
+    def __deepcopy__(self, memo):
+        return JsonObject({
+            deepcopy(k, memo): deepcopy(v, memo) for k, v in self.value.items()
+        })
+
+    def __reduce__(self):
+        return (JsonObject, (self.value,))
+
+
+class LazyJsonArray(JsonArray):
+    """`JsonArray` whose elements are decoded on first access.
+
+    Changes are applied to the decoded elements and never written
+    back to the underlying buffer. Copies are plain `JsonArray`s.
+    """
+
+    def __init__(self, reader: _Reader, offset: int):
+        self._reader = reader
+        self._offset = offset
+        self._value = None
+
+    @property
+    def value(self) -> list:
+        if self._value is None:
+            decode = self._reader.decode
+            self._value = [
+                decode(o) for o in self._reader.offsets(self._offset, 1)
+            ]
+        return self._value
+
+    @value.setter
+    def value(self, value: list) -> None:
+        self._value = value
+
+    def __eq__(self, other):
+        if isinstance(other, JsonArray):
+            return self.value == other.value
+        return NotImplemented
+
+    def __deepcopy__(self, memo):
+        return JsonArray([deepcopy(v, memo) for v in self.value])
+
+    def __reduce__(self):
+        return (JsonArray, (self.value,))
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached segments with the resource
+        # tracker, which would unlink them when the process exits
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class SharedJsonDocument:
+    """Read-only JSON document placed in shared memory.
+
+    The document is encoded once by `create` and can be attached to
+    by other processes via its `name`. Pickling an instance transfers
+    only the name, so it can be passed to worker processes cheaply.
+    `root` returns a lazy view of the document: containers are only
+    decoded when accessed, so a process reading a small part of a
+    large document decodes only that part. Each view keeps its own
+    changes, the shared memory itself is never modified.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+
+    @classmethod
+    def create(cls, json_doc: JsonValue) -> 'SharedJsonDocument':
+        """Encode `json_doc` into a new shared memory block."""
+        data = encode_document(json_doc)
+        shm = shared_memory.SharedMemory(create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedJsonDocument':
+        """Attach to a shared document created by another process."""
+        return cls(_attach_shared_memory(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def size(self) -> int:
+        return self._shm.size
+
+    def root(self) -> JsonValue:
+        """Return a new lazy view of the document."""
+        return decode_document(self._shm.buf)
+
+    def close(self) -> None:
+        """Detach from the shared memory.
+
+        Views obtained from `root` must not be used afterwards.
+        The creating process also frees the shared memory.
+        """
+        if self._shm is None:
+            return
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self) -> 'SharedJsonDocument':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __reduce__(self):
+        return (SharedJsonDocument.attach, (self.name,))
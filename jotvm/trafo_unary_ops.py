@@ -35,9 +35,7 @@ class TrafoUnaryOpBase(JsonPatchOpBase):
         arg_value = obtain_value('value', self._fields, json_doc)
         result = self.basic_op(arg_value)
         path = JsonPointer(self._fields['path'])
-        if path.exists(json_doc):
-            path.remove(json_doc)
-        path.add(json_doc, result)
+        path.set(json_doc, result, create=True)
 
 
 def make_trafo_unary_op_class(class_name: str, op_name: str, op_func: callable):
@@ -0,0 +1,106 @@
+from __future__ import annotations
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Optional
+from .json.write_barrier import (
+    MissingEntry,
+    WriteObserverBase,
+    observe_writes,
+)
+from .json.json_types import JsonArray
+
+
+__all__ = [
+    'Transaction',
+    'current_transaction',
+    'atomic_scope',
+]
+
+
+_current_transaction: ContextVar[Optional['Transaction']] = ContextVar(
+    'jotvm_current_transaction', default=None
+)
+
+
+def current_transaction() -> Optional['Transaction']:
+    """Return the transaction active in the current context."""
+    return _current_transaction.get()
+
+
+def atomic_scope():
+    """Return a savepoint scope of the active transaction, if any."""
+    transaction = _current_transaction.get()
+    if transaction is None:
+        return nullcontext()
+    return transaction.atomic()
+
+
+def _undo_write(container, key, old, new) -> None:
+    if old is MissingEntry:
+        del container[key]
+    elif new is MissingEntry and isinstance(container, JsonArray):
+        container.insert(key, old)
+    else:
+        container[key] = old
+
+
+class Transaction(WriteObserverBase):
+    """Undo log of container writes for atomic patch application.
+
+    Each write is recorded together with the value it replaced.
+    Rolling back replays the inverse writes in reverse order, so the
+    cost is proportional to the number of mutations and not to the
+    size of the document. Object keys that are restored are
+    reinserted at the end of the object.
+    """
+
+    def __init__(self):
+        self._log = []
+        self._rolling_back = False
+
+    def __len__(self):
+        return len(self._log)
+
+    def on_write(self, container, key, old, new) -> None:
+        if not self._rolling_back:
+            self._log.append((container, key, old, new))
+
+    def savepoint(self) -> int:
+        """Return a marker for the current position in the undo log."""
+        return len(self._log)
+
+    def rollback(self, savepoint: int=0) -> None:
+        """Undo all writes recorded after `savepoint`."""
+        self._rolling_back = True
+        try:
+            while len(self._log) > savepoint:
+                _undo_write(*self._log.pop())
+        finally:
+            self._rolling_back = False
+
+    @contextmanager
+    def atomic(self):
+        """Roll back the writes of the block if it raises."""
+        savepoint = self.savepoint()
+        try:
+            yield self
+        except BaseException:
+            self.rollback(savepoint)
+            raise
+
+    @contextmanager
+    def begin(self):
+        """Activate the transaction for all writes within the block.
+
+        If the block raises, all recorded writes are undone.
+        Otherwise the undo log is discarded on exit.
+        """
+        if _current_transaction.get() is not None:
+            raise RuntimeError('Another transaction is already active')
+        token = _current_transaction.set(self)
+        try:
+            with observe_writes(self), self.atomic():
+                yield self
+            self._log.clear()
+        finally:
+            _current_transaction.reset(token)
@@ -1,3 +1,4 @@
+import operator
 from typing import Union
 from copy import deepcopy
 from .json_pointer import JsonPointer
@@ -7,7 +8,9 @@ from .json.json_types import (
     JsonBool,
     JsonObject,
     JsonArray,
+    JsonNull,
 )
+from .json.compact_array import CompactNumberArray
 
 
 def int_to_str(x):
@@ -48,6 +51,72 @@ def ensure_bool(x):
     return ensure_type(x, JsonBool)
 
 
+_SCALAR_TYPES = (JsonString, JsonNumber, JsonBool, JsonNull)
+
+
+def copy_values(values: list) -> list:
+    """Return copies of a list of JSON values.
+
+    Equivalent to `deepcopy(values)`, but scalars are copied without
+    the overhead of `deepcopy`.
+    """
+    copies = []
+    for value in values:
+        value_type = type(value)
+        if value_type in _SCALAR_TYPES:
+            copy_ = object.__new__(value_type)
+            copy_.value = value.value
+            copies.append(copy_)
+        else:
+            copies.append(deepcopy(value))
+    return copies
+
+
+def resolve_segments(segments: JsonArray, json_doc: JsonObject) -> tuple:
+    """Return the decoded segments of a pointer given as array.
+
+    Each element is a string or an integer, or an object whose
+    `value` or `value-path` field gives such a segment.
+    """
+    resolved = []
+    for segment in ensure_array(segments).value:
+        if isinstance(segment, JsonObject):
+            segment = obtain_value('value', segment, json_doc, copy=False)
+        if isinstance(segment, JsonString):
+            resolved.append(segment.value)
+        elif isinstance(segment, JsonNumber):
+            resolved.append(str(operator.index(segment)))
+        else:
+            raise TypeError(
+                f'Pointer segment {segment!s} is not a string or a number'
+            )
+    return tuple(resolved)
+
+
+def number_values(values: Union[list, JsonArray]) -> list:
+    """Return the `Decimal` values of a list or an array of JSON numbers."""
+    if isinstance(values, CompactNumberArray) and values.is_packed:
+        return values.decimals()
+    if isinstance(values, JsonArray):
+        values = values.value
+    decimals = []
+    for value in values:
+        if type(value) is not JsonNumber:
+            raise TypeError(f'x = {value!s} is not of type {JsonNumber!s}')
+        decimals.append(value.value)
+    return decimals
+
+
+def make_numbers(decimals) -> list:
+    """Return JSON numbers of finite `Decimal` values without conversion."""
+    numbers = []
+    for decimal in decimals:
+        number = object.__new__(JsonNumber)
+        number.value = decimal
+        numbers.append(number)
+    return numbers
+
+
 class MissingValueType:
     pass
 
@@ -61,9 +130,14 @@ MissingValue = MissingValueType()
 #   the path indicated by the JSON Pointer stored under
 #   the `fieldname-path` field.
 def obtain_value(
-    field_name: Union[str, JsonString], fields: JsonObject, json_doc: JsonObject, missing_ok=False
+    field_name: Union[str, JsonString], fields: JsonObject, json_doc: JsonObject, missing_ok=False,
+    copy=True
 ):
-    """Obtain value, directly from fields or indirectly from json_doc."""
+    """Obtain value, directly from fields or indirectly from json_doc.
+
+    If `copy` is false, the value is returned without copying and
+    must not be modified.
+    """
     if not isinstance(field_name, (str, JsonString)):
         raise TypeError('`field_name` must be type `str` or `JsonString`')
     if not isinstance(fields, JsonObject):
@@ -81,4 +155,6 @@ def obtain_value(
         return MissingValue
     else:
         raise KeyError(f'Missing field `{field_name}`')
+    if not copy:
+        return value
     return deepcopy(value)
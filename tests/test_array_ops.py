@@ -0,0 +1,184 @@
+import pytest
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.transaction import Transaction
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "arr": [1, 2, 3, 4, 5],
+        "other": [{"a": 1}, "x", True],
+        "two": 2,
+    }, require_decimal=False)
+
+
+def _apply(json_doc, patch_ops):
+    ExtJsonPatch.from_python(patch_ops, require_decimal=False).apply(json_doc)
+    return json_doc.to_python()
+
+
+def test_slice(json_doc):
+    result = _apply(json_doc, [
+        {"op": "array/slice", "path": "/s1", "value-path": "/arr",
+         "start-path": "/two", "stop": 4},
+        {"op": "array/slice", "path": "/s2", "value-path": "/arr", "start": -2},
+        {"op": "array/slice", "path": "/s3", "value": [1, 2], "stop": 10},
+        {"op": "array/slice", "path": "/s4", "value-path": "/other", "stop": 1},
+    ])
+    assert result["s1"] == [3, 4]
+    assert result["s2"] == [4, 5]
+    assert result["s3"] == [1, 2]
+    # the elements are copied
+    json_doc["s4"][0]["a"] = JsonFactory.from_python(7)
+    assert json_doc["other"][0]["a"] == 1
+
+
+def test_concat_and_extend(json_doc):
+    result = _apply(json_doc, [
+        {"op": "array/concat", "path": "/c", "left-value-path": "/arr",
+         "right-value": [6]},
+        {"op": "array/concat", "path": "/arr", "left-value-path": "/arr",
+         "right-value-path": "/arr"},
+        {"op": "array/extend", "path": "/other", "value-path": "/c"},
+    ])
+    assert result["c"] == [1, 2, 3, 4, 5, 6]
+    assert result["arr"] == [1, 2, 3, 4, 5] * 2
+    assert result["other"] == [{"a": 1}, "x", True, 1, 2, 3, 4, 5, 6]
+    # the array is extended in place, also by itself
+    two = json_doc["two"] = JsonFactory.from_python([1, 2])
+    result = _apply(json_doc, [
+        {"op": "array/extend", "path": "/two", "value-path": "/two"},
+    ])
+    assert json_doc["two"] is two
+    assert result["two"] == [1, 2, 1, 2]
+
+
+def test_reverse(json_doc):
+    result = _apply(json_doc, [
+        {"op": "array/reverse", "path": "/r", "value-path": "/other"},
+        {"op": "array/reverse", "path": "/arr"},
+    ])
+    assert result["r"] == [True, "x", {"a": 1}]
+    assert result["arr"] == [5, 4, 3, 2, 1]
+    assert result["other"] == [{"a": 1}, "x", True]
+
+
+def test_index_of(json_doc):
+    result = _apply(json_doc, [
+        {"op": "array/index-of", "path": "/i1", "array-path": "/arr",
+         "value": 3},
+        {"op": "array/index-of", "path": "/i2", "array-path": "/other",
+         "value": {"a": 1}},
+        {"op": "array/index-of", "path": "/i3", "array-path": "/other",
+         "value": 1},
+        {"op": "array/index-of", "path": "/i4", "array": [1, 2, 1],
+         "value": 1, "start": 1},
+        {"op": "array/index-of", "path": "/i5", "array-path": "/arr",
+         "value-path": "/two", "start": -2},
+    ])
+    assert [result[f"i{i}"] for i in range(1, 6)] == [2, 0, -1, 2, -1]
+
+
+def test_invalid_operands_roll_back(json_doc):
+    orig = json_doc.to_python()
+    patch = ExtJsonPatch.from_python([
+        {"op": "array/reverse", "path": "/arr"},
+        {"op": "array/extend", "path": "/other", "value-path": "/arr"},
+        {"op": "array/slice", "path": "/s", "value-path": "/arr", "start": 0.5},
+    ], require_decimal=False)
+    with pytest.raises(TypeError):
+        with Transaction().begin():
+            patch.apply(json_doc)
+    assert json_doc.to_python() == orig
+    with pytest.raises(TypeError):
+        _apply(json_doc, [{"op": "array/extend", "path": "/two", "value": []}])
+
+
+def test_sort_total_order(json_doc):
+    result = _apply(json_doc, [
+        {"op": "add", "path": "/mixed",
+         "value": ["b", 2, None, True, "a", -1.5, False, 2, "B"]},
+        {"op": "array/sort", "path": "/mixed"},
+        {"op": "array/sort", "path": "/desc", "value-path": "/arr",
+         "descending": True},
+    ])
+    assert result["mixed"] == [None, False, True, -1.5, 2, 2, "B", "a", "b"]
+    assert result["desc"] == [5, 4, 3, 2, 1]
+    assert result["arr"] == [1, 2, 3, 4, 5]
+    with pytest.raises(TypeError):
+        _apply(json_doc, [{"op": "array/sort", "path": "/other"}])
+
+
+def test_sort_by_key_is_stable(json_doc):
+    records = [
+        {"name": "c", "age": 30}, {"name": "a", "age": 25},
+        {"name": "b", "age": 30}, {"name": "d", "age": 25},
+    ]
+    result = _apply(json_doc, [
+        {"op": "add", "path": "/people", "value": records},
+        {"op": "add", "path": "/by", "value": "/age"},
+        {"op": "array/sort", "path": "/sorted", "value-path": "/people",
+         "key-path": "/by"},
+    ])
+    assert [r["name"] for r in result["sorted"]] == ["a", "d", "c", "b"]
+    assert result["people"] == records
+
+
+def test_merge_sorted(json_doc):
+    result = _apply(json_doc, [
+        {"op": "array/merge-sorted", "path": "/m",
+         "left-value": [1, 3, 5, 5], "right-value": [2, 5, 6]},
+        {"op": "array/merge-sorted", "path": "/k", "key": "/v",
+         "left-value": [{"v": 1, "s": "l"}, {"v": 2, "s": "l"}],
+         "right-value": [{"v": 1, "s": "r"}]},
+        {"op": "array/merge-sorted", "path": "/e",
+         "left-value": [], "right-value-path": "/arr"},
+    ])
+    assert result["m"] == [1, 2, 3, 5, 5, 5, 6]
+    assert [r["s"] for r in result["k"]] == ["l", "r", "l"]
+    assert result["e"] == [1, 2, 3, 4, 5]
+
+
+def test_elementwise_number_ops(json_doc):
+    result = _apply(json_doc, [
+        {"op": "copy", "from": "/arr", "path": "/v"},
+        {"op": "number/add", "path": "/v", "elementwise": True,
+         "value-path": "/arr"},
+        {"op": "number/mul", "path": "/v", "elementwise": True, "value": 3},
+        {"op": "copy", "from": "/arr", "path": "/d"},
+        {"op": "number/div", "path": "/d", "elementwise": True, "value": 3},
+        {"op": "copy", "from": "/arr", "path": "/s"},
+        {"op": "number/div", "path": "/s/0", "value": 3},
+    ])
+    assert result["v"] == [6, 12, 18, 24, 30]
+    # same decimal semantics as the scalar operation
+    assert result["d"][0] == result["s"][0]
+    with pytest.raises(ValueError):
+        _apply(json_doc, [{"op": "number/add", "path": "/arr",
+                           "elementwise": True, "value": [1, 2]}])
+    with pytest.raises(TypeError):
+        _apply(json_doc, [{"op": "number/add", "path": "/other",
+                           "elementwise": True, "value": 1}])
+
+
+def test_numeric_reductions(json_doc):
+    result = _apply(json_doc, [
+        {"op": "array/sum", "path": "/sum", "value-path": "/arr"},
+        {"op": "array/sum", "path": "/empty", "value": []},
+        {"op": "array/dot", "path": "/dot", "left-value-path": "/arr",
+         "right-value": [1, 0, -1, 0, 2]},
+        {"op": "array/min", "path": "/min", "value": [3, -1.5, 2]},
+        {"op": "array/max", "path": "/max", "value-path": "/arr"},
+    ])
+    assert result["sum"] == 15
+    assert result["empty"] == 0
+    assert result["dot"] == 8
+    assert result["min"] == -1.5
+    assert result["max"] == 5
+    for op in ({"op": "array/max", "path": "/x", "value": []},
+               {"op": "array/sum", "path": "/x", "value-path": "/other"},
+               {"op": "array/dot", "path": "/x", "left-value": [1],
+                "right-value": []}):
+        with pytest.raises((TypeError, ValueError)):
+            _apply(json_doc, [op])
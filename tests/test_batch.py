@@ -0,0 +1,62 @@
+import pytest
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.batch import (
+    BatchRunner,
+    apply_many,
+)
+
+
+@pytest.fixture(scope="module")
+def patch():
+    return ExtJsonPatch.from_python([
+        {"op": "number/add", "path": "/count", "value": 1},
+        {"op": "add", "path": "/tags/-", "value": "seen"},
+        {"op": "test", "path": "/count", "value": 100},
+    ], require_decimal=False)
+
+
+def _make_docs(num_docs):
+    return [
+        JsonFactory.from_python(
+            {"count": 99 if i % 4 == 0 else i, "tags": []},
+            require_decimal=False
+        )
+        for i in range(num_docs)
+    ]
+
+
+@pytest.mark.parametrize("executor", ["serial", "thread", "process"])
+def test_executors_agree(patch, executor):
+    docs = _make_docs(20)
+    results = list(apply_many(
+        patch, docs, executor=executor, max_workers=2, chunksize=3, atomic=True
+    ))
+    assert [r.index for r in results] == list(range(20))
+    for result in results:
+        orig = 99 if result.index % 4 == 0 else result.index
+        if result.index % 4 == 0:
+            assert result.ok
+            assert result.doc.to_python() == {"count": 100, "tags": ["seen"]}
+        else:
+            assert isinstance(result.error, ValueError)
+            # rolled back, as the application is atomic
+            assert result.doc.to_python() == {"count": orig, "tags": []}
+
+
+def test_unordered_streaming(patch):
+    docs = (doc for doc in _make_docs(50))
+    with BatchRunner(patch, "thread", max_workers=3) as runner:
+        results = list(runner.apply_many(docs, ordered=False))
+        # the pool can be reused
+        more_results = list(runner.apply_many(_make_docs(5)))
+    assert sorted(r.index for r in results) == list(range(50))
+    assert sum(r.ok for r in results) == 13
+    assert len(more_results) == 5
+
+
+def test_invalid_arguments(patch):
+    with pytest.raises(ValueError):
+        BatchRunner(patch, "cluster")
+    with pytest.raises(ValueError):
+        BatchRunner(patch, chunksize=0)
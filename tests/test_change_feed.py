@@ -0,0 +1,151 @@
+import pytest
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.change_feed import ChangeFeed
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "a": 5,
+        "b": [1, 2, 3],
+        "c": {"u": "cu", "v": [6, {"x": 8}]},
+        "records": {"r1": {"count": 1}, "r2": {"count": 2}},
+        "func": [
+            {"op": "add", "path": "/out", "value": 0},
+            {"op": "number/add", "path": "/out", "value-path": "/inp/x"},
+            {"op": "add", "path": "/tmp", "value": [1, 2, 3]},
+            {"op": "number/add", "path": "/out", "value-path": "/inp/y"},
+        ],
+    }, require_decimal=False)
+
+
+def _record(patch_ops, json_doc):
+    orig_doc = deepcopy(json_doc)
+    ext_patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    net_patch = ext_patch.apply_and_record(json_doc)
+    # the net patch must reproduce the final state
+    replica = deepcopy(orig_doc)
+    net_patch.apply(replica)
+    assert replica == json_doc
+    return sorted(net_patch.to_python(), key=lambda op: op['path'])
+
+
+def test_scratch_writes_are_collapsed(json_doc):
+    net_ops = _record([
+        {"op": "add", "path": "/scratch", "value": {"big": list(range(50))}},
+        {"op": "number/add", "path": "/a", "value": 1},
+        {"op": "copy", "from": "/scratch/big/3", "path": "/c/u"},
+        {"op": "remove", "path": "/scratch"},
+    ], json_doc)
+    assert net_ops == [
+        {"op": "replace", "path": "/a", "value": 6},
+        {"op": "replace", "path": "/c/u", "value": 3},
+    ]
+
+
+def test_unchanged_values_are_not_emitted(json_doc):
+    net_ops = _record([
+        {"op": "number/add", "path": "/a", "value": 1},
+        {"op": "number/add", "path": "/a", "value": -1},
+        {"op": "add", "path": "/b/0", "value": 0},
+        {"op": "remove", "path": "/b/0"},
+    ], json_doc)
+    assert net_ops == []
+
+
+def test_array_changes(json_doc):
+    net_ops = _record([
+        {"op": "add", "path": "/b/-", "value": 4},
+        {"op": "add", "path": "/b/0", "value": 0},
+        {"op": "number/mul", "path": "/c/v/0", "value": 2},
+        {"op": "add", "path": "/c/v/1/y", "value": 9},
+    ], json_doc)
+    assert net_ops == [
+        {"op": "add", "path": "/b/0", "value": 0},
+        {"op": "add", "path": "/b/3", "value": 4},
+        {"op": "replace", "path": "/c/v/0", "value": 12},
+        {"op": "add", "path": "/c/v/1/y", "value": 9},
+    ]
+
+
+def test_nested_scopes(json_doc):
+    net_ops = _record([
+        {
+            "op": "ctrl/apply-patch",
+            "path": "/records/r2",
+            "patch": [
+                {"op": "number/add", "path": "/count", "value": 10},
+                {"op": "add", "path": "/tmp", "value": True},
+                {"op": "remove", "path": "/tmp"},
+            ],
+        },
+    ], json_doc)
+    assert net_ops == [
+        {"op": "replace", "path": "/records/r2/count", "value": 12},
+    ]
+
+
+def test_call_func_scratch_document_is_ignored(json_doc):
+    net_ops = _record([
+        {
+            "op": "ctrl/call-func",
+            "patch-path": "/func",
+            "x": 5,
+            "y-path": "/a",
+            "out-path": "/result",
+        },
+    ], json_doc)
+    assert net_ops == [{"op": "add", "path": "/result", "value": 10}]
+
+
+def test_loops(json_doc):
+    _record([
+        {"op": "add", "path": "/sum", "value": 0},
+        {
+            "op": "ctrl/for-loop",
+            "path": "",
+            "start-value": 0,
+            "stop-value": 10,
+            "counter-path": "/i",
+            "patch": [
+                {"op": "number/add", "path": "/sum", "value-path": "/i"},
+                {"op": "add", "path": "/b/-", "value-path": "/i"},
+            ],
+        },
+    ], json_doc)
+
+
+def test_for_each_writes_via_item(json_doc):
+    json_doc["arr"] = JsonFactory.from_python([{"x": 1}, {"x": 2}])
+    net_ops = _record([
+        {"op": "ctrl/for-each", "path": "", "array-path": "/arr",
+         "item-path": "/it", "patch": [
+             {"op": "add", "path": "/it/y", "value": 0},
+         ]},
+        {"op": "ctrl/for-each", "path": "/records", "array-path": "/c/v",
+         "start": 1, "item-path": "/records/it", "patch": [
+             {"op": "number/add", "path": "/it/x", "value": 1},
+         ]},
+    ], json_doc)
+    assert net_ops == [
+        {"op": "add", "path": "/arr/0/y", "value": 0},
+        {"op": "add", "path": "/arr/1/y", "value": 0},
+        {"op": "replace", "path": "/c/v/1/x", "value": 9},
+    ]
+
+
+def test_explicit_tracking(json_doc):
+    ext_patch = ExtJsonPatch.from_python([
+        {"op": "remove", "path": "/c/v/1"},
+        {"op": "move", "from": "/a", "path": "/records/r1/a"},
+    ], require_decimal=False)
+    change_feed = ChangeFeed(json_doc)
+    with change_feed.track():
+        ext_patch.apply(json_doc)
+    assert change_feed.to_patch().to_python() == [
+        {"op": "remove", "path": "/a"},
+        {"op": "remove", "path": "/c/v/1"},
+        {"op": "add", "path": "/records/r1/a", "value": 5},
+    ]
@@ -0,0 +1,76 @@
+import io
+import json
+import pytest
+from jotvm.cli import main
+
+
+PATCH = [
+    {"op": "number/mul", "path": "/x", "value-path": "/x"},
+    {"op": "add", "path": "/done", "value": True},
+]
+
+
+@pytest.fixture
+def patch_file(tmp_path):
+    path = tmp_path / "patch.json"
+    path.write_text(json.dumps(PATCH))
+    return str(path)
+
+
+def _lines(nums):
+    return "".join(json.dumps({"x": num}) + "\n" for num in nums)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_documents_are_streamed_in_order(jobs, patch_file, tmp_path, capsys):
+    inputs = tmp_path / "docs.jsonl"
+    inputs.write_text(_lines(range(50)) + "\n")
+    status = main([
+        "-p", patch_file, "-j", str(jobs), "--chunksize", "3", str(inputs)
+    ])
+    assert status == 0
+    outputs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert outputs == [{"x": num * num, "done": True} for num in range(50)]
+
+
+def test_bundle_function_from_stdin(tmp_path, monkeypatch, capsys):
+    bundle = tmp_path / "bundle.json"
+    bundle.write_text(json.dumps({
+        "square": [
+            {"op": "copy", "from": "/inp/x", "path": "/out"},
+            {"op": "number/mul", "path": "/out", "value-path": "/inp/x"},
+        ],
+        # calls the other function of the bundle via `/req`
+        "inc-square": [
+            {"op": "ctrl/call-func", "patch-path": "/req/square",
+             "x-path": "/inp/x", "out-path": "/out"},
+            {"op": "number/add", "path": "/out", "value": 1},
+        ],
+    }))
+    monkeypatch.setattr("sys.stdin", io.StringIO(_lines([2, 3])))
+    assert main(["-b", str(bundle), "-f", "inc-square", "--stats"]) == 0
+    captured = capsys.readouterr()
+    assert captured.out == "5\n10\n"
+    assert "documents: 2  failed: 0" in captured.err
+    assert "p99" in captured.err
+
+
+def test_failures_are_reported(patch_file, tmp_path, capsys):
+    inputs = tmp_path / "docs.jsonl"
+    inputs.write_text('{"x": 2}\n{"y": 1}\nnot json\n{"x": 3}\n')
+    assert main(["-p", patch_file, str(inputs)]) == 1
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        '{"x":4,"done":true}', '{"x":9,"done":true}'
+    ]
+    errors = captured.err.splitlines()
+    assert len(errors) == 2
+    assert errors[0].startswith(f"{inputs}:2: ")
+    assert errors[1].startswith(f"{inputs}:3: ")
+
+
+def test_usage_errors(patch_file, tmp_path):
+    with pytest.raises(SystemExit):
+        main(["-b", patch_file])
+    with pytest.raises(SystemExit):
+        main(["-p", str(tmp_path / "missing.json")])
@@ -0,0 +1,88 @@
+import pytest
+import pickle
+from copy import deepcopy
+from decimal import Decimal
+from jotvm.json_diff import JsonDiff
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.compact_array import (
+    CompactNumberArray,
+    compact_arrays,
+)
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json.json_types import JsonArray
+from jotvm.transaction import Transaction
+
+
+PRICES = [Decimal("1.50"), Decimal("-2.00"), Decimal("0.00"), Decimal("10.25")]
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "ints": list(range(20)),
+        "prices": PRICES,
+        "mixed": [Decimal("1.5"), Decimal("2")],
+        "nested": [{"v": list(range(3))}],
+    })
+
+
+def _apply(json_doc, patch_ops):
+    ExtJsonPatch.from_python(patch_ops, require_decimal=False).apply(json_doc)
+
+
+def test_packing_keeps_representation(json_doc):
+    plain = deepcopy(json_doc)
+    json_doc = compact_arrays(json_doc, min_length=3)
+    assert isinstance(json_doc["ints"], CompactNumberArray)
+    assert isinstance(json_doc["prices"], CompactNumberArray)
+    assert isinstance(json_doc["nested"][0]["v"], CompactNumberArray)
+    # different exponents are not packed
+    assert type(json_doc["mixed"]) is JsonArray
+    assert json_doc.to_json() == plain.to_json()
+    assert json_doc == plain and plain == json_doc
+    assert json_doc["prices"].to_python() == PRICES
+    diff = JsonDiff()
+    assert diff.content_hash(json_doc) == diff.content_hash(plain)
+    assert json_doc["prices"].is_packed and json_doc["ints"].is_packed
+    for values in ([Decimal("-0")], [10**18], ["1"], []):
+        values = JsonFactory.from_python(values)
+        assert CompactNumberArray.from_numbers(values.value) is None
+
+
+def test_elements_are_boxed_on_access(json_doc):
+    json_doc = compact_arrays(json_doc, min_length=3)
+    _apply(json_doc, [
+        {"op": "copy", "from": "/prices/3", "path": "/p"},
+        {"op": "number/add", "path": "/prices/0", "value": Decimal("0.25")},
+        {"op": "remove", "path": "/ints/0"},
+        {"op": "add", "path": "/ints/-", "value": 20},
+        {"op": "array/sum", "path": "/sum", "value-path": "/ints"},
+    ])
+    assert json_doc["p"].to_json() == "10.25"
+    assert json_doc["prices"].is_packed and json_doc["ints"].is_packed
+    assert json_doc["prices"][0].to_json() == "1.75"
+    assert json_doc["ints"].to_python() == list(range(1, 21))
+    assert json_doc["sum"] == 210
+    # a number with another exponent unpacks the array
+    _apply(json_doc, [
+        {"op": "number/add", "path": "/prices/1", "value": Decimal("0.001")},
+    ])
+    assert not json_doc["prices"].is_packed
+    assert json_doc["prices"].to_json() == "[1.75,-1.999,0.00,10.25]"
+
+
+def test_rollback_and_copies(json_doc):
+    json_doc = compact_arrays(json_doc, min_length=3)
+    original = deepcopy(json_doc)
+    assert isinstance(original["ints"], CompactNumberArray)
+    with pytest.raises(Exception):
+        with Transaction().begin():
+            _apply(json_doc, [
+                {"op": "remove", "path": "/ints/5"},
+                {"op": "replace", "path": "/ints/0", "value": -1},
+                {"op": "test", "path": "/ints/0", "value": 0},
+            ])
+    assert json_doc == original
+    assert json_doc["ints"].is_packed
+    copy = pickle.loads(pickle.dumps(json_doc))
+    assert copy == original and copy["ints"].is_packed
@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from jotvm.context import (
+    ExecutionContext,
+    ExecutionLimitExceeded,
+)
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+def _make_doc(num):
+    return JsonFactory.from_python({
+        "num": num,
+        "total": 0,
+        "func": [
+            {"op": "copy", "from": "/inp/x", "path": "/out"},
+            {"op": "number/mul", "path": "/out", "value-path": "/inp/x"},
+        ],
+    }, require_decimal=False)
+
+
+@pytest.fixture(scope="module")
+def patch():
+    # sums up the squares of 1..num
+    return ExtJsonPatch.from_python([
+        {"op": "add", "path": "/i", "value": 0},
+        {"op": "ctrl/for-loop", "path": "", "start-value": 1,
+         "stop-value-path": "/num", "counter-path": "/i", "patch": [
+            {"op": "ctrl/call-func", "patch-path": "/func",
+             "x-path": "/i", "out-path": "/sq"},
+            {"op": "number/add", "path": "/total", "value-path": "/sq"},
+        ]},
+    ], require_decimal=False)
+
+
+def test_nested_patches_are_compiled_once(patch):
+    context = ExecutionContext()
+    json_doc = _make_doc(10)
+    patch.apply(json_doc, context=context)
+    assert json_doc["total"] == 385
+    stats = context.stats()
+    # outer loop body and the called function
+    assert stats["compiled-patches"] == 2
+    assert stats["cache-hits"] == 9
+    # 2 top-level, 2 per iteration, 2 per call
+    assert stats["ops"] == 2 + 10 * 2 + 10 * 2
+
+
+def test_compiled_patches_are_found_by_identity(monkeypatch):
+    from jotvm.json.json_types import JsonArray
+    context = ExecutionContext()
+    patch_ops = JsonFactory.from_python([
+        {"op": "add", "path": "/a", "value": 1},
+    ])
+    compiled = context.compile(patch_ops)
+    num_serialized = []
+    to_json = JsonArray.to_json
+    monkeypatch.setattr(JsonArray, "to_json", lambda self, *args: (
+        num_serialized.append(1) or to_json(self, *args)
+    ))
+    assert context.compile(patch_ops) is compiled
+    assert not num_serialized
+    # an equal array is found by its content
+    assert context.compile(deepcopy(patch_ops)) is compiled
+    assert len(num_serialized) == 1
+    patch_ops.append(JsonFactory.from_python(
+        {"op": "add", "path": "/b", "value": 2}
+    ))
+    assert context.compile(patch_ops) is not compiled
+    assert context.stats()["compiled-patches"] == 2
+
+
+def test_operation_limit(patch):
+    json_doc = _make_doc(10)
+    with pytest.raises(ExecutionLimitExceeded):
+        patch.apply(json_doc, context=ExecutionContext(max_ops=30))
+    patch.apply(_make_doc(10), context=ExecutionContext(max_ops=42))
+
+
+def test_tracing_and_hooks_are_per_context(patch, capsys):
+    messages = []
+    ops = []
+    context = ExecutionContext(
+        debug=True, output=messages.append,
+        hooks=[lambda op, json_doc: ops.append(op.get_op_name())]
+    )
+    patch.apply(_make_doc(2), context=context)
+    patch.apply(_make_doc(2))
+    assert capsys.readouterr().out == ''
+    assert any('ctrl/call-func' in str(m) for m in messages)
+    assert ops[:3] == ['add', 'ctrl/for-loop', 'ctrl/call-func']
+    assert len(ops) == context.stats()["ops"]
+
+
+def test_concurrent_interpreters(patch):
+    shared_context = ExecutionContext()
+
+    def run(num):
+        own_context = ExecutionContext()
+        json_doc = _make_doc(num)
+        patch.apply(json_doc, context=own_context)
+        other_doc = _make_doc(num)
+        patch.apply(other_doc, context=shared_context)
+        assert json_doc == other_doc
+        return json_doc["total"].to_python(), own_context.stats()["ops"]
+
+    nums = [n % 13 + 1 for n in range(64)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(run, nums))
+    for num, (total, num_ops) in zip(nums, results):
+        assert total == num * (num + 1) * (2 * num + 1) // 6
+        assert num_ops == 2 + 4 * num
+    stats = shared_context.stats()
+    assert stats["ops"] == sum(num_ops for _, num_ops in results)
+    assert stats["compiled-patches"] >= 2
+
+
+@pytest.mark.skipif(
+    getattr(sys, '_is_gil_enabled', lambda: True)()
+    or (os.cpu_count() or 1) < 4,
+    reason='requires a free-threaded build and at least four cores'
+)
+def test_interpreters_scale_across_cores(patch):
+    docs = [_make_doc(200) for _ in range(8)]
+
+    def run(json_doc):
+        patch.apply(json_doc, context=ExecutionContext())
+
+    start = time.perf_counter()
+    for json_doc in deepcopy(docs):
+        run(json_doc)
+    serial = time.perf_counter() - start
+    with ThreadPoolExecutor(4) as executor:
+        start = time.perf_counter()
+        list(executor.map(run, deepcopy(docs)))
+        threaded = time.perf_counter() - start
+    assert serial / threaded > 2
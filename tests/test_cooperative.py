@@ -0,0 +1,105 @@
+import asyncio
+import time
+import pytest
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json.json_link import JsonLink
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "loop": {"i": 0, "cont": True, "total": 0},
+    }, require_decimal=False)
+
+
+def _counting_patch(num_iterations):
+    return ExtJsonPatch.from_python([
+        {"op": "ctrl/while-loop", "path": "/loop", "check-path": "/loop/cont",
+         "patch": [
+            {"op": "number/add", "path": "/i", "value": 1},
+            {"op": "number/add", "path": "/total", "value-path": "/i"},
+            {"op": "number/greater", "path": "/cont",
+             "left-value": num_iterations, "right-value-path": "/i"},
+         ]},
+    ], require_decimal=False)
+
+
+def test_same_result_as_sync(json_doc):
+    patch = _counting_patch(50)
+    expected_doc = deepcopy(json_doc)
+    patch.apply(expected_doc)
+    asyncio.run(patch.apply_async(json_doc, yield_every=7))
+    assert json_doc == expected_doc
+    assert json_doc["loop"]["total"] == 50 * 51 // 2
+
+
+def test_event_loop_stays_responsive(json_doc):
+    patch = _counting_patch(3000)
+
+    async def main():
+        gaps = []
+        done = False
+
+        async def ticker():
+            last = time.perf_counter()
+            while not done:
+                await asyncio.sleep(0)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        task = asyncio.ensure_future(ticker())
+        start = time.perf_counter()
+        await patch.apply_async(json_doc, yield_every=10**6, time_slice=0.002)
+        elapsed = time.perf_counter() - start
+        done = True
+        await task
+        return elapsed, gaps
+
+    elapsed, gaps = asyncio.run(main())
+    assert len(gaps) > 10
+    assert max(gaps) < elapsed / 5
+
+
+def test_cancellation_rolls_back(json_doc):
+    patch = _counting_patch(10**6)
+    orig_doc = deepcopy(json_doc)
+
+    async def main():
+        task = asyncio.ensure_future(
+            patch.apply_async(json_doc, atomic=True, yield_every=50)
+        )
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert json_doc == orig_doc
+
+
+def test_links_are_resolved(json_doc):
+    json_doc["remote"] = JsonLink("lib")
+    json_doc["other"] = JsonLink("lib")
+    store = {"lib": {"step": 5, "items": [1]}}
+    fetched = []
+
+    async def resolver(link):
+        fetched.append(link.target)
+        await asyncio.sleep(0)
+        return JsonFactory.from_python(store[link.target], require_decimal=False)
+
+    patch = ExtJsonPatch.from_python([
+        {"op": "number/add", "path": "/loop/total", "value-path": "/remote/step"},
+        {"op": "add", "path": "/other/items/-", "value": 2},
+        {"op": "ctrl/apply-patch", "path": "/remote", "patch": [
+            {"op": "add", "path": "/items/-", "value-path": "/step"},
+        ]},
+    ], require_decimal=False)
+    asyncio.run(patch.apply_async(json_doc, resolver=resolver))
+    assert fetched == ["lib"]
+    assert json_doc.to_python()["loop"]["total"] == 5
+    assert json_doc["remote"]["items"].to_python() == [1, 5]
+    assert json_doc["other"]["items"].to_python() == [1, 2]
@@ -0,0 +1,149 @@
+import json
+import os
+import socket
+import urllib.error
+import urllib.request
+import pytest
+from jotvm.daemon import (
+    DaemonClient,
+    DaemonError,
+    EvaluationDaemon,
+)
+from jotvm.json.json_factory import JsonFactory
+
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="requires Unix sockets"
+)
+
+
+BUNDLE = {
+    "square": [
+        {"op": "copy", "from": "/inp/x", "path": "/out"},
+        {"op": "number/mul", "path": "/out", "value-path": "/inp/x"},
+    ],
+    # calls the other function of the bundle via `/req`
+    "sum-squares": [
+        {"op": "add", "path": "/out", "value": 0},
+        {"op": "ctrl/for-loop", "path": "", "start-value": 1,
+         "stop-value-path": "/inp/n", "counter-path": "/i", "patch": [
+            {"op": "ctrl/call-func", "patch-path": "/req/square",
+             "x-path": "/i", "out-path": "/sq"},
+            {"op": "number/add", "path": "/out", "value-path": "/sq"},
+         ]},
+    ],
+}
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    daemon = EvaluationDaemon()
+    daemon.start(str(tmp_path / "jotvm.sock"), ("127.0.0.1", 0))
+    yield daemon
+    daemon.shutdown()
+
+
+@pytest.fixture
+def client(daemon, tmp_path):
+    with DaemonClient(str(tmp_path / "jotvm.sock")) as client:
+        yield client
+
+
+def test_bundle_functions_are_compiled_once(daemon, client):
+    key = client.register(BUNDLE)
+    assert client.register(dict(reversed(BUNDLE.items()))) == key
+    for num in range(1, 6):
+        total = client.apply({"n": num}, bundle=key, function="sum-squares")
+        assert total == num * (num + 1) * (2 * num + 1) // 6
+    assert client.apply({"x": 4}, bundle=key, function="square") == 16
+    stats = client.stats()
+    assert stats["bundles"] == 1
+    assert stats["bundle-hits"] == 4
+    # the called function is compiled once as well
+    assert stats["compiled-patches"] == 2
+    assert stats["requests"] == 8
+    assert stats["latency-p50"] > 0
+
+
+def test_functions_get_a_copy_of_the_bundle(client):
+    bundle = dict(BUNDLE, clear=[
+        {"op": "remove", "path": "/req/square/1"},
+        {"op": "ctrl/call-func", "patch-path": "/req/square",
+         "x-path": "/inp/x", "out-path": "/out"},
+    ])
+    key = client.register(bundle)
+    assert client.apply({"x": 3}, bundle=key, function="clear") == 3
+    assert client.apply({"x": 3}, bundle=key, function="square") == 9
+
+
+def test_errors_are_reported(client):
+    with pytest.raises(DaemonError, match="Unknown bundle"):
+        client.apply({"x": 1}, bundle="0" * 32, function="square")
+    with pytest.raises(DaemonError, match="Unknown method"):
+        client.request("compile")
+    failing = [{"op": "remove", "path": "/missing"}]
+    with pytest.raises(DaemonError):
+        client.apply({"x": 1}, patch=failing)
+    # the connection is still usable
+    patch = [{"op": "add", "path": "/y", "value": 2}]
+    assert client.apply({"x": 1}, patch=patch).to_python() == {"x": 1, "y": 2}
+    assert client.stats()["errors"] == 3
+
+
+def test_http_requests(daemon):
+    request = {
+        "method": "apply", "id": "r1", "doc": {"x": 3},
+        "patch": [{"op": "number/add", "path": "/x", "value": 1}],
+    }
+    response = _post(daemon, json.dumps(request).encode())
+    response = JsonFactory.from_json(response.read().decode())
+    assert response["ok"].to_python() is True
+    assert response["id"] == "r1"
+    assert response["doc"].to_python() == {"x": 4}
+    assert response["latency"] >= 0
+
+
+def _post(daemon, body, content_type="application/json", **headers):
+    host, port = daemon.http_address
+    return urllib.request.urlopen(urllib.request.Request(
+        f"http://{host}:{port}/", data=body, method="POST",
+        headers=dict(headers, **{"Content-Type": content_type}),
+    ))
+
+
+@pytest.mark.parametrize("kwargs, status", [
+    ({"content_type": "text/plain"}, 415),
+    ({"Origin": "http://example.com"}, 403),
+    ({"body": b"[" * 2000}, 413),
+])
+def test_http_requests_are_restricted(kwargs, status):
+    daemon = EvaluationDaemon(max_request_size=1000)
+    daemon.start(http_address=("127.0.0.1", 0))
+    try:
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            _post(daemon, **dict({"body": b'{"method": "stats"}'}, **kwargs))
+        assert exc_info.value.code == status
+        assert daemon.num_requests == 0
+    finally:
+        daemon.shutdown()
+
+
+def test_socket_is_private(daemon, tmp_path):
+    assert os.stat(tmp_path / "jotvm.sock").st_mode & 0o777 == 0o600
+
+
+def test_operations_are_limited_per_request(tmp_path):
+    daemon = EvaluationDaemon(max_ops=50)
+    daemon.start(str(tmp_path / "jotvm.sock"))
+    try:
+        with DaemonClient(str(tmp_path / "jotvm.sock")) as client:
+            key = client.register(BUNDLE)
+            # 2 operations and 4 per iteration, the limit is per request
+            for _ in range(3):
+                assert client.apply(
+                    {"n": 10}, bundle=key, function="sum-squares"
+                ) == 385
+            with pytest.raises(DaemonError, match="ExecutionLimitExceeded"):
+                client.apply({"n": 20}, bundle=key, function="sum-squares")
+    finally:
+        daemon.shutdown()
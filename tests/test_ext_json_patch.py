@@ -295,6 +295,60 @@ def test_for_loop():
     assert json_doc['val'] == 55
 
 
+def test_for_each():
+    json_doc = {'arr': [1, 2, 3, 4, 5], 'scope': {'val': 0, 'i': 'keep'}}
+    patch_ops = [
+        {
+            'op': 'ctrl/for-each',
+            'path': '/scope',
+            'array-path': '/arr',
+            'start': 1,
+            'stop': -1,
+            'item-path': '/scope/x',
+            'index-path': '/scope/i',
+            'patch': [
+                {'op': 'number/add', 'path': '/val', 'value-path': '/x'},
+                {'op': 'number/add', 'path': '/val', 'value-path': '/i'},
+            ]
+        },
+    ]
+    ext_patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    json_doc = JsonFactory.from_python(json_doc, require_decimal=False)
+    ext_patch.apply(json_doc)
+    # elements 2, 3, 4 at indices 1, 2, 3
+    assert json_doc['scope'].to_python() == {'val': 15, 'i': 'keep'}
+    assert json_doc['arr'] == [1, 2, 3, 4, 5]
+
+
+def test_for_each_binds_elements_by_reference():
+    json_doc = {'arr': [{'v': 1}, {'v': 2}], 'tmp': [0]}
+    patch_ops = [
+        {
+            'op': 'ctrl/for-each',
+            'path': '',
+            'array-path': '/arr',
+            'item-path': '/tmp/0',
+            'patch': [
+                {'op': 'number/mul', 'path': '/tmp/0/v', 'value': 10},
+                # appending to the array does not extend the iteration
+                {'op': 'add', 'path': '/arr/-', 'value': {'v': 0}},
+            ]
+        },
+    ]
+    ext_patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    json_doc = JsonFactory.from_python(json_doc, require_decimal=False)
+    ext_patch.apply(json_doc)
+    assert json_doc.to_python() == {
+        'arr': [{'v': 10}, {'v': 20}, {'v': 0}, {'v': 0}], 'tmp': [0],
+    }
+    original_doc = deepcopy(json_doc)
+    patch_ops[0]['patch'].append({'op': 'test', 'path': '/tmp', 'value': []})
+    ext_patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    with pytest.raises(Exception):
+        ext_patch.apply(json_doc, atomic=True)
+    assert json_doc == original_doc
+
+
 def test_path_ops():
     json_doc = {'arr': [1, 2, 3]}
     json_patch = [
@@ -354,6 +408,106 @@ def test_path_ops():
     assert json_doc['arr'] == [3, 6, 9]
 
 
+def test_pointer_segments():
+    json_doc = {'arr': [1, 2, 3], 'n': 2, 'i': 0, 'key': 'a/b', 'out': {}}
+    json_patch = [
+        {
+            'op': 'ctrl/for-loop',
+            'path': '',
+            'start-value': 0,
+            'stop-value-path': '/n',
+            'counter-path': '/i',
+            'patch': [
+                {
+                    'op': 'number/mul',
+                    'path-segments': ['arr', {'value-path': '/i'}],
+                    'value': 3,
+                },
+            ]
+        },
+        {
+            'op': 'copy',
+            'from-segments': ['arr', -1],
+            'path-segments': ['out', {'value-path': '/key'}],
+        },
+        {
+            'op': 'number/add',
+            'path': '/n',
+            'value-path-segments': ['arr', {'value': 0}],
+        },
+    ]
+    ext_patch = ExtJsonPatch.from_python(json_patch, require_decimal=False)
+    json_doc = JsonFactory.from_python(json_doc, require_decimal=False)
+    ext_patch.apply(json_doc)
+    assert json_doc['arr'] == [3, 6, 9]
+    assert json_doc['out'].to_python() == {'a/b': 9}
+    assert json_doc['n'] == 5
+    # the fields of the operations are not changed
+    assert ext_patch.to_python() == json_patch
+
+    # segments of function arguments
+    json_doc['f'] = JsonFactory.from_python([
+        {'op': 'copy', 'from': '/inp/x', 'path': '/out'},
+    ])
+    json_doc['i'] = JsonFactory.from_python(1)
+    ExtJsonPatch.from_python([
+        {
+            'op': 'ctrl/call-func',
+            'patch-path': '/f',
+            'x-path-segments': ['arr', {'value-path': '/i'}],
+            'out-path': '/b',
+        },
+        {
+            'op': 'ctrl/map-func',
+            'patch-path-segments': [{'value': 'f'}],
+            'array-path-segments': ['arr'],
+            'out-path-segments': ['out', {'value-path': '/key'}],
+        },
+    ], require_decimal=False).apply(json_doc)
+    assert json_doc['b'] == 6
+    assert json_doc['out'].to_python() == {'a/b': [3, 6, 9]}
+
+    with pytest.raises(TypeError):
+        ExtJsonPatch.from_python([
+            {'op': 'remove', 'path-segments': ['arr', {'value-path': '/out'}]},
+        ], require_decimal=False).apply(json_doc)
+    with pytest.raises(ValueError):
+        ExtJsonPatch.from_python([
+            {'op': 'remove', 'path': '/arr', 'path-segments': ['arr']},
+        ], require_decimal=False)
+
+
+def test_pointer_segments_are_not_encoded(monkeypatch):
+    from jotvm.json_pointer import JsonPointer, _parse
+    json_doc = JsonFactory.from_python({'arr': [1, 2, 3], 'i': 0})
+    ext_patch = ExtJsonPatch.from_python([
+        {
+            'op': 'ctrl/for-loop',
+            'path': '',
+            'start-value': 0,
+            'stop-value': 2,
+            'counter-path': '/i',
+            'patch': [
+                {
+                    'op': 'number/add',
+                    'path-segments': ['arr', {'value-path': '/i'}],
+                    'value-path-segments': ['arr', {'value-path': '/i'}],
+                },
+            ]
+        },
+    ], require_decimal=False)
+    ext_patch.apply(deepcopy(json_doc))
+    encoded = []
+    monkeypatch.setattr(
+        JsonPointer, '__str__', lambda self: encoded.append(self) or ''
+    )
+    misses = _parse.cache_info().misses
+    ext_patch.apply(json_doc)
+    assert json_doc['arr'] == [2, 4, 6]
+    assert encoded == []
+    assert _parse.cache_info().misses == misses
+
+
 def test_patch_to_dict_translation(example_json_patch):
     json_patch = ExtJsonPatch.from_python(
         example_json_patch, require_decimal=False
@@ -0,0 +1,145 @@
+import pytest
+import random
+from decimal import Decimal
+from copy import deepcopy
+from jotvm.json_patch import JsonPatch
+from jotvm.json_diff import JsonDiff
+from jotvm.json.json_factory import JsonFactory
+
+
+def _assert_roundtrip(old, new, **options):
+    old = JsonFactory.from_python(old, require_decimal=False)
+    new = JsonFactory.from_python(new, require_decimal=False)
+    patch = JsonPatch.from_diff(old, new, **options)
+    result = deepcopy(old)
+    patch.apply(result)
+    differ = JsonDiff()
+    assert differ.content_hash(result) == differ.content_hash(new)
+    return patch.to_python()
+
+
+def test_identical_documents():
+    doc = {'a': [1, 2, {'b': 'c'}], 'd': None}
+    assert _assert_roundtrip(doc, deepcopy(doc)) == []
+
+
+def test_object_changes():
+    ops = _assert_roundtrip(
+        {'a': 1, 'b': {'c': 2, 'd': 3}, 'x': True},
+        {'a': 1, 'b': {'c': 5, 'd': 3}, 'y': 'new'},
+    )
+    assert {'op': 'replace', 'path': '/b/c', 'value': 5} in ops
+    assert {'op': 'remove', 'path': '/x'} in ops
+    assert {'op': 'add', 'path': '/y', 'value': 'new'} in ops
+    assert len(ops) == 3
+
+
+def test_renamed_key_becomes_move():
+    ops = _assert_roundtrip(
+        {'old/name': {'big': list(range(20))}},
+        {'new~name': {'big': list(range(20))}},
+    )
+    assert ops == [{'op': 'move', 'from': '/old~1name', 'path': '/new~0name'}]
+
+
+def test_array_insert_and_delete():
+    ops = _assert_roundtrip(
+        {'arr': list(range(100))},
+        {'arr': [-1] + list(range(50)) + list(range(51, 100)) + [100]},
+    )
+    assert len(ops) == 3
+
+
+def test_array_move():
+    ops = _assert_roundtrip(
+        {'arr': [{'id': i} for i in range(10)]},
+        {'arr': [{'id': i} for i in range(1, 10)] + [{'id': 0}]},
+    )
+    assert ops == [{'op': 'move', 'from': '/arr/0', 'path': '/arr/9'}]
+
+
+def test_array_element_changed_in_place():
+    ops = _assert_roundtrip(
+        {'arr': [{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'b'}]},
+        {'arr': [{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'c'}]},
+    )
+    assert ops == [{'op': 'replace', 'path': '/arr/1/v', 'value': 'c'}]
+
+
+def test_number_representation_is_preserved():
+    ops = _assert_roundtrip({'a': Decimal('1')}, {'a': Decimal('1.0')})
+    assert len(ops) == 1
+
+
+def test_edit_distance_limit():
+    old = {'arr': list(range(50))}
+    new = {'arr': list(reversed(range(50)))}
+    _assert_roundtrip(old, new, max_edit_distance=3)
+    _assert_roundtrip(old, new, max_edit_distance=3, detect_moves=False)
+
+
+def _random_value(rng, depth=0):
+    kind = rng.randrange(6 if depth < 3 else 4)
+    if kind == 0:
+        return rng.randrange(5)
+    elif kind == 1:
+        return rng.choice(['a', 'b', 'c'])
+    elif kind == 2:
+        return rng.choice([True, False, None])
+    elif kind == 3:
+        return rng.randrange(3) / 2
+    elif kind == 4:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randrange(6))]
+    return {
+        rng.choice('pqrst'): _random_value(rng, depth + 1)
+        for _ in range(rng.randrange(5))
+    }
+
+
+def _mutate(rng, value, depth=0):
+    if isinstance(value, list):
+        value = [_mutate(rng, v, depth + 1) for v in value]
+        for _ in range(rng.randrange(3)):
+            action = rng.randrange(3)
+            if action == 0 or not value:
+                value.insert(rng.randrange(len(value) + 1), _random_value(rng, depth))
+            elif action == 1:
+                del value[rng.randrange(len(value))]
+            else:
+                value.insert(rng.randrange(len(value)), value.pop(rng.randrange(len(value))))
+        return value
+    elif isinstance(value, dict):
+        value = {k: _mutate(rng, v, depth + 1) for k, v in value.items()}
+        if rng.random() < 0.3:
+            value[rng.choice('pqrst')] = _random_value(rng, depth)
+        if value and rng.random() < 0.3:
+            del value[rng.choice(list(value))]
+        return value
+    if rng.random() < 0.2:
+        return _random_value(rng, depth)
+    return value
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random_roundtrip(seed):
+    rng = random.Random(seed)
+    old = {'root': _random_value(rng), 'arr': [_random_value(rng) for _ in range(8)]}
+    new = _mutate(rng, deepcopy(old))
+    _assert_roundtrip(old, new)
+    _assert_roundtrip(old, new, max_edit_distance=1)
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_cached_hashes_are_invalidated_by_writes(seed):
+    rng = random.Random(seed)
+    old = {'root': _random_value(rng), 'arr': [_random_value(rng) for _ in range(8)]}
+    new = _mutate(rng, deepcopy(old))
+    old = JsonFactory.from_python(old, require_decimal=False)
+    new = JsonFactory.from_python(new, require_decimal=False)
+    differ = JsonDiff()
+    with differ.track():
+        patch = JsonPatch.from_json_array(differ.diff(old, new))
+        # the hashes of `old` are kept, except for the changed paths
+        patch.apply(old)
+        assert differ.diff(old, new).to_python() == []
+        assert differ.content_hash(old) == JsonDiff().content_hash(new)
@@ -0,0 +1,194 @@
+import pytest
+import random
+from copy import deepcopy
+from jotvm.json_patch import JsonPatch
+from jotvm.json_pointer import JsonPointer
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json.json_types import JsonObject
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "a": 5,
+        "b": [1, 2, 3],
+        "c": {"u": "cu", "v": [6, {"x": 8}]},
+        "tmp": "old",
+    }, require_decimal=False)
+
+
+def _compose(patches, json_doc, assume_new_members=False):
+    patches = [
+        JsonPatch.from_python(p, require_decimal=False) for p in patches
+    ]
+    composed = JsonPatch.compose(
+        *patches, assume_new_members=assume_new_members
+    )
+    expected_doc = deepcopy(json_doc)
+    for patch in patches:
+        patch.apply(expected_doc)
+    composed_doc = deepcopy(json_doc)
+    composed.apply(composed_doc)
+    assert composed_doc == expected_doc
+    return composed.to_python()
+
+
+def test_successive_replaces_are_merged(json_doc):
+    composed = _compose([
+        [{"op": "replace", "path": "/a", "value": 6}],
+        [{"op": "replace", "path": "/a", "value": 7}],
+        [{"op": "replace", "path": "/c/v/0", "value": 1}],
+        [{"op": "replace", "path": "/a", "value": 8}],
+    ], json_doc)
+    assert composed == [
+        {"op": "replace", "path": "/a", "value": 8},
+        {"op": "replace", "path": "/c/v/0", "value": 1},
+    ]
+
+
+def test_changes_are_folded_into_added_values(json_doc):
+    composed = _compose([
+        [{"op": "add", "path": "/d", "value": {"p": [1]}}],
+        [{"op": "add", "path": "/d/p/-", "value": 2}],
+        [{"op": "replace", "path": "/d/p/0", "value": 0}],
+        [{"op": "copy", "from": "/d/p", "path": "/d/q"}],
+        [{"op": "test", "path": "/d/q/1", "value": 2}],
+    ], json_doc)
+    assert composed == [
+        {"op": "add", "path": "/d", "value": {"p": [0, 2], "q": [0, 2]}},
+    ]
+
+
+def test_add_remove_cancels_only_for_new_members(json_doc):
+    patches = [
+        [{"op": "add", "path": "/tmp", "value": {"big": list(range(10))}}],
+        [{"op": "replace", "path": "/a", "value": 1}],
+        [{"op": "remove", "path": "/tmp"}],
+    ]
+    # `add` replaced an existing member here, so the pair is kept
+    composed = _compose(patches, json_doc)
+    assert len(composed) == 3
+    del json_doc["tmp"]
+    composed = _compose(patches, json_doc, assume_new_members=True)
+    assert composed == [{"op": "replace", "path": "/a", "value": 1}]
+
+
+def test_paths_are_rewritten_through_moves(json_doc):
+    composed = _compose([
+        [{"op": "add", "path": "/n", "value": {"k": 1}}],
+        [{"op": "move", "from": "/n", "path": "/m"}],
+        [{"op": "replace", "path": "/m/k", "value": 2}],
+        [{"op": "move", "from": "/m", "path": "/o"}],
+    ], json_doc, assume_new_members=True)
+    assert composed == [
+        {"op": "add", "path": "/o", "value": {"k": 2}},
+    ]
+
+
+def test_array_shifts_block_merging(json_doc):
+    composed = _compose([
+        [{"op": "add", "path": "/b/1", "value": 10}],
+        [{"op": "replace", "path": "/b/2", "value": 20}],
+        [{"op": "remove", "path": "/b/1"}],
+    ], json_doc, assume_new_members=True)
+    assert len(composed) == 3
+    composed = _compose([
+        [{"op": "add", "path": "/b/1", "value": 10}],
+        [{"op": "replace", "path": "/c/v/0", "value": 20}],
+        [{"op": "remove", "path": "/b/1"}],
+    ], json_doc, assume_new_members=True)
+    assert composed == [{"op": "replace", "path": "/c/v/0", "value": 20}]
+
+
+def test_value_path_fields_are_not_merged(json_doc):
+    composed = _compose([
+        [{"op": "replace", "path": "/a", "value": 1}],
+        [{"op": "add", "path": "/z", "value-path": "/a"}],
+        [{"op": "replace", "path": "/a", "value": 2}],
+    ], json_doc)
+    assert len(composed) == 3
+
+
+def _random_pointer(rng, doc, for_add):
+    path = []
+    node = doc
+    while True:
+        if isinstance(node, list):
+            keys = [str(i) for i in range(len(node))]
+            if for_add:
+                keys += [str(len(node)), '-']
+        elif isinstance(node, dict):
+            keys = list(node)
+            if for_add:
+                keys.append(rng.choice('pqrs'))
+        else:
+            return None
+        if not keys:
+            return None
+        key = rng.choice(keys)
+        path.append(key)
+        if isinstance(node, dict):
+            is_new = key not in node
+        else:
+            is_new = key in ('-', str(len(node)))
+        if is_new or rng.random() < 0.4:
+            return JsonPointer(tuple(path))
+        node = node[key] if isinstance(node, dict) else node[int(key)]
+
+
+def _random_op(rng, doc):
+    name = rng.choice(['add', 'add', 'remove', 'replace', 'move', 'copy', 'test'])
+    value = rng.choice([1, 'x', [1, 2], {"p": 0, "q": [3]}])
+    path = _random_pointer(rng, doc, name in ('add', 'move', 'copy'))
+    if path is None:
+        return None
+    op = {"op": name, "path": str(path)}
+    if name in ('move', 'copy'):
+        from_path = _random_pointer(rng, doc, False)
+        if from_path is None:
+            return None
+        op["from"] = str(from_path)
+    elif name != 'remove':
+        op["value"] = value
+    if name == 'test':
+        try:
+            op["value"] = path.get(JsonFactory.from_python(doc)).to_python()
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+    return op
+
+
+@pytest.mark.parametrize("assume_new_members", [False, True])
+def test_random_patch_sequences(assume_new_members):
+    for seed in range(150):
+        rng = random.Random(seed)
+        orig_doc = {"a": [1, {"b": [2, 3]}], "c": {"d": 4, "e": [5, 6, 7]}}
+        doc = JsonFactory.from_python(orig_doc, require_decimal=False)
+        patches = []
+        for _ in range(8):
+            ops = []
+            for _ in range(4):
+                op = _random_op(rng, doc.to_python())
+                if op is None:
+                    continue
+                target = JsonPointer(op["path"])
+                if (
+                    assume_new_members and op["op"] in ('add', 'move', 'copy')
+                    and isinstance(target[:-1].get(doc), JsonObject)
+                    and target.exists(doc)
+                ):
+                    continue
+                patch = JsonPatch.from_python([op], require_decimal=False)
+                trial = deepcopy(doc)
+                try:
+                    patch.apply(trial)
+                except (KeyError, IndexError, TypeError, ValueError):
+                    continue
+                doc = trial
+                ops.append(op)
+            patches.append(ops)
+        _compose(
+            patches,
+            JsonFactory.from_python(orig_doc, require_decimal=False),
+            assume_new_members
+        )
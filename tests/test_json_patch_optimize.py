@@ -0,0 +1,182 @@
+import pytest
+import random
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json_patch_optimize import PeepholeOptimizer
+from jotvm.json_pointer import JsonPointer
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json.json_types import JsonObject
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "a": [True, False, True],
+        "b": {"x": True, "y": False},
+        "n": [1, 2, 3],
+        "idx": ["n", 1],
+    }, require_decimal=False)
+
+
+def _optimize(patch_ops, json_doc, assume_new_members=False):
+    """Return the optimizer after checking the optimized patch."""
+    patch_ops = JsonFactory.from_python(patch_ops, require_decimal=False)
+    optimizer = PeepholeOptimizer(assume_new_members)
+    optimized = optimizer.optimize(patch_ops)
+    expected_doc = deepcopy(json_doc)
+    ExtJsonPatch.from_json_array(patch_ops).apply(expected_doc)
+    ExtJsonPatch.from_json_array(optimized).apply(json_doc)
+    assert json_doc == expected_doc
+    optimizer.result = optimized.to_python()
+    return optimizer
+
+
+def test_copy_and_binary_op_are_fused(json_doc):
+    optimizer = _optimize([
+        {"op": "copy", "from": "/b/x", "path": "/c"},
+        {"op": "bool/or", "path": "/c", "value-path": "/b/y"},
+        {"op": "copy", "from": "/n", "path": "/m"},
+        {"op": "number/mul", "path": "/m", "value": 2, "elementwise": True},
+        # the operand is changed by the copy
+        {"op": "copy", "from": "/a/0", "path": "/a/1"},
+        {"op": "bool/and", "path": "/a/1", "value-path": "/a/2"},
+    ], json_doc)
+    assert optimizer.result[:2] == [
+        {"op": "bool/or", "path": "/c", "left-value-path": "/b/x",
+         "value-path": "/b/y"},
+        {"op": "number/mul", "path": "/m", "left-value-path": "/n",
+         "value": 2, "elementwise": True},
+    ]
+    assert len(optimizer.result) == 4
+    assert [r.rule for r in optimizer.rewrites] == ["fuse-copy-binary"] * 2
+    assert optimizer.num_eliminated == 2
+
+
+def test_scratch_values_need_new_members(json_doc):
+    patch_ops = [
+        {"op": "add", "path": "/tmp", "value": {"big": [1, 2]}},
+        {"op": "copy", "from": "/a", "path": "/tmp2"},
+        {"op": "remove", "path": "/tmp2"},
+        {"op": "remove", "path": "/tmp"},
+        {"op": "array/join-path", "path": "/p", "value-path": "/idx"},
+        {"op": "copy", "from": "/p", "path": "/op/value-path"},
+        {"op": "remove", "path": "/p"},
+    ]
+    json_doc["op"] = JsonObject()
+    optimizer = _optimize(patch_ops, deepcopy(json_doc))
+    assert optimizer.rewrites == []
+    optimizer = _optimize(patch_ops, json_doc, assume_new_members=True)
+    assert optimizer.result == [
+        {"op": "array/join-path", "path": "/op/value-path",
+         "value-path": "/idx"},
+    ]
+    assert [(r.rule, len(r.eliminated)) for r in optimizer.rewrites] == [
+        ("drop-scratch", 2), ("drop-scratch", 2), ("forward-scratch", 3),
+    ]
+    assert optimizer.num_eliminated == 6
+    assert json_doc["op"]["value-path"] == "/n/1"
+
+
+def test_nested_patches_are_optimized(json_doc):
+    patch = ExtJsonPatch.from_python([
+        {"op": "add", "path": "/i", "value": 0},
+        {"op": "ctrl/for-loop", "path": "", "counter-path": "/i",
+         "start-value": 0, "stop-value": 2, "patch": [
+             {"op": "copy", "from": "/b/x", "path": "/c"},
+             {"op": "bool/and", "path": "/c", "value-path": "/b/y"},
+         ]},
+    ], require_decimal=False)
+    optimizer = PeepholeOptimizer()
+    optimizer.optimize(patch.to_json_array())
+    assert [r.location for r in optimizer.rewrites] == ["/1/patch"]
+    optimized = patch.optimize()
+    assert optimized.to_python()[1]["patch"] == [
+        {"op": "bool/and", "path": "/c", "left-value-path": "/b/x",
+         "value-path": "/b/y"},
+    ]
+    expected_doc = deepcopy(json_doc)
+    patch.apply(expected_doc)
+    optimized.apply(json_doc)
+    assert json_doc == expected_doc
+
+
+# ------------ Differential Testing -----------------
+
+_SOURCES = ["/a/0", "/a/2", "/b/x", "/b/y", "/s", "/a", "/idx"]
+_TARGETS = ["/s", "/t", "/b/s", "/a/0", "/a/1", "/a/-", "/b/x", "/b/y"]
+
+
+def _random_ops(rng):
+    target = rng.choice(_TARGETS)
+    other = rng.choice(_TARGETS)
+    source = rng.choice(_SOURCES)
+    kind = rng.randrange(4)
+    if kind == 0:
+        operand = rng.choice([
+            {"value": rng.choice([True, False])},
+            {"value-path": rng.choice(_SOURCES + _TARGETS)},
+        ])
+        name = rng.choice(["bool/or", "bool/and"])
+        return [
+            {"op": "copy", "from": source, "path": target},
+            dict({"op": name, "path": target}, **operand),
+        ]
+    if kind == 1:
+        store = rng.choice([
+            {"op": "add", "path": target, "value": rng.choice([1, [2]])},
+            {"op": "copy", "from": source, "path": target},
+        ])
+        return [store, {"op": "remove", "path": target}]
+    if kind == 2:
+        store = rng.choice([
+            {"op": "add", "path": target, "value": "v"},
+            {"op": "bool/or", "path": target, "left-value-path": source,
+             "value-path": rng.choice(_SOURCES)},
+            {"op": "array/join-path", "path": target, "value-path": "/idx"},
+            {"op": "array/length", "path": target, "value-path": "/a"},
+        ])
+        return [
+            store,
+            {"op": "copy", "from": target, "path": other},
+            {"op": "remove", "path": target},
+        ]
+    return [rng.choice([
+        {"op": "remove", "path": target},
+        {"op": "replace", "path": target, "value": False},
+        {"op": "bool/not", "path": target},
+    ])]
+
+
+def _adds_new_members(patch_ops, json_doc):
+    """Check that no value is stored at an existing object member."""
+    json_doc = deepcopy(json_doc)
+    for op in ExtJsonPatch.from_python(patch_ops)._patch_ops:
+        fields = op.to_json_object()
+        stores = fields["op"] in ("add", "copy", "array/join-path",
+                                  "array/length")
+        if stores or "left-value-path" in fields:
+            path = JsonPointer(fields["path"])
+            parent = path[:-1].get(json_doc)
+            if isinstance(parent, JsonObject) and path.exists(json_doc):
+                return False
+        op(json_doc)
+    return True
+
+
+@pytest.mark.parametrize("assume_new_members", [False, True])
+def test_random_patch_sequences(json_doc, assume_new_members):
+    num_rewrites = 0
+    for seed in range(300):
+        rng = random.Random(seed)
+        patch_ops = []
+        for _ in range(rng.randint(1, 4)):
+            patch_ops += _random_ops(rng)
+        try:
+            ExtJsonPatch.from_python(patch_ops).apply(deepcopy(json_doc))
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        if assume_new_members and not _adds_new_members(patch_ops, json_doc):
+            continue
+        optimizer = _optimize(patch_ops, deepcopy(json_doc), assume_new_members)
+        num_rewrites += len(optimizer.rewrites)
+    assert num_rewrites > 20
@@ -0,0 +1,125 @@
+import pytest
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json_patch_specialize import PartialEvaluator
+from jotvm.json.json_factory import JsonFactory
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "config": {"factor": 3, "limit": 10, "flags": [True, False]},
+        "code": {
+            "scale": {"op": "number/mul", "path": "/x",
+                      "value-path": "/config/factor"},
+            "steps": [{"op": "number/add", "path": "/n", "value": 1}],
+        },
+        "x": 5,
+        "n": 0,
+        "sub": {"v": 1, "w": 2},
+    }, require_decimal=False)
+
+
+def _specialize(patch_ops, json_doc, immutable=("/config", "/code")):
+    """Return the specialized operations after checking them."""
+    patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    specialized = patch.specialize(json_doc, immutable)
+    expected_doc = deepcopy(json_doc)
+    patch.apply(expected_doc)
+    specialized.apply(json_doc)
+    assert json_doc == expected_doc
+    return specialized.to_python()
+
+
+def test_constants_are_folded(json_doc):
+    specialized = _specialize([
+        {"op": "add", "path": "/y", "value-path": "/config/factor"},
+        {"op": "number/mul", "path": "/y", "value-path": "/config/factor"},
+        {"op": "number/greater", "path": "/big", "left-value-path": "/y",
+         "right-value-path": "/config/limit"},
+        {"op": "copy", "from": "/config/flags", "path": "/flags"},
+        {"op": "number/add", "path": "/x", "value-path": "/y"},
+        {"op": "test", "path": "/config/limit", "value": 10},
+        {"op": "array/length", "path": "/len", "value-path": "/flags"},
+        {"op": "number/trunc", "path": "/y"},
+    ], json_doc)
+    assert specialized == [
+        {"op": "add", "path": "/y", "value": 3},
+        {"op": "replace", "path": "/y", "value": 9},
+        {"op": "add", "path": "/big", "value": False},
+        {"op": "add", "path": "/flags", "value": [True, False]},
+        {"op": "number/add", "path": "/x", "value": 9},
+        {"op": "array/length", "path": "/len", "value": [True, False]},
+        {"op": "replace", "path": "/y", "value": 9},
+    ]
+    assert json_doc["x"] == 14
+
+
+def test_control_operations_are_inlined(json_doc):
+    specialized = _specialize([
+        {"op": "ctrl/cond-apply-patch", "path": "", "check-path": "/config/flags/1",
+         "true-patch": [{"op": "add", "path": "/t", "value": 1}],
+         "false-patch-path": "/code/steps"},
+        {"op": "ctrl/cond-apply-patch-op", "path": "",
+         "check-path": "/config/flags/1",
+         "true-patch-op": {"op": "add", "path": "/t", "value": 1}},
+        {"op": "ctrl/apply-patch-op", "path": "", "patch-op-path": "/code/scale"},
+        {"op": "ctrl/for-loop", "path": "", "counter-path": "/i",
+         "start-value": 0, "stop-value-path": "/config/factor",
+         "patch-path": "/code/steps"},
+        {"op": "ctrl/apply-patch", "path": "/sub", "patch": [
+            {"op": "number/add", "path": "/v", "value-path": "/v"},
+        ]},
+    ], json_doc)
+    assert specialized == [
+        {"op": "number/add", "path": "/n", "value": 1},
+        {"op": "number/mul", "path": "/x", "value": 3},
+        {"op": "ctrl/for-loop", "path": "", "counter-path": "/i",
+         "start-value": 0, "stop-value": 3,
+         "patch": [{"op": "number/add", "path": "/n", "value": 1}]},
+        {"op": "ctrl/apply-patch", "path": "/sub", "patch": [
+            {"op": "number/add", "path": "/v", "value-path": "/v"},
+        ]},
+    ]
+    # within the scope `/sub`, pointers are relative to it
+    specialized = _specialize([
+        {"op": "ctrl/apply-patch", "path": "/sub", "patch": [
+            {"op": "number/add", "path": "/v", "value-path": "/w"},
+        ]},
+    ], json_doc, immutable=["/sub/w"])
+    assert specialized[0]["patch"] == [
+        {"op": "number/add", "path": "/v", "value": 2},
+    ]
+
+
+def test_mutable_values_are_not_folded(json_doc):
+    specialized = _specialize([
+        {"op": "add", "path": "/a", "value": [1]},
+        {"op": "ctrl/apply-patch", "path": "/sub", "patch": [
+            {"op": "add", "path": "/v", "value": 7},
+        ]},
+        {"op": "number/add", "path": "/x", "value-path": "/a/0"},
+        {"op": "add", "path": "/a/0", "value": 2},
+        {"op": "number/add", "path": "/x", "value-path": "/a/0"},
+        {"op": "number/add", "path": "/x", "value-path": "/sub/v"},
+        {"op": "ctrl/for-each", "path": "", "array-path": "/a",
+         "item-path": "/it", "patch": [
+             {"op": "number/add", "path": "/it", "value-path": "/n"},
+         ]},
+    ], json_doc)
+    assert [op.get("value") for op in specialized[2:6]] == [1, 2, 2, None]
+    assert specialized[5]["value-path"] == "/sub/v"
+    assert "array-path" in specialized[6]
+
+
+def test_specialized_patches_are_cached(json_doc):
+    patch = ExtJsonPatch.from_python([
+        {"op": "number/add", "path": "/x", "value-path": "/config/factor"},
+    ], require_decimal=False)
+    evaluator = PartialEvaluator(["/config"])
+    specialized = evaluator.specialize(patch, json_doc)
+    json_doc["x"] = json_doc["limit"] = json_doc["n"]
+    assert evaluator.specialize(patch, json_doc) is specialized
+    json_doc["config"]["factor"] = json_doc["n"]
+    assert evaluator.specialize(patch, json_doc) is not specialized
+    assert evaluator.stats() == {"specialized-patches": 2, "cache-hits": 1}
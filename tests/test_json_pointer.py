@@ -123,3 +123,19 @@ def test_remove_missing_index(json_doc):
     jp1 = JsonPointer("/b/4")
     with pytest.raises(IndexError):
         jp1.remove(json_doc)
+
+
+def test_set(json_doc):
+    """Expect replacement in place without shifting array elements."""
+    JsonPointer("/b/1").set(json_doc, JsonNumber(7))
+    JsonPointer("/c/u").set(json_doc, JsonNumber(1))
+    assert json_doc["b"].to_python() == [1, 7, 3]
+    assert json_doc["c"]["u"] == 1
+    for path, exc in (("/b/3", IndexError), ("/b/-", IndexError),
+                      ("/c/w", KeyError)):
+        with pytest.raises(exc):
+            JsonPointer(path).set(json_doc, JsonNumber(0))
+    JsonPointer("/b/-").set(json_doc, JsonNumber(4), create=True)
+    JsonPointer("/c/w").set(json_doc, JsonNumber(0), create=True)
+    assert json_doc["b"].to_python() == [1, 7, 3, 4]
+    assert json_doc["c"]["w"] == 0
@@ -0,0 +1,154 @@
+import pytest
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from copy import deepcopy
+from jotvm.context import (
+    ExecutionContext,
+    ExecutionLimitExceeded,
+)
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+
+
+SCALE = [
+    {"op": "number/mul", "path": "/inp/x", "value-path": "/inp/fact"},
+    {"op": "move", "from": "/inp/x", "path": "/out"},
+]
+
+ADD = [
+    {"op": "number/add", "path": "/inp/acc", "value-path": "/inp/x"},
+    {"op": "move", "from": "/inp/acc", "path": "/out"},
+]
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "scale": SCALE,
+        "add": ADD,
+        "arr": [1, 2, 3, 4],
+        "fact": 10,
+    }, require_decimal=False)
+
+
+def _apply(patch_ops, json_doc, **kwargs):
+    patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    patch.apply(json_doc, **kwargs)
+    return json_doc
+
+
+def test_map_func(json_doc):
+    _apply([{
+        "op": "ctrl/map-func", "patch-path": "/scale",
+        "array-path": "/arr", "fact-path": "/fact", "out-path": "/res",
+    }], json_doc)
+    assert json_doc["res"].to_python() == [10, 20, 30, 40]
+    assert json_doc["arr"].to_python() == [1, 2, 3, 4]
+
+
+def test_map_func_item_and_index_names(json_doc):
+    _apply([{
+        "op": "ctrl/map-func", "patch": [
+            {"op": "number/add", "path": "/inp/i", "value-path": "/inp/v"},
+            {"op": "move", "from": "/inp/i", "path": "/out"},
+        ],
+        "array": [5, 5, 5], "item": "v", "index": "i", "out-path": "/res",
+    }], json_doc)
+    assert json_doc["res"].to_python() == [5, 6, 7]
+
+
+def test_map_func_compiles_patch_once(json_doc):
+    context = ExecutionContext(debug=False)
+    _apply([{
+        "op": "ctrl/map-func", "patch-path": "/scale",
+        "array-path": "/arr", "fact": 2, "out-path": "/arr",
+    }], json_doc, context=context)
+    assert json_doc["arr"].to_python() == [2, 4, 6, 8]
+    assert context.stats()["compiled-patches"] == 1
+    # the map op and two operations per element
+    assert context.stats()["ops"] == 9
+
+
+@pytest.mark.parametrize("executor_class", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_parallel_map_func_matches_sequential(json_doc, executor_class):
+    patch_ops = [{
+        "op": "ctrl/map-func", "patch-path": "/scale", "parallel": True,
+        "array-path": "/arr", "fact-path": "/fact", "out-path": "/res",
+    }]
+    expected_doc = _apply(patch_ops, deepcopy(json_doc))
+    with executor_class(2) as executor:
+        context = ExecutionContext(debug=False, executor=executor)
+        _apply(patch_ops, json_doc, context=context)
+    assert json_doc == expected_doc
+
+
+@pytest.mark.parametrize("executor_class", [None, ThreadPoolExecutor, ProcessPoolExecutor])
+def test_parallel_map_func_operation_limit(json_doc, executor_class):
+    json_doc["arr"] = JsonFactory.from_python(list(range(20)))
+    json_doc["count"] = JsonFactory.from_python(
+        [{"op": "number/add", "path": "/inp/x", "value": 1}] * 9
+        + [{"op": "move", "from": "/inp/x", "path": "/out"}]
+    )
+    patch_ops = [{
+        "op": "ctrl/map-func", "patch-path": "/count", "parallel": True,
+        "array-path": "/arr", "out-path": "/res",
+    }]
+    if executor_class is None:
+        with pytest.raises(ExecutionLimitExceeded):
+            _apply(patch_ops, json_doc, context=ExecutionContext(max_ops=50))
+        return
+    with executor_class(2) as executor:
+        context = ExecutionContext(debug=False, executor=executor, max_ops=50)
+        with pytest.raises(ExecutionLimitExceeded):
+            _apply(patch_ops, json_doc, context=context)
+        context = ExecutionContext(debug=False, executor=executor, max_ops=201)
+        _apply(patch_ops, json_doc, context=context)
+    assert context.stats()["ops"] == 201
+    assert json_doc["res"].to_python() == list(range(9, 29))
+
+
+def test_parallel_map_func_compiles_once_per_process(json_doc):
+    json_doc["arr"] = JsonFactory.from_python(list(range(20)))
+    patch_ops = [{
+        "op": "ctrl/map-func", "patch-path": "/scale", "parallel": True,
+        "array-path": "/arr", "fact-path": "/fact", "out-path": "/res",
+    }]
+    with ProcessPoolExecutor(1) as executor:
+        # in the calling process and once in the worker, which keeps
+        # the compiled patch for later calls
+        for expected in [2, 1]:
+            context = ExecutionContext(debug=False, executor=executor)
+            _apply(patch_ops, json_doc, context=context)
+            assert json_doc["res"].to_python() == list(range(0, 200, 10))
+            assert context.stats()["compiled-patches"] == expected
+
+
+def test_parallel_map_func_raises_first_error(json_doc):
+    json_doc["arr"][2] = JsonFactory.from_python("x", require_decimal=False)
+    patch_ops = [{
+        "op": "ctrl/map-func", "patch-path": "/scale", "parallel": True,
+        "array-path": "/arr", "fact-path": "/fact", "out-path": "/res",
+    }]
+    with ThreadPoolExecutor(2) as executor:
+        context = ExecutionContext(debug=False, executor=executor)
+        with pytest.raises(TypeError):
+            _apply(patch_ops, json_doc, context=context)
+    assert "res" not in json_doc
+
+
+def test_reduce_func(json_doc):
+    _apply([
+        {"op": "ctrl/reduce-func", "patch-path": "/add",
+         "array-path": "/arr", "init": 100, "out-path": "/sum"},
+        {"op": "ctrl/reduce-func", "patch-path": "/add",
+         "array-path": "/arr", "out-path": "/sum2"},
+    ], json_doc)
+    assert json_doc["sum"] == 110
+    assert json_doc["sum2"] == 10
+    with pytest.raises(ValueError):
+        _apply([
+            {"op": "ctrl/reduce-func", "patch-path": "/add",
+             "array": [], "out-path": "/sum3"},
+        ], json_doc)
@@ -0,0 +1,117 @@
+import pytest
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.memory_quota import (
+    MemoryAccountant,
+    MemoryQuotaExceeded,
+    estimate_size,
+)
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        'number1': 13,
+        'number2': 41,
+        'arr': [1, 2, 3],
+        'func': [
+            {'op': 'add', 'path': '/out', 'value': 0},
+            {'op': 'number/add', 'path': '/out', 'value-path': '/inp/x'},
+            {'op': 'number/add', 'path': '/out', 'value-path': '/inp/y'},
+        ]
+    }, require_decimal=False)
+
+
+def test_initial_size_matches_estimate(json_doc):
+    accountant = MemoryAccountant()
+    with accountant.track(json_doc):
+        pass
+    assert (accountant.live_nodes, accountant.live_bytes) == estimate_size(json_doc)
+
+
+def test_incremental_accounting_matches_rescan(json_doc):
+    patch_ops = [
+        {'op': 'add', 'path': '/arr/-', 'value': {'a': 'long string'}},
+        {'op': 'replace', 'path': '/arr/0', 'value': [1, 2, 3, 4]},
+        {'op': 'move', 'from': '/arr/1', 'path': '/moved'},
+        {'op': 'copy', 'from': '/arr', 'path': '/copied'},
+        {'op': 'remove', 'path': '/number1'},
+        {
+            'op': 'ctrl/call-func',
+            'patch-path': '/func',
+            'x': 5,
+            'y-path': '/number2',
+            'out-path': '/arith-result',
+        },
+    ]
+    ext_patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    accountant = MemoryAccountant()
+    with accountant.track(json_doc):
+        ext_patch.apply(json_doc)
+    assert json_doc['arith-result'] == 46
+    assert (accountant.live_nodes, accountant.live_bytes) == estimate_size(json_doc)
+    assert accountant.peak_bytes >= accountant.live_bytes
+
+
+def test_nested_call_args_are_counted_once(json_doc):
+    json_doc['lib'] = JsonFactory.from_python({'unit': 'm' * 100})
+    ext_patch = ExtJsonPatch.from_python([
+        {
+            'op': 'ctrl/for-loop',
+            'path': '',
+            'start-value': 0,
+            'stop-value': 2,
+            'counter-path': '/i',
+            'patch': [{
+                'op': 'ctrl/call-func',
+                'patch': [{'op': 'copy', 'from': '/req/lib', 'path': '/out'}],
+                'req': {'lib-path': '/lib'},
+                'out-path': '/result',
+            }],
+        },
+    ], require_decimal=False)
+    accountant = MemoryAccountant()
+    with accountant.track(json_doc):
+        ext_patch.apply(json_doc)
+    assert json_doc['result'] == json_doc['lib']
+    assert (accountant.live_nodes, accountant.live_bytes) == estimate_size(json_doc)
+
+
+def test_add_then_remove_restores_size(json_doc):
+    ext_patch = ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/scratch', 'value': list(range(100))},
+        {'op': 'remove', 'path': '/scratch'},
+    ], require_decimal=False)
+    accountant = MemoryAccountant()
+    with accountant.track(json_doc):
+        initial_bytes = accountant.live_bytes
+        ext_patch.apply(json_doc)
+    assert accountant.live_bytes == initial_bytes
+    assert accountant.peak_bytes > initial_bytes
+
+
+def test_quota_exceeded_in_unbounded_loop(json_doc):
+    ext_patch = ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/check', 'value': True},
+        {
+            'op': 'ctrl/while-loop',
+            'path': '',
+            'check-path': '/check',
+            'patch': [{'op': 'add', 'path': '/arr/-', 'value': 'x' * 100}],
+        },
+    ], require_decimal=False)
+    accountant = MemoryAccountant(max_bytes=100000)
+    with pytest.raises(MemoryQuotaExceeded):
+        with accountant.track(json_doc):
+            ext_patch.apply(json_doc)
+    assert accountant.live_bytes > 100000
+
+
+def test_node_quota(json_doc):
+    ext_patch = ExtJsonPatch.from_python([
+        {'op': 'add', 'path': '/big', 'value': list(range(50))},
+    ], require_decimal=False)
+    accountant = MemoryAccountant(max_nodes=40)
+    with pytest.raises(MemoryQuotaExceeded):
+        with accountant.track():
+            ext_patch.apply(json_doc)
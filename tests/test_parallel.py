@@ -0,0 +1,178 @@
+import pytest
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.dependency import (
+    op_access,
+    is_independent,
+)
+from jotvm.memory_quota import MemoryAccountant
+
+
+FUNC = [
+    {"op": "add", "path": "/out", "value": 0},
+    {"op": "number/add", "path": "/out", "value-path": "/inp/x"},
+    {"op": "number/mul", "path": "/out", "value-path": "/inp/y"},
+]
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "func": FUNC,
+        "a": 2, "b": 3, "c": 4,
+        "res": {},
+    }, require_decimal=False)
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with ThreadPoolExecutor(4) as executor:
+        yield executor
+
+
+def _access(op):
+    return op_access(JsonFactory.from_python(op, require_decimal=False))
+
+
+def _call(out, x, y):
+    return {
+        "op": "ctrl/call-func", "patch-path": "/func",
+        "x-path": x, "y-path": y, "out-path": out,
+    }
+
+
+def _check_same(patch_ops, json_doc, executor):
+    patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    expected_doc = deepcopy(json_doc)
+    patch.apply(expected_doc)
+    patch.apply(json_doc, executor=executor)
+    assert json_doc == expected_doc
+    return json_doc
+
+
+def test_op_access():
+    access = _access(_call("/res/u", "/a", "/b"))
+    assert set(access.reads) == {("func",), ("a",), ("b",)}
+    assert access.writes == (("res", "u"),)
+    access = _access({"op": "move", "from": "/x/0", "path": "/y/1"})
+    assert access.writes == (("y",), ("x",))
+    access = _access({
+        "op": "ctrl/call-patch", "patch": [],
+        "args-paths": {"/p": "/a"}, "result-paths": {"/p": "/res/p"},
+    })
+    assert access.reads == (("a",),)
+    assert access.writes == (("res", "p"),)
+    assert _access({"op": "ctrl/unknown", "path": "/a"}) is None
+    assert _access({"op": "ctrl/call-func", "out-path": 5}) is None
+    call = dict(_call("/res/u", "/a", "/b"), **{"x-path-segments": ["a"]})
+    del call["x-path"]
+    assert _access(call) is None
+
+
+def test_independence():
+    call1 = _access(_call("/res/u", "/a", "/b"))
+    call2 = _access(_call("/res/v", "/a", "/c"))
+    call3 = _access(_call("/c", "/a", "/b"))
+    call4 = _access(_call("/res", "/a", "/b"))
+    assert is_independent(call1, call2)
+    assert not is_independent(call2, call3)
+    assert not is_independent(call1, call4)
+    append1 = _access({"op": "add", "path": "/res/l/-", "value": 1})
+    append2 = _access({"op": "add", "path": "/res/l/0", "value": 1})
+    assert not is_independent(append1, append2)
+
+
+def test_independent_calls_match_sequential(json_doc, executor):
+    patch_ops = [
+        _call("/res/u", "/a", "/b"),
+        _call("/res/v", "/b", "/c"),
+        {"op": "ctrl/call-patch", "patch": [
+            {"op": "copy", "from": "/x", "path": "/out"},
+            {"op": "number/add", "path": "/out", "value-path": "/x"},
+        ], "args-paths": {"/x": "/a"}, "result-paths": {"/out": "/res/w"}},
+        # depends on the previous results
+        _call("/res/x", "/res/u", "/res/v"),
+        {"op": "number/add", "path": "/a", "value": 1},
+        _call("/res/y", "/a", "/res/x"),
+    ]
+    json_doc = _check_same(patch_ops, json_doc, executor)
+    assert json_doc["res"].to_python() == {
+        "u": 6, "v": 12, "w": 4, "x": 72, "y": 216,
+    }
+
+
+def test_calls_with_segments_are_applied_in_order(json_doc, executor):
+    patch_ops = [
+        _call("/res/u", "/a", "/b"),
+        # reads the previous result
+        {"op": "ctrl/call-func", "patch-path": "/func",
+         "x-path-segments": ["res", "u"], "y-path": "/c",
+         "out-path": "/res/v"},
+        {"op": "ctrl/call-func", "patch-path": "/func",
+         "x-path": "/a", "y-path": "/c",
+         "out-path-segments": ["res", {"value-path": "/a"}]},
+    ]
+    json_doc = _check_same(patch_ops, json_doc, executor)
+    assert json_doc["res"].to_python() == {"u": 6, "v": 24, "2": 8}
+
+
+def test_calls_in_worker_processes(json_doc):
+    patch_ops = [_call(f"/res/r{i}", "/a", "/b") for i in range(6)]
+    with ProcessPoolExecutor(2) as executor:
+        json_doc = _check_same(patch_ops, json_doc, executor)
+    assert json_doc["res"]["r5"] == 6
+
+
+def test_pointers_in_input_values_are_resolved_in_order(json_doc, executor):
+    # the second call reads `/res/u` via a pointer in `/spec`,
+    # which the static analysis cannot see
+    json_doc["spec"] = JsonFactory.from_python(
+        {"x-path": "/res/u", "y": 1}, require_decimal=False
+    )
+    json_doc["res"]["u"] = JsonFactory.from_python(0, require_decimal=False)
+    patch_ops = [
+        _call("/res/u", "/a", "/b"),
+        {"op": "ctrl/call-func", "patch": [
+            {"op": "copy", "from": "/inp/s/x", "path": "/out"},
+        ], "s-path": "/spec", "out-path": "/res/v"},
+    ]
+    json_doc = _check_same(patch_ops, json_doc, executor)
+    assert json_doc["res"]["v"] == 6
+
+
+def test_errors_are_raised_as_in_sequential_order(json_doc, executor):
+    patch_ops = [
+        _call("/res/u", "/a", "/b"),
+        # fails in the called patch
+        _call("/res/v", "/func", "/b"),
+        # fails while preparing the input
+        _call("/res/w", "/missing", "/b"),
+    ]
+    patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    expected_doc = deepcopy(json_doc)
+    with pytest.raises(Exception) as expected:
+        patch.apply(expected_doc)
+    with pytest.raises(type(expected.value)):
+        patch.apply(json_doc, executor=executor)
+    assert json_doc == expected_doc
+    assert json_doc["res"].to_python() == {"u": 6}
+    with pytest.raises(type(expected.value)):
+        patch.apply(json_doc, atomic=True, executor=executor)
+    assert json_doc == expected_doc
+
+
+def test_fallback_for_scratch_observers(json_doc, executor):
+    patch_ops = [_call(f"/res/r{i}", "/a", "/b") for i in range(3)]
+    patch = ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+    stats = []
+    for executor in (None, executor):
+        accountant = MemoryAccountant()
+        with accountant.track(deepcopy(json_doc)) as accountant:
+            patch.apply(deepcopy(json_doc), executor=executor)
+        stats.append(accountant.stats())
+    assert stats[0] == stats[1]
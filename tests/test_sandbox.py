@@ -0,0 +1,101 @@
+import pytest
+import threading
+import time
+from jotvm.context import ExecutionLimitExceeded
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.sandbox import (
+    SandboxError,
+    SandboxPool,
+)
+
+
+pytest.importorskip("resource")
+
+
+def _make_doc(num):
+    return JsonFactory.from_python({
+        "loop": {"i": 0, "cont": True, "num": num},
+    }, require_decimal=False)
+
+
+@pytest.fixture(scope="module")
+def loop_patch():
+    return ExtJsonPatch.from_python([
+        {"op": "ctrl/while-loop", "path": "/loop", "check-path": "/loop/cont",
+         "patch": [
+            {"op": "number/add", "path": "/i", "value": 1},
+            {"op": "number/greater", "path": "/cont",
+             "left-value-path": "/num", "right-value-path": "/i"},
+         ]},
+    ], require_decimal=False)
+
+
+def test_jobs_are_applied_in_workers(loop_patch):
+    with SandboxPool(max_workers=2, warm_patches=[loop_patch]) as pool:
+        docs = [_make_doc(num) for num in range(2, 10)]
+        results = list(pool.apply_many(loop_patch, docs))
+    for num, result in enumerate(results, start=2):
+        assert result.ok
+        assert result.doc["loop"]["i"] == num
+        assert result.num_ops == 1 + 2 * num
+        assert result.cpu_time >= 0
+        assert result.max_rss > 0
+    # the documents are applied to copies
+    assert docs[0]["loop"]["i"] == 0
+
+
+def test_limits_and_recycling(loop_patch):
+    with SandboxPool(
+        max_workers=1, cpu_time=1, timeout=30, max_jobs_per_worker=2
+    ) as pool:
+        (worker,) = pool._workers
+        result = pool.apply(loop_patch, _make_doc(3))
+        assert result.ok
+        assert pool._workers == {worker}
+        # exceeds the CPU time
+        result = pool.apply(loop_patch, _make_doc(10**8))
+        assert isinstance(result.error, ExecutionLimitExceeded)
+        assert result.cpu_time >= 1
+        assert worker not in pool._workers
+        failing = ExtJsonPatch.from_python([
+            {"op": "remove", "path": "/missing"},
+        ], require_decimal=False)
+        result = pool.apply(failing, _make_doc(1), atomic=True)
+        assert not result.ok
+        assert result.doc == _make_doc(1)
+        for _ in range(3):
+            assert pool.apply(loop_patch, _make_doc(2)).ok
+        assert len(pool._workers) == 1
+
+
+def test_operation_limit(loop_patch):
+    with SandboxPool(max_workers=1, max_ops=100) as pool:
+        result = pool.apply(loop_patch, _make_doc(1000))
+        assert isinstance(result.error, ExecutionLimitExceeded)
+        assert result.num_ops == 101
+        assert pool.apply(loop_patch, _make_doc(49)).ok
+
+
+def test_timeout_kills_worker(loop_patch):
+    with SandboxPool(max_workers=1, timeout=0.2) as pool:
+        result = pool.apply(loop_patch, _make_doc(10**8))
+        assert isinstance(result.error, SandboxError)
+        assert result.doc is None
+        assert pool.apply(loop_patch, _make_doc(2)).ok
+
+
+def test_close_while_a_failing_job_runs(loop_patch):
+    pool = SandboxPool(max_workers=1, timeout=0.5)
+    pool.start()
+    results = []
+    thread = threading.Thread(target=lambda: results.append(
+        pool.apply(loop_patch, _make_doc(10**8))
+    ))
+    thread.start()
+    time.sleep(0.1)
+    # waits for the job, whose worker is replaced after closing
+    pool.close()
+    thread.join()
+    assert isinstance(results[0].error, SandboxError)
+    assert pool._workers is None
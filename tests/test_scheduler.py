@@ -0,0 +1,101 @@
+import pytest
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.scheduler import PatchScheduler
+
+
+def _make_doc():
+    return JsonFactory.from_python({
+        "loop": {"i": 0, "cont": True, "total": 0},
+    }, require_decimal=False)
+
+
+def _counting_patch(num_iterations):
+    return ExtJsonPatch.from_python([
+        {"op": "ctrl/while-loop", "path": "/loop", "check-path": "/loop/cont",
+         "patch": [
+            {"op": "number/add", "path": "/i", "value": 1},
+            {"op": "number/add", "path": "/total", "value-path": "/i"},
+            {"op": "number/greater", "path": "/cont",
+             "left-value": num_iterations, "right-value-path": "/i"},
+         ]},
+    ], require_decimal=False)
+
+
+def test_same_result_as_sync():
+    patch = _counting_patch(30)
+    expected_doc = _make_doc()
+    patch.apply(expected_doc)
+    scheduler = PatchScheduler(quantum=4)
+    jobs = [scheduler.submit(patch, _make_doc()) for _ in range(3)]
+    scheduler.run()
+    assert scheduler.pending() == 0
+    for job in jobs:
+        assert job.state == "done"
+        assert job.json_doc == expected_doc
+        assert job.num_ops == 1 + 30 * 3
+    stats = scheduler.stats()["default"]
+    assert stats["jobs"] == 3
+    assert stats["ops"] == 3 * (1 + 30 * 3)
+
+
+def test_short_jobs_are_not_starved():
+    scheduler = PatchScheduler(quantum=10)
+    long_job = scheduler.submit(_counting_patch(10000), _make_doc(), "batch")
+    short_jobs = [
+        scheduler.submit(_counting_patch(5), _make_doc(), "interactive")
+        for _ in range(5)
+    ]
+    while not all(job.done() for job in short_jobs):
+        scheduler.run_quantum()
+    assert not long_job.done()
+    assert long_job.num_ops < 200
+    scheduler.run()
+    assert long_job.state == "done"
+    stats = scheduler.stats()
+    assert stats["interactive"]["jobs"] == 5
+    assert stats["batch"]["max-queue-time"] >= 0
+
+
+def test_weights_and_priorities():
+    scheduler = PatchScheduler(quantum=5)
+    scheduler.set_tenant("a", weight=3)
+    scheduler.set_tenant("b", weight=1)
+    job_a = scheduler.submit(_counting_patch(10000), _make_doc(), "a")
+    job_b = scheduler.submit(_counting_patch(10000), _make_doc(), "b")
+    for _ in range(400):
+        scheduler.run_quantum()
+    assert job_a.num_ops / job_b.num_ops == pytest.approx(3, rel=0.05)
+
+    scheduler.set_tenant("urgent", priority=1)
+    urgent = scheduler.submit(_counting_patch(20), _make_doc(), "urgent")
+    num_ops = job_a.num_ops + job_b.num_ops
+    while not urgent.done():
+        scheduler.run_quantum()
+    assert job_a.num_ops + job_b.num_ops == num_ops
+    for job in (job_a, job_b):
+        scheduler.cancel(job)
+    assert scheduler.pending() == 0
+
+
+def test_failures_and_cancellation_are_isolated():
+    failing = ExtJsonPatch.from_python([
+        {"op": "number/add", "path": "/loop/total", "value": 1},
+        {"op": "number/add", "path": "/missing", "value": 1},
+    ], require_decimal=False)
+    scheduler = PatchScheduler(quantum=3)
+    failed = scheduler.submit(failing, _make_doc(), atomic=True)
+    cancelled = scheduler.submit(_counting_patch(1000), _make_doc(), atomic=True)
+    ok = scheduler.submit(_counting_patch(10), _make_doc(), atomic=True)
+    orig_doc = _make_doc()
+    while not ok.done():
+        scheduler.run_quantum()
+    scheduler.cancel(cancelled)
+    assert scheduler.run_quantum() is None
+    assert failed.state == "failed"
+    assert failed.error is not None
+    assert failed.json_doc == orig_doc
+    assert cancelled.state == "cancelled"
+    assert cancelled.json_doc == orig_doc
+    assert ok.state == "done"
+    assert ok.json_doc["loop"]["total"] == 55
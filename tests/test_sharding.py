@@ -0,0 +1,91 @@
+import pytest
+from copy import deepcopy
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.sharding import (
+    ShardingError,
+    apply_sharded,
+)
+
+
+FIX = [
+    {"op": "number/add", "path": "/count", "value-path": "/step"},
+    {"op": "add", "path": "/tags/-", "value": "fixed"},
+]
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "lib": {"fix": FIX},
+        "records": {
+            f"r{i}": {"count": i, "step": 1, "i": 0, "tags": []}
+            for i in range(6)
+        },
+        "list": [{"count": 0, "step": 2, "tags": []}],
+    }, require_decimal=False)
+
+
+def _patch(patch_ops):
+    return ExtJsonPatch.from_python(patch_ops, require_decimal=False)
+
+
+def _apply_patch(path, **fields):
+    return {"op": "ctrl/apply-patch", "path": path, "patch-path": "/lib/fix", **fields}
+
+
+@pytest.mark.parametrize("executor", ["serial", "process"])
+def test_sharded_matches_sequential(json_doc, executor):
+    patch = _patch(
+        [_apply_patch(f"/records/r{i}") for i in range(6)]
+        + [_apply_patch("/records/r1"), _apply_patch("/list/0")]
+        + [{"op": "ctrl/for-loop", "path": "/records/r2", "start-value": 1,
+            "stop-value-path": "/records/r2/step", "counter-path": "/records/r2/i",
+            "patch": [{"op": "number/add", "path": "/count", "value-path": "/i"}]}]
+    )
+    expected_doc = deepcopy(json_doc)
+    patch.apply(expected_doc)
+    apply_sharded(
+        patch, json_doc, ["/records", "/list"], executor=executor,
+        max_workers=2, chunksize=2
+    )
+    assert json_doc == expected_doc
+    assert json_doc["records"]["r1"].to_python() == {
+        "count": 3, "step": 1, "i": 0, "tags": ["fixed", "fixed"],
+    }
+
+
+@pytest.mark.parametrize("patch_ops", [
+    # root path
+    [_apply_patch("")],
+    # the shard root itself
+    [_apply_patch("/records")],
+    # not a scoped operation
+    [{"op": "add", "path": "/records/r0/x", "value": 1}],
+    # reads from another shard
+    [_apply_patch("/records/r0"), _apply_patch("/records/r1", **{
+        "patch-path": "/records/r0/tags"})],
+    # counter outside of its scope
+    [{"op": "ctrl/for-loop", "path": "/records/r0", "start-value": 0,
+      "stop-value": 1, "counter-path": "/records/r1/i", "patch": []}],
+])
+def test_escaping_operations_are_rejected(json_doc, patch_ops):
+    with pytest.raises(ShardingError):
+        apply_sharded(_patch(patch_ops), json_doc, "/records", executor="serial")
+
+
+def test_top_level_shards_and_errors(json_doc):
+    patch = _patch([
+        _apply_patch("/records/r0"),
+        {"op": "ctrl/apply-patch", "path": "/list/0", "patch": [
+            {"op": "test", "path": "/count", "value": 5},
+        ]},
+        {"op": "ctrl/apply-patch", "path": "/records", "patch": [
+            {"op": "remove", "path": "/missing"},
+        ]},
+    ])
+    orig_doc = deepcopy(json_doc)
+    # both shards fail, the error of the first operation is raised
+    with pytest.raises(ValueError):
+        apply_sharded(patch, json_doc, executor="process", max_workers=2)
+    assert json_doc == orig_doc
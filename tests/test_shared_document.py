@@ -0,0 +1,110 @@
+import pytest
+import pickle
+from decimal import Decimal
+from jotvm.json_patch import ExtJsonPatch
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json.json_types import JsonObject
+from jotvm.batch import apply_many
+from jotvm.shared_document import (
+    SharedJsonDocument,
+    encode_document,
+    decode_document,
+)
+
+
+@pytest.fixture(scope="function")
+def library():
+    return JsonFactory.from_python({
+        "double": [
+            {"op": "add", "path": "/out", "value-path": "/inp/x"},
+            {"op": "number/mul", "path": "/out", "value": 2},
+        ],
+        "constants": {"pi": Decimal("3.14"), "one": Decimal("1.0")},
+        "unused": [{"deep": list(range(100))} for _ in range(10)],
+    })
+
+
+def test_encoding_round_trip():
+    json_doc = JsonFactory.from_python({
+        "a": [1, Decimal("1.0"), "xé\U0001f600", None, True, False, {}, []],
+        "b": {"a": "xé\U0001f600"},
+    })
+    view = decode_document(encode_document(json_doc))
+    assert view == json_doc
+    assert json_doc == view
+    assert view["a"][1].to_json() == "1.0"
+    assert view.to_json() == json_doc.to_json()
+
+
+def test_views_are_lazy_and_private(library):
+    with SharedJsonDocument.create(library) as shared_doc:
+        view = shared_doc.root()
+        view["constants"]["pi"] = JsonFactory.from_python(3)
+        # only the accessed containers have been decoded
+        assert view["unused"]._value is None
+        assert shared_doc.root()["constants"]["pi"] == Decimal("3.14")
+        attached = pickle.loads(pickle.dumps(shared_doc))
+        assert attached.root() == library
+        assert type(pickle.loads(pickle.dumps(view))) is JsonObject
+        attached.close()
+
+
+@pytest.mark.parametrize("executor", ["serial", "thread", "process"])
+def test_batch_with_shared_library(library, executor):
+    patch = ExtJsonPatch.from_python([
+        {
+            "op": "ctrl/call-func",
+            "patch-path": "/req/double",
+            "x-path": "/value",
+            "out-path": "/result",
+        },
+        {"op": "add", "path": "/pi", "value-path": "/req/constants/pi"},
+        {"op": "remove", "path": "/req/constants"},
+    ])
+    docs = [
+        JsonFactory.from_python({"value": i, "meta": {"big": [0] * 50}})
+        for i in range(6)
+    ]
+    orig_meta = [doc["meta"] for doc in docs]
+    with SharedJsonDocument.create(library) as shared_doc:
+        results = list(apply_many(
+            patch, docs, executor=executor, max_workers=2,
+            shared={"/req": shared_doc}
+        ))
+        assert shared_doc.root() == library
+    for i, result in enumerate(results):
+        assert result.ok
+        # documents are updated in place and unchanged parts are kept
+        assert result.doc is docs[i]
+        assert result.doc["meta"] is orig_meta[i]
+        assert result.doc.to_python() == {
+            "value": i, "meta": {"big": [0] * 50},
+            "result": 2 * i, "pi": Decimal("3.14"),
+        }
+
+
+def test_root_mount_is_rejected(library):
+    patch = ExtJsonPatch.from_python([])
+    with SharedJsonDocument.create(library) as shared_doc:
+        with pytest.raises(ValueError):
+            list(apply_many(patch, [], shared={"": shared_doc}))
+
+
+@pytest.mark.parametrize("executor", ["serial", "process"])
+def test_documents_with_values_at_mount_points_fail(library, executor):
+    patch = ExtJsonPatch.from_python([
+        {"op": "add", "path": "/done", "value": True},
+    ])
+    docs = [
+        JsonFactory.from_python({"req": {"own": 1}}),
+        JsonFactory.from_python({}),
+    ]
+    with SharedJsonDocument.create(library) as shared_doc:
+        results = list(apply_many(
+            patch, docs, executor=executor, max_workers=1,
+            shared={"/req": shared_doc}
+        ))
+    assert isinstance(results[0].error, ValueError)
+    assert docs[0].to_python() == {"req": {"own": 1}}
+    assert results[1].ok
+    assert docs[1].to_python() == {"done": True}
@@ -0,0 +1,139 @@
+import pytest
+from copy import deepcopy
+from jotvm.json_patch import (
+    JsonPatch,
+    ExtJsonPatch,
+)
+from jotvm.json.json_factory import JsonFactory
+from jotvm.json_pointer import JsonPointer
+from jotvm.memory_quota import (
+    MemoryAccountant,
+    MemoryQuotaExceeded,
+    estimate_size,
+)
+from jotvm.transaction import Transaction
+
+
+@pytest.fixture(scope="function")
+def json_doc():
+    return JsonFactory.from_python({
+        "a": 5,
+        "b": [1, 2, 3],
+        "c": {"u": "cu", "v": [6, {"x": 8}]},
+        "block": {"counter": 3},
+    }, require_decimal=False)
+
+
+def test_failing_test_op_rolls_back(json_doc):
+    orig_doc = deepcopy(json_doc)
+    patch = JsonPatch.from_python([
+        {"op": "add", "path": "/b/1", "value": 42},
+        {"op": "remove", "path": "/b/0"},
+        {"op": "replace", "path": "/a", "value": 7},
+        {"op": "move", "from": "/c/u", "path": "/u"},
+        {"op": "copy", "from": "/c", "path": "/b/-"},
+        {"op": "test", "path": "/a", "value": 8},
+    ], require_decimal=False)
+    with pytest.raises(ValueError):
+        patch.apply(json_doc, atomic=True)
+    assert json_doc == orig_doc
+
+
+def test_key_error_rolls_back(json_doc):
+    orig_doc = deepcopy(json_doc)
+    orig_c = json_doc['c']
+    patch = JsonPatch.from_python([
+        {"op": "add", "path": "/x", "value": 1},
+        {"op": "remove", "path": "/missing"},
+    ], require_decimal=False)
+    with pytest.raises(KeyError):
+        patch.apply(json_doc, atomic=True)
+    assert json_doc == orig_doc
+    # untouched subtrees are neither copied nor replaced
+    assert json_doc['c'] is orig_c
+
+
+def test_non_atomic_apply_leaves_partial_state(json_doc):
+    patch = JsonPatch.from_python([
+        {"op": "add", "path": "/x", "value": 1},
+        {"op": "remove", "path": "/missing"},
+    ], require_decimal=False)
+    with pytest.raises(KeyError):
+        patch.apply(json_doc)
+    assert json_doc['x'] == 1
+
+
+def test_nested_control_ops_roll_back(json_doc):
+    orig_doc = deepcopy(json_doc)
+    patch = ExtJsonPatch.from_python([
+        {"op": "number/add", "path": "/a", "value": 1},
+        {
+            "op": "ctrl/apply-patch",
+            "path": "/block",
+            "patch": [
+                {"op": "number/add", "path": "/counter", "value": 10},
+                {"op": "add", "path": "/new", "value": [1, 2]},
+                {"op": "test", "path": "/counter", "value": 0},
+            ],
+        },
+    ], require_decimal=False)
+    with pytest.raises(ValueError):
+        patch.apply(json_doc, atomic=True)
+    assert json_doc == orig_doc
+
+
+def test_successful_atomic_apply(json_doc):
+    patch = ExtJsonPatch.from_python([
+        {"op": "number/add", "path": "/a", "value": 1},
+        {"op": "add", "path": "/b/-", "value": 4},
+    ], require_decimal=False)
+    patch.apply(json_doc, atomic=True)
+    assert json_doc['a'] == 6
+    assert json_doc['b'] == [1, 2, 3, 4]
+
+
+def test_savepoints(json_doc):
+    transaction = Transaction()
+    with transaction.begin():
+        JsonPointer('/x').add(json_doc, JsonFactory.from_python(1))
+        savepoint = transaction.savepoint()
+        JsonPointer('/b/0').remove(json_doc)
+        JsonPointer('/c/u').add(json_doc, JsonFactory.from_python('new'))
+        assert len(transaction) == 3
+        transaction.rollback(savepoint)
+        assert json_doc['b'] == [1, 2, 3]
+        assert json_doc['c']['u'] == 'cu'
+        assert json_doc['x'] == 1
+    assert len(transaction) == 0
+    assert json_doc['x'] == 1
+
+
+def test_rollback_keeps_memory_accounting_consistent(json_doc):
+    patch = JsonPatch.from_python([
+        {"op": "add", "path": "/big", "value": list(range(100))},
+        {"op": "remove", "path": "/a"},
+        {"op": "test", "path": "/b/0", "value": 100},
+    ], require_decimal=False)
+    accountant = MemoryAccountant()
+    with accountant.track(json_doc):
+        with pytest.raises(ValueError):
+            patch.apply(json_doc, atomic=True)
+    assert (accountant.live_nodes, accountant.live_bytes) == estimate_size(json_doc)
+
+
+def test_quota_exceeded_within_atomic_apply_rolls_back(json_doc):
+    orig = deepcopy(json_doc)
+    patch = JsonPatch.from_python([
+        {"op": "add", "path": "/x", "value": 1},
+        {"op": "add", "path": "/big", "value": list(range(1000))},
+    ], require_decimal=False)
+    # the accountant observes the writes before the transaction
+    accountant = MemoryAccountant(max_bytes=estimate_size(json_doc)[1] + 1000)
+    with accountant.track(json_doc):
+        with pytest.raises(MemoryQuotaExceeded):
+            patch.apply(json_doc, atomic=True)
+        with pytest.raises(MemoryQuotaExceeded):
+            with Transaction().begin():
+                patch.apply(json_doc)
+    assert json_doc == orig
+    assert (accountant.live_nodes, accountant.live_bytes) == estimate_size(json_doc)